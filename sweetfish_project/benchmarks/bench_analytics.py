@@ -0,0 +1,129 @@
+"""Dashboard aggregates at 1M orders: Python loops versus the NumPy snapshot.
+
+Usage: python -m benchmarks.bench_analytics [orders]
+"""
+
+import datetime
+import random
+import statistics
+import sys
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Order, OrderItem, OrderStatus, Payment, Product
+from sweetfish.services.analytics import OrderAnalytics
+
+MERCHANTS = 1_000
+PRODUCTS = 50_000
+CHANGES = 10_000
+DAY0 = datetime.datetime(2024, 1, 1)
+PAID = (OrderStatus.PAID, OrderStatus.SHIPPED, OrderStatus.DELIVERED)
+
+
+def _build(n: int) -> MemoryDB:
+    rng = random.Random(1)
+    db = MemoryDB()
+    for i in range(PRODUCTS):
+        db.add_product(Product(product_id=f"p{i}", merchant_id=f"m{i % MERCHANTS}", title=f"item {i}",
+                               description="", price_cents=rng.randrange(100, 10_000), stock=10))
+    statuses = list(OrderStatus)
+    batch = []
+    for i in range(n):
+        pid = rng.randrange(PRODUCTS)
+        qty = rng.randint(1, 3)
+        price = 100 + pid % 9_900
+        batch.append(Order(order_id=f"o{i}", buyer_id=f"u{rng.randrange(100_000)}",
+                           merchant_id=f"m{pid % MERCHANTS}", items=[OrderItem(f"p{pid}", qty, price)],
+                           total_cents=price * qty, status=rng.choice(statuses),
+                           created_at=DAY0 + datetime.timedelta(seconds=rng.randrange(365 * 86400))))
+        if len(batch) == 10_000:
+            db.add_orders(batch)
+            for o in batch:
+                db.payments[f"pay{o.order_id}"] = Payment(payment_id=f"pay{o.order_id}", order_id=o.order_id,
+                                                          amount_cents=o.total_cents, status="success")
+            batch = []
+    db.add_orders(batch)
+    return db
+
+
+def _time(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def _loop_revenue_by_merchant(db):
+    out = {}
+    for o in db.scan("orders"):
+        if o.status in PAID:
+            out[o.merchant_id] = out.get(o.merchant_id, 0) + o.total_cents
+    return out
+
+
+def _loop_percentiles_by_day(db):
+    days = {}
+    for o in db.scan("orders"):
+        days.setdefault(o.created_at.date(), []).append(o.total_cents)
+    return {d: statistics.quantiles(v, n=100)[89] for d, v in days.items() if len(v) > 1}
+
+
+def _loop_orders_by_product(db):
+    out = {}
+    for o in db.scan("orders"):
+        for it in o.items:
+            out[it.product_id] = out.get(it.product_id, 0) + 1
+    return out
+
+
+def _loop_count_by_status(db):
+    out = {}
+    for o in db.scan("orders"):
+        out[o.status] = out.get(o.status, 0) + 1
+    return out
+
+
+def _loop_payments_by_status(db):
+    out = {}
+    for p in db.scan("payments"):
+        out[p.status] = out.get(p.status, 0) + p.amount_cents
+    return out
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    start = time.perf_counter()
+    db = _build(n)
+    print(f"built {n} orders in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    analytics = OrderAnalytics(db)
+    print(f"columnar snapshot: {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(2)
+    for i in rng.sample(range(n), CHANGES):
+        db.set_order_status(db.get_order(f"o{i}"), OrderStatus.REFUNDED)
+    start = time.perf_counter()
+    analytics.refresh()
+    print(f"refresh after {CHANGES} status changes: {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    rows = [
+        ("revenue by merchant", lambda: _loop_revenue_by_merchant(db),
+         lambda: analytics.sum_by("merchant", statuses=PAID)),
+        ("p90 order value by day", lambda: _loop_percentiles_by_day(db),
+         lambda: analytics.percentiles_by("day", qs=(90,))),
+        ("orders by product", lambda: _loop_orders_by_product(db),
+         lambda: analytics.count_by("product")),
+        ("orders by status", lambda: _loop_count_by_status(db), lambda: analytics.count_by("status")),
+        ("payments by status", lambda: _loop_payments_by_status(db),
+         lambda: analytics.sum_by("payment_status")),
+    ]
+    print(f"{'aggregate':<24} {'loop ms':>9} {'numpy ms':>9}")
+    for name, loop, vec in rows:
+        print(f"{name:<24} {_time(loop, repeat=1):>9.0f} {_time(vec):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
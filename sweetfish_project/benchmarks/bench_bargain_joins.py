@@ -0,0 +1,94 @@
+"""Joins per second on one hot bargain: unlocked, per-join lock and flat-combined.
+
+Usage: python -m benchmarks.bench_bargain_joins
+"""
+
+import tempfile
+import threading
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.persistence import open_durable_db
+from sweetfish.scheduler import TimingWheel
+from sweetfish.services.bargain import BargainService
+from sweetfish.services.dispatcher import NotificationDispatcher
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.product import ProductService
+
+# WAL 模式下每次写入都要序列化整个参与者集合，人数多时很慢，所以少跑一些
+JOINS = {"memory": 40_000, "wal": 4_000}
+THREADS = (1, 4, 16)
+
+
+class UnlockedJoins(BargainService):
+    """The original join path: read-modify-write with no locking, one push per join."""
+
+    def join_bargain(self, bid, user_id):
+        b = self.db.get_bargain(bid)
+        cut = self._calculate_cut(b)
+        b.participants.add(user_id)
+        b.current_price_cents = max(0, b.current_price_cents - cut)
+        self.db.add_bargain(b)
+        self.notification.push(user_id, f"you cut {cut} cents")
+        return b
+
+
+class LockedJoins(BargainService):
+    """The original path under one lock: correct, but every join writes and pushes alone."""
+
+    _lock = threading.Lock()
+
+    def join_bargain(self, bid, user_id):
+        with self._lock:
+            return UnlockedJoins.join_bargain(self, bid, user_id)
+
+
+def run(cls, db, joins, threads):
+    # 与界面相同的通知配置：有界队列，满时最多阻塞 0.5 秒
+    dispatcher = NotificationDispatcher(policy="block", block_timeout=0.5)
+    notification = NotificationService(db, dispatcher=dispatcher)
+    svc = cls(db, notification, scheduler=TimingWheel())
+    lamp = ProductService(db).create_product("m1", "lamp", "", 10**12, stock=1)
+    b = svc.start_bargain("owner", lamp.product_id)
+    per_thread = joins // threads
+
+    def worker(t):
+        for i in range(per_thread):
+            svc.join_bargain(b.bargain_id, f"u{t}_{i}")
+
+    # 每次加入都固定砍 1 分，丢失的更新 = 加入次数 - 实际降价
+    svc._calculate_cut = lambda b, pct=None: 1
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    svc.flush()
+    elapsed = time.perf_counter() - start
+    lost = per_thread * threads - (10**12 - b.current_price_cents)
+    batch = svc.joins / svc.batches if svc.batches else 1.0
+    svc.close()
+    dispatcher.close()
+    return per_thread * threads / elapsed, lost, batch
+
+
+def main() -> None:
+    print(f"{'store':>6} {'threads':>7} {'unlocked/s':>11} {'lost':>5} {'locked/s':>9} "
+          f"{'combined/s':>11} {'lost':>5} {'batch':>6}")
+    for store in ("memory", "wal"):
+        for threads in THREADS:
+            rows = []
+            for cls in (UnlockedJoins, LockedJoins, BargainService):
+                with tempfile.TemporaryDirectory() as tmp:
+                    db = MemoryDB() if store == "memory" else open_durable_db(tmp, fsync="batch")
+                    rows.append(run(cls, db, JOINS[store], threads))
+                    if store == "wal":
+                        db.journal.close()
+            (unlocked, lost_u, _), (locked, _, _), (combined, lost_c, batch) = rows
+            print(f"{store:>6} {threads:>7} {unlocked:>11,.0f} {lost_u:>5} {locked:>9,.0f} "
+                  f"{combined:>11,.0f} {lost_c:>5} {batch:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Large carts: one create_order per merchant versus create_orders_bulk.
+
+Usage: python -m benchmarks.bench_bulk_checkout
+"""
+
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+CART_SIZES = (10, 100, 1_000)
+MERCHANTS = 10
+ROUNDS = 50
+
+
+def _setup(cart_size: int):
+    db = MemoryDB()
+    notification = NotificationService(db)
+    orders = OrderService(db, PaymentGateway(db, notification), notification,
+                          CreditSystem(db), RecommendationEngine(db))
+    products = ProductService(db)
+    cart = [(products.create_product(f"m{i % MERCHANTS}", f"item {i}", "", 100,
+                                     stock=ROUNDS).product_id, 1)
+            for i in range(cart_size)]
+    return db, orders, cart
+
+
+def _per_merchant(orders: OrderService, db: MemoryDB, cart) -> None:
+    groups = {}
+    for pid, qty in cart:
+        groups.setdefault(db.get_product(pid).merchant_id, []).append((pid, qty))
+    for items in groups.values():
+        orders.create_order("u1", items)
+
+
+def main() -> None:
+    print(f"{'cart items':>10} {'per-merchant ms':>16} {'bulk ms':>9}")
+    for size in CART_SIZES:
+        db, orders, cart = _setup(size)
+        start = time.perf_counter()
+        for _ in range(ROUNDS // 2):
+            _per_merchant(orders, db, cart)
+        single = (time.perf_counter() - start) * 1000 / (ROUNDS // 2)
+        start = time.perf_counter()
+        for _ in range(ROUNDS // 2):
+            orders.create_orders_bulk("u1", cart)
+        bulk = (time.perf_counter() - start) * 1000 / (ROUNDS // 2)
+        print(f"{size:>10} {single:>16.3f} {bulk:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
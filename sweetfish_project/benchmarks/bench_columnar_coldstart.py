@@ -0,0 +1,51 @@
+"""Cold start: JSON snapshot replay versus the mmap columnar snapshot.
+
+Usage: python -m benchmarks.bench_columnar_coldstart
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_wal_recovery import _fill
+from sweetfish.columnar import load_columnar_snapshot, write_columnar_snapshot
+from sweetfish.db import MemoryDB
+from sweetfish.persistence import load_snapshot, write_snapshot
+
+SIZES = (10_000, 100_000)
+
+
+def main() -> None:
+    print(f"{'products':>9} {'json load s':>12} {'columnar load s':>16} {'first read ms':>14} {'size MB j/c':>14}")
+    for n in SIZES:
+        path = tempfile.mkdtemp(prefix="sweetfish_col_")
+        try:
+            db = MemoryDB()
+            _fill(db, n)
+            json_path = os.path.join(path, "snap.json")
+            col_path = os.path.join(path, "snap.swfc")
+            write_snapshot(db, json_path, 0)
+            write_columnar_snapshot(db, col_path)
+            some_pid = next(iter(db.products))
+            del db
+
+            start = time.perf_counter()
+            load_snapshot(MemoryDB(), json_path)
+            json_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            db = load_columnar_snapshot(col_path)
+            col_s = time.perf_counter() - start
+            start = time.perf_counter()
+            db.get_product(some_pid)
+            first_ms = (time.perf_counter() - start) * 1000
+
+            sizes = f"{os.path.getsize(json_path) / 1e6:.1f}/{os.path.getsize(col_path) / 1e6:.1f}"
+            print(f"{n:>9} {json_s:>12.3f} {col_s:>16.3f} {first_ms:>14.3f} {sizes:>14}")
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Multi-threaded stress: order writers per merchant plus concurrent scanners.
+
+Compares one stripe (equivalent to the old single writer lock) with the
+default striping, and counts "changed size during iteration" failures of a
+naive dict scan versus ``MemoryDB.scan``.
+
+Usage: python -m benchmarks.bench_db_concurrency
+"""
+
+import threading
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Order, OrderItem, Product, gen_id
+
+WRITERS = (1, 4, 8, 16)
+ORDERS_PER_WRITER = 5_000
+SCANNERS = 2
+
+
+def _writer(db: MemoryDB, merchant_id: str) -> None:
+    for i in range(ORDERS_PER_WRITER):
+        p = Product(product_id=gen_id("p_"), merchant_id=merchant_id, title=f"item {i}",
+                    description="stress", price_cents=100, stock=1)
+        db.add_product(p)
+        db.add_order(Order(order_id=gen_id("o_"), buyer_id=f"u{i % 100}", merchant_id=merchant_id,
+                           items=[OrderItem(p.product_id, 1)], total_cents=100))
+
+
+def _naive_scan(db: MemoryDB) -> None:
+    for p in db.products.values():
+        p.views  # pylint: disable=pointless-statement
+
+
+def _safe_scan(db: MemoryDB) -> None:
+    for p in db.scan("products"):
+        p.views  # pylint: disable=pointless-statement
+
+
+def _run(stripes: int, writers: int, scanner) -> tuple:
+    db = MemoryDB(lock_stripes=stripes)
+    done = threading.Event()
+    counts = {"scans": 0, "errors": 0}
+
+    def scan_loop() -> None:
+        while not done.is_set():
+            try:
+                scanner(db)
+                counts["scans"] += 1
+            except RuntimeError:
+                counts["errors"] += 1
+
+    threads = [threading.Thread(target=_writer, args=(db, f"m{i}")) for i in range(writers)]
+    scan_threads = [threading.Thread(target=scan_loop) for _ in range(SCANNERS)]
+    start = time.perf_counter()
+    for t in scan_threads + threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in scan_threads:
+        t.join()
+    return writers * ORDERS_PER_WRITER / elapsed, counts["scans"], counts["errors"]
+
+
+def main() -> None:
+    print(f"{'writers':>8} {'stripes':>8} {'scan':>6} {'orders/s':>10} {'scans':>7} {'scan errors':>12}")
+    for writers in WRITERS:
+        for stripes, scanner, name in ((1, _naive_scan, "naive"), (1, _safe_scan, "safe"),
+                                       (64, _safe_scan, "safe")):
+            rate, scans, errors = _run(stripes, writers, scanner)
+            print(f"{writers:>8} {stripes:>8} {name:>6} {rate:>10.0f} {scans:>7} {errors:>12}")
+
+
+if __name__ == "__main__":
+    main()
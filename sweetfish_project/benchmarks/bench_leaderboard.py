@@ -0,0 +1,57 @@
+"""Top-N popularity queries: full sort per call versus the skip-list boards.
+
+Usage: python -m benchmarks.bench_leaderboard
+"""
+
+import random
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Product, gen_id
+
+SIZES = (10_000, 100_000, 500_000)
+UPDATES = 20_000
+QUERIES = 200
+TOP_N = 20
+
+
+def main() -> None:
+    print(f"{'products':>9} {'update us':>10} {'sort top-N ms':>14} {'board top-N ms':>15} {'top-5 sold ms':>14}")
+    for n in SIZES:
+        rng = random.Random(1)
+        db = MemoryDB()
+        products = []
+        for i in range(n):
+            p = Product(product_id=gen_id("p_"), merchant_id="m", title=f"item {i}", description="",
+                        price_cents=100, views=rng.randrange(1000), sold=rng.randrange(100))
+            db.add_product(p)
+            products.append(p)
+
+        # 浏览/购买的写入路径：计数变化后 touch_product 更新两张榜
+        start = time.perf_counter()
+        for _ in range(UPDATES):
+            p = rng.choice(products)
+            p.views += 1
+            db.touch_product(p)
+        update_us = (time.perf_counter() - start) * 1e6 / UPDATES
+
+        # 旧做法：每次把整个商品表按排序键排一遍
+        start = time.perf_counter()
+        for _ in range(QUERIES // 10):
+            sorted(db.scan("products"), key=db._rank_key)[:TOP_N]
+        sort_ms = (time.perf_counter() - start) * 1e3 / (QUERIES // 10)
+
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            db.search_products_page("", limit=TOP_N)
+        board_ms = (time.perf_counter() - start) * 1e3 / QUERIES
+
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            db.top_selling_products(5)
+        sold_ms = (time.perf_counter() - start) * 1e3 / QUERIES
+        print(f"{n:>9} {update_us:>10.1f} {sort_ms:>14.2f} {board_ms:>15.3f} {sold_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
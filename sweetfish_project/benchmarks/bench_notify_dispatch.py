@@ -0,0 +1,91 @@
+"""Notification fan-out: inline delivery versus the batching dispatcher.
+
+Usage: python -m benchmarks.bench_notify_dispatch
+"""
+
+import threading
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.services.dispatcher import NotificationDispatcher
+from sweetfish.services.notification import NotificationService
+
+PUSHES = 200_000
+THREADS = 4
+USERS = 10_000
+# 模拟外部推送网关：每次调用固定往返开销，与批大小无关
+GATEWAY_CALL = 0.001
+GATEWAY_PUSHES = 5_000
+
+
+class Gateway:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, notes):
+        self.calls += 1
+        time.sleep(GATEWAY_CALL)
+
+
+def _produce(push, total):
+    per_thread = total // THREADS
+
+    def worker(t):
+        for i in range(per_thread):
+            push(f"u{(t * per_thread + i) % USERS}", f"订单 {i} 状态更新")
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    start = time.perf_counter()
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    return time.perf_counter() - start
+
+
+def run_inline(total, gateway=None):
+    service = NotificationService(MemoryDB())
+
+    def push(user_id, message):
+        service.push(user_id, message)
+        if gateway is not None:
+            gateway([(user_id, message, None)])
+
+    produce = _produce(push, total)
+    return produce, produce, None
+
+
+def run_dispatched(total, gateway=None):
+    sinks = [gateway] if gateway is not None else []
+    dispatcher = NotificationDispatcher(sinks, capacity=50_000, batch_size=512)
+    service = NotificationService(MemoryDB(), dispatcher=dispatcher)
+    start = time.perf_counter()
+    produce = _produce(service.push, total)
+    service.flush()
+    done = time.perf_counter() - start
+    metrics = dispatcher.metrics()
+    dispatcher.close()
+    return produce, done, metrics
+
+
+def main() -> None:
+    print(f"{'scenario':<30} {'push us':>8} {'delivered/s':>12} {'batch':>7} "
+          f"{'max depth':>10} {'lag ms':>8} {'max lag ms':>11}")
+    for label, total, gateway in (("inbox only", PUSHES, False),
+                                  ("inbox + 1 ms gateway", GATEWAY_PUSHES, True)):
+        for mode, fn in (("inline", run_inline), ("dispatcher", run_dispatched)):
+            sink = Gateway() if gateway else None
+            produce, done, m = fn(total, sink)
+            name = f"{label}, {mode}"
+            push_us = produce * 1e6 / total
+            if m is None:
+                print(f"{name:<30} {push_us:>8.2f} {total / done:>12,.0f} {1:>7} {'-':>10} "
+                      f"{'-':>8} {'-':>11}")
+            else:
+                print(f"{name:<30} {push_us:>8.2f} {total / done:>12,.0f} "
+                      f"{m['mean_batch']:>7.0f} {m['max_depth']:>10,} {m['lag_ms']:>8.1f} "
+                      f"{m['max_lag_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
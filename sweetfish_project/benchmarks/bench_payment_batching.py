@@ -0,0 +1,57 @@
+"""Payment throughput against the fake provider, unbatched versus batched.
+
+Each provider call costs one round trip regardless of how many payments
+it carries, like a per-call-priced provider.
+
+Usage: python -m benchmarks.bench_payment_batching
+"""
+
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Payment, gen_id
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.payment_pipeline import AsyncPaymentPipeline, FakePaymentProvider
+from sweetfish.services.recommend import RecommendationEngine
+from sweetfish.services.reconcile import PaymentReconciler
+
+PAYMENTS = 2_000
+LATENCY = 0.02
+BATCH_SIZES = (1, 8, 32, 128)
+
+
+def _run(batch_size: int) -> tuple:
+    db = MemoryDB()
+    notification = NotificationService(db)
+    gateway = PaymentGateway(db, notification)
+    orders = OrderService(db, gateway, notification, CreditSystem(db), RecommendationEngine(db))
+    provider = FakePaymentProvider(latency=LATENCY, decline_rate=0.02)
+    pipeline = AsyncPaymentPipeline(gateway, provider, max_concurrency=8,
+                                    batch_size=batch_size, batch_window=0.005)
+    payments = [Payment(payment_id=gen_id("pay_"), order_id=gen_id("o_"), amount_cents=100)
+                for _ in range(PAYMENTS)]
+    start = time.perf_counter()
+    futures = [pipeline.submit(p) for p in payments]
+    for f in futures:
+        f.result()
+    elapsed = time.perf_counter() - start
+    pipeline.close()
+
+    start = time.perf_counter()
+    PaymentReconciler(db, orders, chunk_size=500).run()
+    reconcile_ms = (time.perf_counter() - start) * 1000
+    return PAYMENTS / elapsed, provider.calls, reconcile_ms
+
+
+def main() -> None:
+    print(f"{'batch':>6} {'payments/s':>11} {'provider calls':>15} {'reconcile ms':>13}")
+    for size in BATCH_SIZES:
+        rate, calls, reconcile_ms = _run(size)
+        print(f"{size:>6} {rate:>11.0f} {calls:>15} {reconcile_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
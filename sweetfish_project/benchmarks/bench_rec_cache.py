@@ -0,0 +1,67 @@
+"""Main-screen recommendation latency with and without the per-user cache.
+
+Usage: python -m benchmarks.bench_rec_cache
+"""
+
+import random
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Product, gen_id
+from sweetfish.services.recommend import RecommendationEngine
+
+PRODUCTS = 5_000
+USERS = 500
+REQUESTS = 5_000
+# 每次打开首页前，用户浏览一个商品 / 某商品被调整推广权重的概率
+VIEW_RATE = 0.2
+PROMOTE_RATE = 0.001
+TAGS = [f"tag{i}" for i in range(200)]
+
+
+def _run(cached: bool) -> None:
+    rng = random.Random(1)
+    db = MemoryDB()
+    products = []
+    for i in range(PRODUCTS):
+        p = Product(product_id=gen_id("p_"), merchant_id="m", title=f"item {i}", description="",
+                    price_cents=100, tags=set(rng.sample(TAGS, 3)))
+        db.add_product(p)
+        products.append(p)
+    engine = RecommendationEngine(db, vectorized=False, cached=cached)
+    users = [f"u{i}" for i in range(USERS)]
+    for user in users:
+        for _ in range(3):
+            engine.record_view(user, rng.choice(products).product_id)
+    total = 0.0
+    for _ in range(REQUESTS):
+        user = rng.choice(users)
+        if rng.random() < VIEW_RATE:
+            engine.record_view(user, rng.choice(products).product_id)
+        if rng.random() < PROMOTE_RATE:
+            p = rng.choice(products)
+            p.promotion_rank += 1
+            db.touch_product(p)
+        start = time.perf_counter()
+        engine.recommend_for_user(user, top_k=6)
+        total += time.perf_counter() - start
+    label = "cached" if cached else "uncached"
+    if engine.cache is None:
+        print(f"{label:>9} {total * 1e6 / REQUESTS:>12.1f} {'-':>9}")
+    else:
+        engine.cache.flush()
+        stats = engine.cache.stats()
+        print(f"{label:>9} {total * 1e6 / REQUESTS:>12.1f} {stats['hit_rate']:>9.1%}"
+              f"  (hit {stats['hit_ms'] * 1000:.1f} us, miss {stats['miss_ms'] * 1000:.1f} us,"
+              f" refresh {stats['refresh_ms'] * 1000:.1f} us)")
+        engine.close()
+
+
+def main() -> None:
+    print(f"{'':>9} {'us/request':>12} {'hit rate':>9}")
+    _run(False)
+    _run(True)
+
+
+if __name__ == "__main__":
+    main()
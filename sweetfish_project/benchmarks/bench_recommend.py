@@ -0,0 +1,45 @@
+"""Recommendation latency versus catalogue size (item-to-item model).
+
+Usage: python -m benchmarks.bench_recommend
+"""
+
+import random
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Product, gen_id
+from sweetfish.services.recommend import RecommendationEngine
+
+SIZES = (1_000, 10_000, 100_000)
+EVENTS = 50_000
+QUERIES = 1_000
+
+
+def main() -> None:
+    print(f"{'products':>9} {'record us/event':>16} {'recommend us':>13}")
+    for n in SIZES:
+        rng = random.Random(1)
+        db = MemoryDB()
+        pids = []
+        for i in range(n):
+            p = Product(product_id=gen_id("p_"), merchant_id="m", title=f"item {i}",
+                        description="", price_cents=100)
+            db.add_product(p)
+            pids.append(p.product_id)
+        engine = RecommendationEngine(db)
+        users = [f"u{i}" for i in range(2_000)]
+        start = time.perf_counter()
+        for _ in range(EVENTS):
+            # 少量热门商品 + 长尾，接近真实的浏览分布
+            pid = pids[min(int(rng.paretovariate(1.2)) - 1, n - 1)] if rng.random() < 0.7 else rng.choice(pids)
+            engine.record_view(rng.choice(users), pid)
+        record_us = (time.perf_counter() - start) * 1e6 / EVENTS
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            engine.recommend_for_user(rng.choice(users), top_k=6)
+        rec_us = (time.perf_counter() - start) * 1e6 / QUERIES
+        print(f"{n:>9} {record_us:>16.1f} {rec_us:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Simulated joins and payment outcomes: global ``random`` versus seeded block streams.
+
+Usage: python -m benchmarks.bench_rng_streams
+"""
+
+import random
+import threading
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.rng import HAS_NUMPY, RandomStream
+from sweetfish.scheduler import TimingWheel
+from sweetfish.services.bargain import BargainService
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.product import ProductService
+
+DRAWS = 2_000_000
+THREADS = 8
+JOINS = 200_000
+
+
+def _per_thread(fn):
+    pool = [threading.Thread(target=fn, name=f"sim-{t}") for t in range(THREADS)]
+    start = time.perf_counter()
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    return time.perf_counter() - start
+
+
+def bench_draws():
+    per_thread = DRAWS // THREADS
+    rows = []
+
+    def global_random():
+        u = random.uniform
+        for _ in range(per_thread):
+            u(0.005, 0.05)
+    rows.append(("random.uniform (global)", _per_thread(global_random)))
+
+    stream = RandomStream(1)
+
+    def stream_single():
+        u = stream.uniform
+        for _ in range(per_thread):
+            u(0.005, 0.05)
+    rows.append(("RandomStream.uniform", _per_thread(stream_single)))
+
+    def stream_block():
+        stream.uniform_block(per_thread, 0.005, 0.05)
+    rows.append(("RandomStream.uniform_block", _per_thread(stream_block)))
+    return rows
+
+
+def bench_joins(seed):
+    db = MemoryDB()
+    svc = BargainService(db, NotificationService(db), scheduler=TimingWheel(), seed=seed)
+    lamp = ProductService(db).create_product("m1", "lamp", "", 10**12, stock=1)
+    users = [f"u{i}" for i in range(JOINS)]
+    b1 = svc.start_bargain("owner", lamp.product_id)
+    start = time.perf_counter()
+    for uid in users:
+        svc.join_bargain(b1.bargain_id, uid)
+    single = time.perf_counter() - start
+    b2 = svc.start_bargain("owner", lamp.product_id)
+    start = time.perf_counter()
+    svc.join_many(b2.bargain_id, users)
+    bulk = time.perf_counter() - start
+    # 价格很快砍到 0，重放只比较前 10 次加入后的价格
+    b3 = svc.start_bargain("owner", lamp.product_id)
+    svc.join_many(b3.bargain_id, users[:10])
+    svc.close()
+    return single, bulk, b3.current_price_cents
+
+
+def main() -> None:
+    print(f"{DRAWS:,} cut draws on {THREADS} threads (numpy blocks: {HAS_NUMPY})")
+    for name, seconds in bench_draws():
+        print(f"  {name:<28} {DRAWS / seconds / 1e6:>6.2f} M draws/s")
+
+    single, bulk, price = bench_joins(seed=9)
+    _, _, again = bench_joins(seed=9)
+    print(f"{JOINS:,} joins on one bargain, seed 9")
+    print(f"  join_bargain loop  {JOINS / single:>10,.0f} joins/s")
+    print(f"  join_many          {JOINS / bulk:>10,.0f} joins/s")
+    print(f"  price after 10 joins: {price} (rerun: {again}, replayed: {price == again})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Sales report latency: full scan over products versus the materialized view.
+
+Usage: python -m benchmarks.bench_sales_report
+"""
+
+import random
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Order, OrderItem, OrderStatus, Product, gen_id
+from sweetfish.services.admin import AdminService
+
+SIZES = (10_000, 100_000, 500_000)
+ORDERS = 50_000
+REPORTS = 100
+
+
+def _old_report(db):
+    # 原实现：按当前标价累加全部商品，再整表排序取前 5
+    total = sum(p.sold * p.price_cents for p in db.scan("products"))
+    top = sorted(db.scan("products"), key=lambda p: p.sold, reverse=True)[:5]
+    return total, [(p.product_id, p.title, p.sold) for p in top]
+
+
+def main() -> None:
+    print(f"{'products':>9} {'pay overhead us':>16} {'scan report ms':>15} {'view report ms':>15} {'rebuild ms':>11}")
+    for n in SIZES:
+        rng = random.Random(1)
+        db = MemoryDB()
+        products = []
+        for i in range(n):
+            p = Product(product_id=gen_id("p_"), merchant_id=f"m{i % 500}", title=f"item {i}",
+                        description="", price_cents=rng.randrange(100, 10_000))
+            db.add_product(p)
+            products.append(p)
+        orders = []
+        for _ in range(ORDERS):
+            p = rng.choice(products)
+            qty = rng.randrange(1, 4)
+            o = Order(order_id=gen_id("o_"), buyer_id="u", merchant_id=p.merchant_id,
+                      items=[OrderItem(p.product_id, qty, p.price_cents)], total_cents=p.price_cents * qty)
+            db.add_order(o)
+            orders.append(o)
+
+        start = time.perf_counter()
+        for o in orders:
+            db.mark_order_paid(o, "pay")
+        base_us = (time.perf_counter() - start) * 1e6 / ORDERS
+        for o in orders:
+            db.set_order_status(o, OrderStatus.CREATED)
+
+        admin = AdminService(db)
+        start = time.perf_counter()
+        for o in orders:
+            db.mark_order_paid(o, "pay")
+        view_us = (time.perf_counter() - start) * 1e6 / ORDERS - base_us
+
+        start = time.perf_counter()
+        for _ in range(REPORTS // 10):
+            _old_report(db)
+        scan_ms = (time.perf_counter() - start) * 1e3 / (REPORTS // 10)
+        start = time.perf_counter()
+        for _ in range(REPORTS):
+            admin.generate_sales_report()
+        view_ms = (time.perf_counter() - start) * 1e3 / REPORTS
+        start = time.perf_counter()
+        assert admin.rebuild_sales_report()
+        rebuild_ms = (time.perf_counter() - start) * 1e3
+        print(f"{n:>9} {view_us:>16.1f} {scan_ms:>15.2f} {view_ms:>15.3f} {rebuild_ms:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
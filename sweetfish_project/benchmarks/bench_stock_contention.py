@@ -0,0 +1,72 @@
+"""Checkout throughput on one hot SKU versus many SKUs, with reservations.
+
+Every thread runs create_order + pay_order in a loop; the run checks that
+no stock was oversold.
+
+Usage: python -m benchmarks.bench_stock_contention
+"""
+
+import threading
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+THREADS = (1, 4, 16, 64)
+CHECKOUTS_PER_THREAD = 500
+
+
+def _run(threads: int, skus: int) -> tuple:
+    db = MemoryDB()
+    notification = NotificationService(db)
+    orders = OrderService(db, PaymentGateway(db, notification), notification,
+                          CreditSystem(db), RecommendationEngine(db))
+    # 库存故意少于尝试次数，让一部分下单因售罄失败
+    stock = threads * CHECKOUTS_PER_THREAD // (2 * skus)
+    products = [ProductService(db).create_product("m1", f"sku {i}", "", 100, stock=stock)
+                for i in range(skus)]
+    counts = {"paid": 0, "rejected": 0}
+    counts_lock = threading.Lock()
+
+    def buyer(i: int) -> None:
+        paid = rejected = 0
+        for n in range(CHECKOUTS_PER_THREAD):
+            p = products[(i + n) % skus]
+            try:
+                o = orders.create_order(f"u{i}", [(p.product_id, 1)])
+            except ValueError:
+                rejected += 1
+                continue
+            if orders.pay_order(o.order_id, succeed_rate=0.9).status == "success":
+                paid += 1
+        with counts_lock:
+            counts["paid"] += paid
+            counts["rejected"] += rejected
+
+    workers = [threading.Thread(target=buyer, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    sold = sum(stock - p.stock for p in products)
+    oversold = sold != counts["paid"] or any(p.stock < 0 for p in products)
+    return threads * CHECKOUTS_PER_THREAD / elapsed, counts["paid"], counts["rejected"], oversold
+
+
+def main() -> None:
+    print(f"{'threads':>8} {'skus':>5} {'checkouts/s':>12} {'paid':>7} {'rejected':>9} {'oversold':>9}")
+    for threads in THREADS:
+        for skus in (1, 64):
+            rate, paid, rejected, oversold = _run(threads, skus)
+            print(f"{threads:>8} {skus:>5} {rate:>12.0f} {paid:>7} {rejected:>9} {str(oversold):>9}")
+
+
+if __name__ == "__main__":
+    main()
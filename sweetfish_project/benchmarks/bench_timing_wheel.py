@@ -0,0 +1,108 @@
+"""One million pending expiry timers: timing wheel versus a heap and a per-tick scan.
+
+Usage: python -m benchmarks.bench_timing_wheel
+"""
+
+import heapq
+import random
+import time
+
+from sweetfish.scheduler import TimingWheel
+
+TIMERS = 1_000_000
+# 到期时间均匀分布在 1 小时内（tick = 1 秒）
+HORIZON = 3600
+TICKS = 600
+CANCEL = 100_000
+SCAN_TICKS = 5
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _noop(_: int) -> None:
+    pass
+
+
+def bench_wheel(delays):
+    clock = FakeClock()
+    wheel = TimingWheel(tick=1.0, clock=clock)
+    start = time.perf_counter()
+    timers = [wheel.call_later(d, _noop, i) for i, d in enumerate(delays)]
+    schedule_us = (time.perf_counter() - start) * 1e6 / len(delays)
+
+    start = time.perf_counter()
+    for t in timers[:CANCEL]:
+        t.cancel()
+    cancel_us = (time.perf_counter() - start) * 1e6 / CANCEL
+
+    fired = 0
+    worst = 0.0
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        clock.now += 1
+        t0 = time.perf_counter()
+        fired += wheel.advance()
+        worst = max(worst, time.perf_counter() - t0)
+    tick_ms = (time.perf_counter() - start) * 1e3 / TICKS
+    return schedule_us, cancel_us, tick_ms, worst * 1e3, fired
+
+
+def bench_heap(delays):
+    heap = []
+    start = time.perf_counter()
+    for i, d in enumerate(delays):
+        heapq.heappush(heap, (d, i, _noop))
+    schedule_us = (time.perf_counter() - start) * 1e6 / len(delays)
+
+    # 堆的取消同样只能打标记，到期弹出时跳过
+    cancelled = set()
+    start = time.perf_counter()
+    for i in range(CANCEL):
+        cancelled.add(i)
+    cancel_us = (time.perf_counter() - start) * 1e6 / CANCEL
+
+    fired = 0
+    worst = 0.0
+    start = time.perf_counter()
+    for now in range(1, TICKS + 1):
+        t0 = time.perf_counter()
+        while heap and heap[0][0] <= now:
+            _, i, fn = heapq.heappop(heap)
+            if i not in cancelled:
+                fn(i)
+                fired += 1
+        worst = max(worst, time.perf_counter() - t0)
+    tick_ms = (time.perf_counter() - start) * 1e3 / TICKS
+    return schedule_us, cancel_us, tick_ms, worst * 1e3, fired
+
+
+def bench_scan(delays):
+    # 旧做法：每个 tick 扫一遍所有进行中的砍价，比较 expires_at
+    pending = dict(enumerate(delays))
+    start = time.perf_counter()
+    for now in range(1, SCAN_TICKS + 1):
+        for i in [i for i, d in pending.items() if d <= now]:
+            del pending[i]
+    return (time.perf_counter() - start) * 1e3 / SCAN_TICKS
+
+
+def main() -> None:
+    rng = random.Random(1)
+    delays = [rng.uniform(0, HORIZON) for _ in range(TIMERS)]
+    print(f"{TIMERS:,} timers over {HORIZON} s, {TICKS} ticks of 1 s, {CANCEL:,} cancelled")
+    print(f"{'impl':>6} {'schedule us':>12} {'cancel us':>10} {'tick ms':>8} "
+          f"{'worst tick ms':>14} {'fired':>8}")
+    for name, fn in (("wheel", bench_wheel), ("heap", bench_heap)):
+        sched, cancel, tick, worst, fired = fn(delays)
+        print(f"{name:>6} {sched:>12.2f} {cancel:>10.2f} {tick:>8.3f} {worst:>14.3f} {fired:>8}")
+    print(f"{'scan':>6} {'-':>12} {'-':>10} {bench_scan(delays):>8.3f} {'-':>14} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
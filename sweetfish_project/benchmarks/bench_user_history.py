@@ -0,0 +1,53 @@
+"""Memory per user: unbounded lists of product ids versus UserHistory rings.
+
+Usage: python -m benchmarks.bench_user_history
+"""
+
+import random
+import tracemalloc
+
+from sweetfish.services.history import UserHistory
+
+USERS = 20_000
+EVENTS_PER_USER = (10, 100, 500)
+CATALOGUE = [f"p_{i:012x}" for i in range(50_000)]
+
+
+def _measure(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return after - before
+
+
+def _lists(events: int):
+    rng = random.Random(1)
+    history = {}
+    for _ in range(events):
+        for u in range(USERS):
+            history.setdefault(f"u{u}", []).append(rng.choice(CATALOGUE))
+    return history
+
+
+def _rings(events: int):
+    rng = random.Random(1)
+    history = UserHistory(depth=10)
+    for _ in range(events):
+        for u in range(USERS):
+            history.append(f"u{u}", rng.choice(CATALOGUE))
+    return history
+
+
+def main() -> None:
+    print(f"{'events/user':>12} {'list B/user':>12} {'ring B/user':>12}")
+    for events in EVENTS_PER_USER:
+        old = _measure(lambda: _lists(events)) / USERS
+        new = _measure(lambda: _rings(events)) / USERS
+        print(f"{events:>12} {old:>12.0f} {new:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Tag-affinity scoring: pure Python loop versus the NumPy engine.
+
+Usage: python -m benchmarks.bench_vector_scoring [max_products]
+
+The loop is timed on fewer queries as the catalogue grows (``loop q`` in
+the output), so the 1M row finishes in minutes; every query is averaged.
+"""
+
+import random
+import sys
+import time
+
+from sweetfish.db import MemoryDB
+from sweetfish.models import Product, gen_id
+from sweetfish.services import vector_scoring
+from sweetfish.services.recommend import RecommendationEngine
+
+SIZES = (10_000, 100_000, 1_000_000)
+TAGS = [f"t{i}" for i in range(200)]
+QUERIES = 20
+# 纯 Python 循环每次查询都要扫描全部商品，大目录下只抽样这么多个查询
+LOOP_BUDGET = 2_000_000
+
+
+def _fill(db: MemoryDB, n: int, rng: random.Random) -> None:
+    # 打分不用全文检索：批量装载且不建倒排索引，100 万商品才放得进几 GB 内存
+    products = {}
+    for i in range(n):
+        p = Product(product_id=gen_id("p_"), merchant_id="m", title=f"item {i}",
+                    description="", price_cents=100, views=rng.randint(0, 1000),
+                    sold=rng.randint(0, 100), promotion_rank=rng.randint(0, 2),
+                    tags=set(rng.sample(TAGS, 3)))
+        products[p.product_id] = p
+    db.bulk_load(products=products, product_texts=())
+
+
+def _loop_queries(n: int) -> int:
+    return max(2, min(QUERIES, LOOP_BUDGET // n))
+
+
+def _time(engine: RecommendationEngine, users) -> float:
+    start = time.perf_counter()
+    for user in users:
+        engine.recommend_by_tags(user, top_k=6)
+    return (time.perf_counter() - start) * 1000 / len(users)
+
+
+def main() -> None:
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    if not vector_scoring.HAS_NUMPY:
+        print("numpy not installed: only the loop is measured")
+    print(f"{'products':>9} {'loop q':>7} {'loop ms':>9} {'numpy ms':>9} {'build s':>8} "
+          f"{'update us':>10}")
+    for n in (s for s in SIZES if s <= limit):
+        rng = random.Random(n)
+        db = MemoryDB()
+        _fill(db, n, rng)
+        pids = list(db.products)
+        loop = RecommendationEngine(db, vectorized=False)
+        users = [f"u{i}" for i in range(QUERIES)]
+        for user in users:
+            loop.user_history[user] = rng.sample(pids, 10)
+        loop_q = _loop_queries(n)
+        loop_ms = _time(loop, users[:loop_q])
+        numpy_ms = build_s = update_us = float("nan")
+        if vector_scoring.HAS_NUMPY:
+            start = time.perf_counter()
+            fast = RecommendationEngine(db, vectorized=True)
+            build_s = time.perf_counter() - start
+            fast.user_history = loop.user_history
+            numpy_ms = _time(fast, users)
+            start = time.perf_counter()
+            for pid in pids[:10_000]:
+                p = db.get_product(pid)
+                p.views += 1
+                db.touch_product(p)
+            update_us = (time.perf_counter() - start) * 1e6 / min(len(pids), 10_000)
+        print(f"{n:>9} {loop_q:>7} {loop_ms:>9.1f} {numpy_ms:>9.2f} {build_s:>8.2f} "
+              f"{update_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 """Module adjusted to satisfy style checks."""
 
+import os
+
 from sweetfish.db import MemoryDB
+from sweetfish.persistence import open_durable_db
+from sweetfish.sqlite_db import SQLiteDB
 from sweetfish.models import Role
 from sweetfish.services.auth import AuthService
 from sweetfish.ui.app import SweetFishApp
@@ -58,7 +62,16 @@ if __name__ == "__main__":
     # ===========================
     # 原主程序逻辑
     # ===========================
-    db = MemoryDB()
+    # SWEETFISH_SQLITE 指定 SQLite 存储引擎；
+    # 设置 SWEETFISH_DATA_DIR 时启用持久化（WAL + 快照），否则纯内存
+    sqlite_path = os.environ.get("SWEETFISH_SQLITE")
+    data_dir = os.environ.get("SWEETFISH_DATA_DIR")
+    if sqlite_path:
+        db = SQLiteDB(sqlite_path)
+    elif data_dir:
+        db = open_durable_db(data_dir, fsync=os.environ.get("SWEETFISH_FSYNC", "batch"))
+    else:
+        db = MemoryDB()
     auth = AuthService(db)
 
     admin = db.get_user_by_phone("000000")
@@ -66,9 +79,13 @@ if __name__ == "__main__":
         # 默认管理员: 账号 000000 密码 admin123
         admin = auth.register("000000", "Admin", "admin")
         admin.role = Role.ADMIN
-        db.users[admin.user_id] = admin
+        db.add_user(admin)
     else:
         print("ℹ️ 管理员账号已存在。")
 
     app = SweetFishApp(db)
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        if db.journal is not None:
+            db.journal.close()
@@ -0,0 +1,371 @@
+"""Memory-mapped columnar snapshot format for MemoryDB.
+
+Layout: ``MAGIC | column sections ... | header JSON | u64 header offset``.
+Numeric fields are fixed-width native-endian columns (int64 / int8 /
+float64, datetimes as int64 microseconds since the epoch); text fields are
+an int64 offset column into a per-column UTF-8 string heap plus a null
+flag column. Loading maps the file and wraps each table in a
+:class:`LazyTable`, so objects are only built when they are accessed.
+"""
+
+import dataclasses
+import datetime
+import enum
+import json
+import mmap
+import os
+import struct
+import sys
+import typing
+from array import array
+from collections import ChainMap
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import models
+from .db import MemoryDB
+from .persistence import converter_for, to_jsonable
+
+MAGIC = b"SWFCOL1\0"
+_EPOCH = datetime.datetime(1970, 1, 1)
+_NULL_TS = -(2 ** 63)
+_SET_SEP = "\x1f"
+
+# 数值列的 array typecode
+_FIXED = {"i64": "q", "bool": "b", "f64": "d", "dt": "q"}
+
+# (表名, 该表可能出现的模型类)；用户表混合三种角色
+_TABLES: List[Tuple[str, Tuple[type, ...]]] = [
+    ("user", (models.BaseUser, models.Merchant, models.Admin)),
+    ("product", (models.Product,)),
+    ("order", (models.Order,)),
+    ("payment", (models.Payment,)),
+    ("bargain", (models.Bargain,)),
+    ("review", (models.Review,)),
+]
+
+
+def _kind_of(tp: Any) -> str:
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+    if origin is typing.Union:
+        return _kind_of([a for a in args if a is not type(None)][0])
+    if tp is bool:
+        return "bool"
+    if tp is int:
+        return "i64"
+    if tp is float:
+        return "f64"
+    if tp is datetime.datetime:
+        return "dt"
+    if tp is str:
+        return "str"
+    if isinstance(tp, type) and issubclass(tp, enum.Enum):
+        return "enum"
+    if origin is set and args == (str,):
+        return "strset"
+    return "json"
+
+
+def _schema(classes: Tuple[type, ...]) -> Dict[str, Tuple[str, Any]]:
+    """field name -> (kind, annotated type), the union over ``classes``."""
+    schema: Dict[str, Tuple[str, Any]] = {}
+    for cls in classes:
+        hints = typing.get_type_hints(cls)
+        for f in dataclasses.fields(cls):
+            schema.setdefault(f.name, (_kind_of(hints[f.name]), hints[f.name]))
+    return schema
+
+
+# =============================
+#        写入
+# =============================
+class _Writer:
+
+    def __init__(self, f) -> None:
+        self.f = f
+        self.pos = f.tell()
+
+    def section(self, data: bytes) -> List[int]:
+        # 8 字节对齐，保证 mmap 后按 int64 读取是对齐的
+        pad = (-self.pos) % 8
+        if pad:
+            self.f.write(b"\0" * pad)
+            self.pos += pad
+        start = self.pos
+        self.f.write(data)
+        self.pos += len(data)
+        return [start, len(data)]
+
+
+def _encode_cell(kind: str, value: Any) -> Any:
+    if kind == "dt":
+        if value is None:
+            return _NULL_TS
+        return (value - _EPOCH) // datetime.timedelta(microseconds=1)
+    if kind in ("i64", "bool", "f64"):
+        return value or 0
+    if value is None:
+        return None
+    if kind == "enum":
+        return str(value.value)
+    if kind == "strset":
+        return _SET_SEP.join(sorted(value))
+    if kind == "json":
+        return json.dumps(to_jsonable(value), separators=(",", ":"), ensure_ascii=False)
+    return value
+
+
+def _write_column(w: _Writer, kind: str, cells: List[Any]) -> Dict[str, Any]:
+    if kind in _FIXED:
+        data = array(_FIXED[kind], cells)
+        return {"kind": kind, "data": w.section(data.tobytes())}
+    offsets = array("q", [0])
+    nulls = array("b")
+    chunks = []
+    total = 0
+    for cell in cells:
+        if cell is None:
+            nulls.append(1)
+        else:
+            raw = cell.encode("utf-8")
+            chunks.append(raw)
+            total += len(raw)
+            nulls.append(0)
+        offsets.append(total)
+    return {
+        "kind": kind,
+        "offsets": w.section(offsets.tobytes()),
+        "nulls": w.section(nulls.tobytes()),
+        "heap": w.section(b"".join(chunks)),
+    }
+
+
+def write_columnar_snapshot(db: MemoryDB, path: str, lsn: int = 0) -> None:
+    sources = {
+        "user": db.users, "product": db.products, "order": db.orders,
+        "payment": db.payments, "review": db.reviews,
+        "bargain": ChainMap(db.bargains, db.bargain_archive),
+    }
+    tmp = path + ".tmp"
+    # 数值列按本机字节序写入，读取时直接 cast，不做转换
+    header: Dict[str, Any] = {"lsn": lsn, "byteorder": sys.byteorder, "tables": {}}
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        w = _Writer(f)
+        for name, classes in _TABLES:
+            rows = list(sources[name].values())
+            schema = _schema(classes)
+            columns = {}
+            for field_name, (kind, _) in schema.items():
+                cells = [_encode_cell(kind, getattr(obj, field_name, None)) for obj in rows]
+                columns[field_name] = _write_column(w, kind, cells)
+            columns["__cls__"] = _write_column(w, "str", [type(obj).__name__ for obj in rows])
+            header["tables"][name] = {"rows": len(rows), "columns": columns}
+        header["notifications"] = to_jsonable(db.notifications)
+        header_offset = w.section(json.dumps(header, ensure_ascii=False).encode("utf-8"))[0]
+        f.write(struct.pack("<Q", header_offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# =============================
+#        读取
+# =============================
+class _Column:
+    """Read-only view of one column inside the mapped file."""
+
+    def __init__(self, snap: "ColumnarSnapshot", meta: Dict[str, Any], rows: int) -> None:
+        self.kind = meta["kind"]
+        self.rows = rows
+        if self.kind in _FIXED:
+            self._values = snap.view(meta["data"], _FIXED[self.kind])
+        else:
+            self._offsets = snap.view(meta["offsets"], "q")
+            self._nulls = snap.view(meta["nulls"], "b")
+            self._heap = snap.view(meta["heap"])
+
+    def raw(self, row: int) -> Any:
+        if self.kind in _FIXED:
+            return self._values[row]
+        if self._nulls[row]:
+            return None
+        return str(self._heap[self._offsets[row]:self._offsets[row + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in range(self.rows):
+            yield self.raw(row)
+
+
+def _cell_decoder(kind: str, tp: Any) -> Callable[[Any], Any]:
+    if kind == "dt":
+        return lambda v: None if v == _NULL_TS else _EPOCH + datetime.timedelta(microseconds=v)
+    if kind == "bool":
+        return bool
+    if kind == "strset":
+        return lambda v: set(v.split(_SET_SEP)) if v else set()
+    if kind == "enum":
+        enum_cls = tp
+        if typing.get_origin(tp) is typing.Union:
+            enum_cls = [a for a in typing.get_args(tp) if a is not type(None)][0]
+        return lambda v: None if v is None else enum_cls(v)
+    if kind == "json":
+        convert = converter_for(tp)
+        return lambda v: None if v is None else convert(json.loads(v))
+    return lambda v: v
+
+
+class LazyTable(MutableMapping):
+    """dict-like table whose rows are hydrated from the mapped file on access.
+
+    Keys keep snapshot order; objects assigned later are stored as-is and
+    take precedence over the mapped row.
+    """
+
+    def __init__(self, keys: Iterator[str], hydrate: Callable[[int], Any]) -> None:
+        # key -> 行号；-1 表示快照之后新写入的对象
+        self._rows: Dict[str, int] = {k: i for i, k in enumerate(keys)}
+        self._objects: Dict[str, Any] = {}
+        self._hydrate = hydrate
+
+    @property
+    def hydrated(self) -> int:
+        return len(self._objects)
+
+    def __getitem__(self, key: str) -> Any:
+        obj = self._objects.get(key)
+        if obj is None:
+            row = self._rows[key]
+            obj = self._objects.setdefault(key, self._hydrate(row))
+        return obj
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._rows.setdefault(key, -1)
+        self._objects[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._rows[key]
+        self._objects.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._rows))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class ColumnarSnapshot:
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+        self._views: List[memoryview] = []
+        if bytes(self._buf[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError("not a columnar snapshot")
+        (header_offset,) = struct.unpack("<Q", self._buf[-8:])
+        self.header = json.loads(str(self._buf[header_offset:-8], "utf-8"))
+        self.lsn: int = self.header["lsn"]
+        if self.header.get("byteorder") != sys.byteorder:
+            self.close()
+            raise ValueError("snapshot was written with a different byte order")
+
+    def view(self, span: List[int], fmt: Optional[str] = None) -> memoryview:
+        start, length = span
+        v = self._buf[start:start + length]
+        if fmt is not None:
+            v = v.cast(fmt)
+        self._views.append(v)
+        return v
+
+    def columns(self, table: str) -> Dict[str, _Column]:
+        meta = self.header["tables"][table]
+        return {name: _Column(self, m, meta["rows"]) for name, m in meta["columns"].items()}
+
+    def close(self) -> None:
+        for v in self._views:
+            v.release()
+        self._views.clear()
+        self._buf.release()
+        self._mm.close()
+        self._file.close()
+
+    # -----------------------------
+    def _hydrator(self, table: str, classes: Tuple[type, ...]) -> Callable[[int], Any]:
+        cols = self.columns(table)
+        by_name = {cls.__name__: cls for cls in classes}
+        schema = _schema(classes)
+        decoders = {name: _cell_decoder(kind, tp) for name, (kind, tp) in schema.items()}
+        class_fields = {
+            cls.__name__: [f.name for f in dataclasses.fields(cls)] for cls in classes
+        }
+
+        def hydrate(row: int) -> Any:
+            cls_name = cols["__cls__"].raw(row)
+            kwargs = {name: decoders[name](cols[name].raw(row)) for name in class_fields[cls_name]}
+            return by_name[cls_name](**kwargs)
+
+        return hydrate
+
+    def load_into(self, db: MemoryDB) -> MemoryDB:
+        """Attach lazily hydrated tables to ``db`` and build its indexes from columns."""
+        tables = {}
+        for name, classes in _TABLES:
+            cols = self.columns(name)
+            key = {"user": "user_id", "product": "product_id", "order": "order_id",
+                   "payment": "payment_id", "bargain": "bargain_id", "review": "review_id"}[name]
+            tables[name] = (LazyTable(iter(cols[key]), self._hydrator(name, classes)), cols)
+
+        users, ucols = tables["user"]
+        products, pcols = tables["product"]
+
+        def product_texts():
+            for pid, title, desc, tags in zip(pcols["product_id"], pcols["title"],
+                                              pcols["description"], pcols["tags"]):
+                tag_set = set(tags.split(_SET_SEP)) if tags else set()
+                yield pid, (title.lower(), (desc or "").lower(), " ".join(tag_set).lower())
+
+        orders, ocols = tables["order"]
+
+        def order_keys():
+            for oid, buyer, merchant, items, status in zip(
+                    ocols["order_id"], ocols["buyer_id"], ocols["merchant_id"],
+                    ocols["items"], ocols["status"]):
+                pids = [it["product_id"] for it in json.loads(items)] if items else []
+                yield oid, buyer, merchant, pids, models.OrderStatus(status)
+
+        # 同一份映射拆成进行中与已归档两张表，各自删掉不属于自己的行
+        bargains, bcols = tables["bargain"]
+        archive = LazyTable(iter(bcols["bargain_id"]),
+                            self._hydrator("bargain", dict(_TABLES)["bargain"]))
+        for bid, closed in zip(bcols["bargain_id"], bcols["closed"]):
+            del (bargains if closed else archive)[bid]
+        reviews, rcols = tables["review"]
+
+        # 二级索引全部从列建立，不水合对象；文本倒排索引与排行榜推迟到第一次用到时再建
+        db.bulk_load(
+            users=users, products=products, orders=orders, payments=tables["payment"][0],
+            bargains=bargains, bargain_archive=archive, reviews=reviews,
+            notifications=list(self.header.get("notifications", [])),
+            user_phones=zip(ucols["phone"], ucols["user_id"]),
+            product_texts=product_texts(),
+            product_ranks=zip(pcols["product_id"], pcols["promotion_rank"], pcols["views"],
+                              pcols["sold"]),
+            product_merchants=zip(pcols["product_id"], pcols["merchant_id"]),
+            order_keys=order_keys(),
+            review_keys=zip(rcols["review_id"], rcols["product_id"], rcols["rating"]),
+        )
+        return db
+
+
+def load_columnar_snapshot(path: str) -> MemoryDB:
+    """Open a columnar snapshot and return a MemoryDB that serves from it.
+
+    The mapping stays open for as long as the db's lazy tables reference it.
+    """
+    return ColumnarSnapshot(path).load_into(MemoryDB())
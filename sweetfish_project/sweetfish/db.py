@@ -2,40 +2,164 @@
 Project module adjusted for pylint-friendly style.
 """
 
+import base64
+import heapq
+import itertools
 import threading
-from typing import Dict, List, Optional, Tuple
+from typing import (Any, Callable, ContextManager, Dict, Iterable, Iterator, List, MutableMapping,
+                    Optional, Tuple)
 
 from . import models
+from .locks import StripedLock, acquire_all
+from .ranking import RankedSet
+from .search_index import Fields, ProductTextIndex, product_fields
+
+
+OrderListener = Callable[[models.Order, Optional[models.OrderStatus]], None]
+# (order_id, buyer_id, merchant_id, product_ids, status)
+OrderKeys = Tuple[str, str, str, List[str], models.OrderStatus]
+
+
+def encode_cursor(key: Tuple[int, ...]) -> str:
+    """Opaque page cursor for a rank key; shared by every storage backend."""
+    raw = ",".join(str(k) for k in key).encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, ...]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii")
+        return tuple(int(k) for k in raw.split(","))
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("invalid cursor") from exc
 
 
 class MemoryDB:
 
 
-    def __init__(self) -> None:
+    def __init__(self, lock_stripes: int = 64) -> None:
         # user
         self.users: Dict[str, models.BaseUser] = {}
         self.user_phone_index: Dict[str, str] = {}
 
         # product
         self.products: Dict[str, models.Product] = {}
+        # 搜索倒排索引 + 插入序号（排序时保持与原线性扫描相同的稳定次序）
+        self.product_index = ProductTextIndex()
+        self._product_seq: Dict[str, int] = {}
+        self._seq_counter = itertools.count()
+        # 从列式快照冷启动时，倒排索引推迟到第一次搜索再建
+        self._pending_product_index: Optional[Iterator[Tuple[str, Fields]]] = None
+        # 增量维护的排行榜：综合热度（同 _rank_key）与销量，写入时 O(log n) 更新
+        self._popular = RankedSet()
+        self._best_sellers = RankedSet()
+        self._pending_product_ranks: Optional[Iterator[Tuple[str, int, int, int]]] = None
+        # 商家 -> 有序的 product_id 集合
+        self._products_by_merchant: Dict[str, Dict[str, None]] = {}
+        # 直接改 views/sold/promotion_rank 时由 Product 回调 rerank_product
+        models.watch_product_ranks(self)
 
         # order
         self.orders: Dict[str, models.Order] = {}
+        # 订单二级索引：key -> 有序的 order_id 集合（dict 保留插入顺序）
+        self._orders_by_buyer: Dict[str, Dict[str, None]] = {}
+        self._orders_by_merchant: Dict[str, Dict[str, None]] = {}
+        self._orders_by_product: Dict[str, Dict[str, None]] = {}
+        self._orders_by_status: Dict[models.OrderStatus, Dict[str, None]] = {}
+        self._order_status: Dict[str, models.OrderStatus] = {}
         self.payments: Dict[str, models.Payment] = {}
         self.bargains: Dict[str, models.Bargain] = {}
+        # 已关闭的砍价移出 bargains，热表里只留进行中的
+        self.bargain_archive: Dict[str, models.Bargain] = {}
         self.reviews: Dict[str, models.Review] = {}
+        self._reviews_by_product: Dict[str, Dict[str, None]] = {}
+        self._review_stats: Dict[str, models.ReviewStats] = {}
 
         # 通知（admin）
         self.notifications: List[dict] = []
 
-        # 线程锁，保证多线程访问安全
-        self._lock = threading.RLock()
+        # 分段锁：每类实体按主键散列到各自的锁，不同 key 的写入互不阻塞。
+        # 二级索引只做单次 dict 赋值/删除（GIL 下原子），同一实体的
+        # 复合更新由该实体的分段锁串行化；扫描一律先拷贝再遍历（见 scan）。
+        self._user_locks = StripedLock(lock_stripes)
+        self._product_locks = StripedLock(lock_stripes)
+        self._order_locks = StripedLock(lock_stripes)
+        self._payment_locks = StripedLock(lock_stripes)
+        self._bargain_locks = StripedLock(lock_stripes)
+        # 评论按商品分段，聚合统计与评论同锁
+        self._review_locks = StripedLock(lock_stripes)
+        self._notification_lock = threading.RLock()
+
+        # 可选的持久化日志（见 persistence.DurableStore），为 None 时纯内存
+        self.journal = None
+        # 商品变更订阅者，回调参数为 (op, product)，op 为 "put" 或 "del"
+        self._product_listeners: List[Callable[[str, models.Product], None]] = []
+        # 订单状态变更订阅者，回调参数为 (order, 变更前状态)，新订单的旧状态为 None
+        self._order_listeners: List[OrderListener] = []
+        self._payment_listeners: List[Callable[[models.Payment], None]] = []
+
+    def _journal(self, op: str, table: str, value) -> None:
+        if self.journal is not None:
+            self.journal.record(op, table, value)
+
+    def subscribe_products(self, listener: Callable[[str, models.Product], None]) -> None:
+        """Call ``listener(op, product)`` after every product write or delete."""
+        self._product_listeners.append(listener)
+
+    def _notify_product(self, op: str, p: models.Product) -> None:
+        for listener in self._product_listeners:
+            listener(op, p)
+
+    def subscribe_orders(self, listener: OrderListener) -> None:
+        """Call ``listener(order, old_status)`` after every order status change."""
+        self._order_listeners.append(listener)
+
+    def unsubscribe_orders(self, listener: OrderListener) -> None:
+        """Stop calling ``listener``; unknown listeners are ignored."""
+        # 换新列表而不是原地删除，正在通知的线程继续遍历旧列表
+        self._order_listeners = [f for f in self._order_listeners if f != listener]
+
+    def _notify_order(self, order: models.Order, old: Optional[models.OrderStatus]) -> None:
+        if old != order.status:
+            for listener in self._order_listeners:
+                listener(order, old)
+
+    def subscribe_payments(self, listener: Callable[[models.Payment], None]) -> None:
+        """Call ``listener(payment)`` after every payment write."""
+        self._payment_listeners.append(listener)
+
+    def exclusive(self) -> ContextManager[None]:
+        """Hold every stripe of every table, e.g. for a snapshot consistent with the WAL."""
+        return acquire_all(itertools.chain(
+            self._user_locks, self._product_locks, self._order_locks, self._payment_locks,
+            self._bargain_locks, self._review_locks, [self._notification_lock],
+        ))
+
+    def scan(self, table: str) -> List[Any]:
+        """Point-in-time copy of a table's rows, safe to iterate while writers run."""
+        rows = getattr(self, table)
+        if isinstance(rows, dict):
+            # C 层一次性拷贝，期间持有 GIL，不会与写入交错
+            return list(rows.values())
+        # 列式快照的 LazyTable：键已是拷贝，遍历期间被删除的行跳过
+        return [v for v in (rows.get(k) for k in list(rows)) if v is not None]
+
+    def scan_chunks(self, table: str, size: int = 1000) -> Iterator[List[Any]]:
+        """Like :meth:`scan`, but materializes ``size`` rows at a time."""
+        if size <= 0:
+            raise ValueError("size must be positive")
+        rows = getattr(self, table)
+        keys = list(rows)
+        for i in range(0, len(keys), size):
+            found = (rows.get(k) for k in keys[i:i + size])
+            yield [v for v in found if v is not None]
 
     # 用户
     def add_user(self, user: models.BaseUser) -> None:
-        with self._lock:
+        with self._user_locks(user.user_id):
             self.users[user.user_id] = user
             self.user_phone_index[user.phone] = user.user_id
+            self._journal("put", "user", user)
 
     def get_user_by_id(self, user_id: str) -> Optional[models.BaseUser]:
         return self.users.get(user_id)
@@ -46,66 +170,397 @@ class MemoryDB:
 
     # 商品
     def add_product(self, p: models.Product) -> None:
-        with self._lock:
+        with self._product_locks(p.product_id):
+            old = self.products.get(p.product_id)
+            if old is None:
+                self._product_seq[p.product_id] = next(self._seq_counter)
+            elif old.merchant_id != p.merchant_id:
+                self._products_by_merchant.get(old.merchant_id, {}).pop(p.product_id, None)
             self.products[p.product_id] = p
+            self._products_by_merchant.setdefault(p.merchant_id, {})[p.product_id] = None
+            self.product_index.add(p.product_id, product_fields(p))
+            self._rank_product(p)
+            self._journal("put", "product", p)
+            self._notify_product("put", p)
 
     def get_product(self, pid: str) -> Optional[models.Product]:
         return self.products.get(pid)
 
+    def list_products_for_merchant(self, merchant_id: str) -> List[models.Product]:
+        # 与 SQLiteDB 一致按上架先后排列；改过商家的商品保留原来的位置
+        pids = list(self._products_by_merchant.get(merchant_id, ()))
+        return self._products_of(sorted(pids, key=lambda pid: self._product_seq.get(pid, 0)))
+
+    def remove_product(self, pid: str) -> Optional[models.Product]:
+        with self._product_locks(pid):
+            p = self.products.pop(pid, None)
+            self._product_seq.pop(pid, None)
+            self.product_index.remove(pid)
+            self._popular.discard(pid)
+            self._best_sellers.discard(pid)
+            if p is not None:
+                self._products_by_merchant.get(p.merchant_id, {}).pop(pid, None)
+                self._journal("del", "product", pid)
+                self._notify_product("del", p)
+            return p
+
+    def reindex_product(self, p: models.Product) -> None:
+        """Refresh the search index after title/description/tags were edited."""
+        with self._product_locks(p.product_id):
+            if p.product_id in self.products:
+                self.product_index.add(p.product_id, product_fields(p))
+                self._rank_product(p)
+                self._journal("put", "product", p)
+                self._notify_product("put", p)
+
+    def touch_product(self, p: models.Product) -> None:
+        """Record in-place changes to a product's stock or counters."""
+        with self._product_locks(p.product_id):
+            if p.product_id in self.products:
+                self._rank_product(p)
+                self._journal("put", "product", p)
+                self._notify_product("put", p)
+
+    def rerank_product(self, p: models.Product) -> None:
+        """Re-key ``p`` on the rankings after an in-place edit of its rank fields."""
+        # 只处理本库中的当前对象；RankedSet 自带锁，这里不再拿商品条带锁
+        if self.products.get(p.product_id) is p:
+            self._rank_product(p)
+
+    def lock_products(self, pids: Iterable[str]) -> ContextManager[None]:
+        """Hold the stripes of ``pids`` for a read-modify-write of their stock."""
+        return self._product_locks.many(pids)
+
+    def defer_product_index(self, entries: Iterable[Tuple[str, Fields]]) -> None:
+        """Index ``(product_id, fields)`` entries lazily, on the first search."""
+        with acquire_all(self._product_locks):
+            self._pending_product_index = iter(entries)
+
+    def _ensure_product_index(self) -> None:
+        if self._pending_product_index is None:
+            return
+        with acquire_all(self._product_locks):
+            pending, self._pending_product_index = self._pending_product_index, None
+            if pending is None:
+                return
+            for pid, fields in pending:
+                # 已删除或已重新索引的商品以当前状态为准
+                if pid in self.products and pid not in self.product_index:
+                    self.product_index.add(pid, fields)
+
+    def _rank_key(self, p: models.Product) -> Tuple[int, int, int, int]:
+        return (-p.promotion_rank, -p.views, -p.sold, self._product_seq.get(p.product_id, 0))
+
+    def _rank_product(self, p: models.Product) -> None:
+        seq = self._product_seq.get(p.product_id, 0)
+        self._popular.put(p.product_id, (-p.promotion_rank, -p.views, -p.sold, seq))
+        self._best_sellers.put(p.product_id, (-p.sold, seq))
+
+    def defer_product_ranking(self, entries: Iterable[Tuple[str, int, int, int]]) -> None:
+        """Rank ``(product_id, promotion_rank, views, sold)`` entries on first use."""
+        with acquire_all(self._product_locks):
+            self._popular = RankedSet()
+            self._best_sellers = RankedSet()
+            self._pending_product_ranks = iter(entries)
+
+    def _ensure_product_ranking(self) -> None:
+        if self._pending_product_ranks is None:
+            return
+        with acquire_all(self._product_locks):
+            pending, self._pending_product_ranks = self._pending_product_ranks, None
+            if pending is None:
+                return
+            for pid, rank, views, sold in pending:
+                # 快照之后写过的商品已按当前状态入榜
+                if pid in self.products and pid not in self._popular:
+                    seq = self._product_seq.get(pid, 0)
+                    self._popular.put(pid, (-rank, -views, -sold, seq))
+                    self._best_sellers.put(pid, (-sold, seq))
+
+    def _products_of(self, pids: Iterable[str]) -> List[models.Product]:
+        found = (self.products.get(pid) for pid in pids)
+        return [p for p in found if p is not None]
+
+    def top_selling_products(self, limit: int) -> List[models.Product]:
+        """The ``limit`` best sellers, most sold first (ties in insertion order)."""
+        self._ensure_product_ranking()
+        return self._products_of(self._best_sellers.first(limit))
+
     def search_products(self, keyword: str = "") -> List[models.Product]:
+        self._ensure_product_index()
+        if not keyword:
+            # 排行榜已按 _rank_key 有序，无需整表排序
+            self._ensure_product_ranking()
+            return self._products_of(self._popular.first(len(self._popular)))
         res = []
-        low = keyword.lower()
-        for p in self.products.values():
-            if (
-                not keyword
-                or low in p.title.lower()
-                or low in p.description.lower()
-                or low in " ".join(p.tags).lower()
-            ):
+        for pid in self.product_index.search(keyword):
+            p = self.products.get(pid)
+            if p is not None:
                 res.append(p)
-        res.sort(key=lambda q: (-q.promotion_rank, -q.views, -q.sold))
+        res.sort(key=self._rank_key)
         return res
 
+    def search_products_page(
+        self, keyword: str = "", limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[models.Product], Optional[str]]:
+        """Return one page of search results plus a continuation cursor.
+
+        The page is picked with a bounded heap (O(N log k)) instead of sorting
+        every match; the cursor encodes the rank key of the last row, so the
+        next call resumes strictly after it without re-sorting.
+        """
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        after = decode_cursor(cursor) if cursor else None
+        if not keyword:
+            # 首页/冷启动：直接从热度排行榜的游标位置往后取，O(log n + limit)
+            self._ensure_product_ranking()
+            ranked = self._popular.items(limit + 1, after=after)
+            page = self._products_of(pid for _, pid in ranked[:limit])
+            next_cursor = encode_cursor(ranked[limit - 1][0]) if len(ranked) > limit else None
+            return page, next_cursor
+        self._ensure_product_index()
+        found = (self.products.get(pid) for pid in self.product_index.search(keyword))
+        candidates = [p for p in found if p is not None]
+        keyed = ((self._rank_key(p), p) for p in candidates)
+        if after is not None:
+            keyed = (kp for kp in keyed if kp[0] > after)
+        # 多取一个，用来判断是否还有下一页
+        top = heapq.nsmallest(limit + 1, keyed, key=lambda kp: kp[0])
+        page = top[:limit]
+        next_cursor = encode_cursor(page[-1][0]) if len(top) > limit else None
+        return [p for (_, p) in page], next_cursor
+
     # 订单交易
     def add_order(self, order: models.Order) -> None:
-        with self._lock:
-            self.orders[order.order_id] = order
+        with self._order_locks(order.order_id):
+            self._put_order(order)
+
+    def add_orders(self, orders: List[models.Order]) -> None:
+        """Insert a batch of orders, taking each of their lock stripes once."""
+        with self._order_locks.many(o.order_id for o in orders):
+            for order in orders:
+                self._put_order(order)
+
+    def _put_order(self, order: models.Order) -> None:
+        old = self.orders.get(order.order_id)
+        old_status = self._order_status.get(order.order_id)
+        if old is not None:
+            self._unindex_order(old)
+        self.orders[order.order_id] = order
+        self._index_order(order)
+        self._journal("put", "order", order)
+        self._notify_order(order, old_status)
 
     def get_order(self, oid: str) -> Optional[models.Order]:
         return self.orders.get(oid)
 
+    def _index_order(self, order: models.Order) -> None:
+        self._index_order_keys(order.order_id, order.buyer_id, order.merchant_id,
+                               [it.product_id for it in order.items], order.status)
+
+    def _index_order_keys(self, oid: str, buyer_id: str, merchant_id: str,
+                          product_ids: List[str], status: models.OrderStatus) -> None:
+        self._orders_by_buyer.setdefault(buyer_id, {})[oid] = None
+        self._orders_by_merchant.setdefault(merchant_id, {})[oid] = None
+        for pid in product_ids:
+            self._orders_by_product.setdefault(pid, {})[oid] = None
+        self._orders_by_status.setdefault(status, {})[oid] = None
+        self._order_status[oid] = status
+
+    def _unindex_order(self, order: models.Order) -> None:
+        oid = order.order_id
+        self._orders_by_buyer.get(order.buyer_id, {}).pop(oid, None)
+        self._orders_by_merchant.get(order.merchant_id, {}).pop(oid, None)
+        for it in order.items:
+            self._orders_by_product.get(it.product_id, {}).pop(oid, None)
+        status = self._order_status.pop(oid, order.status)
+        self._orders_by_status.get(status, {}).pop(oid, None)
+
+    def set_order_status(self, order: models.Order, status: models.OrderStatus) -> None:
+        """Change an order's status and keep the status index in step."""
+        with self._order_locks(order.order_id):
+            oid = order.order_id
+            old = self._order_status.get(oid)
+            if old is not None:
+                self._orders_by_status.get(old, {}).pop(oid, None)
+            order.status = status
+            if oid in self.orders:
+                self._orders_by_status.setdefault(status, {})[oid] = None
+                self._order_status[oid] = status
+                self._journal("put", "order", order)
+                self._notify_order(order, old)
+
+    def mark_order_paid(self, order: models.Order, payment_id: str) -> None:
+        with self._order_locks(order.order_id):
+            order.mark_paid(payment_id)
+            self.set_order_status(order, order.status)
+
+    def _orders_from(self, ids: Optional[Dict[str, None]]) -> List[models.Order]:
+        if not ids:
+            return []
+        found = (self.orders.get(oid) for oid in list(ids))
+        return [o for o in found if o is not None]
+
+    def list_orders_for_buyer(self, buyer_id: str) -> List[models.Order]:
+        return self._orders_from(self._orders_by_buyer.get(buyer_id))
+
+    def list_orders_for_merchant(self, merchant_id: str) -> List[models.Order]:
+        return self._orders_from(self._orders_by_merchant.get(merchant_id))
+
+    def list_orders_for_product(self, product_id: str) -> List[models.Order]:
+        return self._orders_from(self._orders_by_product.get(product_id))
+
+    def list_orders_by_status(self, status: models.OrderStatus) -> List[models.Order]:
+        return self._orders_from(self._orders_by_status.get(status))
+
     def add_payment(self, pay: models.Payment) -> None:
-        with self._lock:
+        with self._payment_locks(pay.payment_id):
             self.payments[pay.payment_id] = pay
+            self._journal("put", "payment", pay)
+            for listener in self._payment_listeners:
+                listener(pay)
 
     def get_payment(self, pid: str) -> Optional[models.Payment]:
         return self.payments.get(pid)
 
     def add_bargain(self, b: models.Bargain) -> None:
-        with self._lock:
-            self.bargains[b.bargain_id] = b
+        """Store a bargain; a closed one is moved from ``bargains`` to the archive."""
+        with self._bargain_locks(b.bargain_id):
+            if b.closed:
+                self.bargains.pop(b.bargain_id, None)
+                self.bargain_archive[b.bargain_id] = b
+            else:
+                self.bargains[b.bargain_id] = b
+            self._journal("put", "bargain", b)
 
     def get_bargain(self, bid: str) -> Optional[models.Bargain]:
-        return self.bargains.get(bid)
+        b = self.bargains.get(bid)
+        return b if b is not None else self.bargain_archive.get(bid)
 
     # 评论
     def add_review(self, r: models.Review) -> None:
-        with self._lock:
-            self.reviews[r.review_id] = r
+        # 先校验再动索引，避免摘掉旧评论后才发现新评分非法
+        models.check_rating(r.rating)
+        while True:
+            # 改挂到别的商品时需要同时持有新旧两个商品的分段
+            old = self.reviews.get(r.review_id)
+            pids = {r.product_id} if old is None else {r.product_id, old.product_id}
+            with self._review_locks.many(pids):
+                if self.reviews.get(r.review_id) is not old:
+                    continue
+                if old is not None:
+                    self._reviews_by_product.get(old.product_id, {}).pop(old.review_id, None)
+                    self._review_stats[old.product_id].remove(old.rating)
+                self.reviews[r.review_id] = r
+                self._index_review(r.review_id, r.product_id, r.rating)
+                self._journal("put", "review", r)
+                return
+
+    def _index_review(self, rid: str, pid: str, rating: int) -> None:
+        self._reviews_by_product.setdefault(pid, {})[rid] = None
+        self._review_stats.setdefault(pid, models.ReviewStats()).add(rating)
 
     def list_reviews_for_product(self, pid: str) -> List[models.Review]:
-        product_reviews = []
-        for review in self.reviews.values():
-            if review.product_id == pid:
-                product_reviews.append(review)
+        ids = self._reviews_by_product.get(pid)
+        if not ids:
+            return []
+        found = (self.reviews.get(rid) for rid in list(ids))
+        return [r for r in found if r is not None]
 
-        return product_reviews
+    def get_review_stats(self, pid: str) -> models.ReviewStats:
+        """O(1) rating aggregates (count/sum/histogram/average) for a product."""
+        with self._review_locks(pid):
+            stats = self._review_stats.get(pid)
+            if stats is None:
+                return models.ReviewStats()
+            return models.ReviewStats(stats.count, stats.total, list(stats.histogram))
 
     # 通知
     def add_notification(self, notif: dict) -> None:
-        with self._lock:
+        with self._notification_lock:
             self.notifications.append(notif)
+            self._journal("put", "notification", notif)
 
     def get_notifications(self) -> List[dict]:
-        with self._lock:
+        with self._notification_lock:
             return self.notifications.copy()
+
+    # =============================
+    # 批量装载
+    # =============================
+    def bulk_load(
+        self,
+        users: Optional[MutableMapping[str, models.BaseUser]] = None,
+        products: Optional[MutableMapping[str, models.Product]] = None,
+        orders: Optional[MutableMapping[str, models.Order]] = None,
+        payments: Optional[MutableMapping[str, models.Payment]] = None,
+        bargains: Optional[MutableMapping[str, models.Bargain]] = None,
+        bargain_archive: Optional[MutableMapping[str, models.Bargain]] = None,
+        reviews: Optional[MutableMapping[str, models.Review]] = None,
+        notifications: Optional[List[dict]] = None,
+        *,
+        user_phones: Optional[Iterable[Tuple[str, str]]] = None,
+        product_texts: Optional[Iterable[Tuple[str, Fields]]] = None,
+        product_ranks: Optional[Iterable[Tuple[str, int, int, int]]] = None,
+        product_merchants: Optional[Iterable[Tuple[str, str]]] = None,
+        order_keys: Optional[Iterable[OrderKeys]] = None,
+        review_keys: Optional[Iterable[Tuple[str, str, int]]] = None,
+    ) -> None:
+        """Replace every table in one pass, e.g. when restoring a snapshot.
+
+        Nothing is journaled and no listener is called. Tables are mappings
+        keyed by id, plain dicts or lazily hydrated ones; products keep the
+        mapping's order. Secondary indexes come from the ``*_keys`` style
+        iterables when given (``(phone, user_id)``, ``(product_id, fields)``,
+        ``(product_id, promotion_rank, views, sold)``, ``(product_id,
+        merchant_id)``, :data:`OrderKeys`,
+        ``(review_id, product_id, rating)``), so lazy rows stay unhydrated,
+        and from the entities otherwise. The text index and the rankings
+        are built on first use.
+        """
+        users = {} if users is None else users
+        products = {} if products is None else products
+        orders = {} if orders is None else orders
+        reviews = {} if reviews is None else reviews
+        if user_phones is None:
+            user_phones = [(u.phone, uid) for uid, u in users.items()]
+        if product_texts is None or product_ranks is None or product_merchants is None:
+            items = list(products.items())
+            if product_texts is None:
+                product_texts = ((pid, product_fields(p)) for pid, p in items)
+            if product_ranks is None:
+                product_ranks = ((pid, p.promotion_rank, p.views, p.sold) for pid, p in items)
+            if product_merchants is None:
+                product_merchants = ((pid, p.merchant_id) for pid, p in items)
+        if order_keys is None:
+            order_keys = ((oid, o.buyer_id, o.merchant_id, [it.product_id for it in o.items],
+                           o.status) for oid, o in orders.items())
+        if review_keys is None:
+            review_keys = ((rid, r.product_id, r.rating) for rid, r in reviews.items())
+        with self.exclusive():
+            self.users = users
+            self.user_phone_index = dict(user_phones)
+            self.products = products
+            self._product_seq = {pid: i for i, pid in enumerate(products)}
+            self._seq_counter = itertools.count(len(self._product_seq))
+            self._products_by_merchant = {}
+            for pid, merchant_id in product_merchants:
+                self._products_by_merchant.setdefault(merchant_id, {})[pid] = None
+            self.product_index = ProductTextIndex()
+            self.orders = orders
+            self._orders_by_buyer, self._orders_by_merchant = {}, {}
+            self._orders_by_product, self._orders_by_status = {}, {}
+            self._order_status = {}
+            for oid, buyer_id, merchant_id, product_ids, status in order_keys:
+                self._index_order_keys(oid, buyer_id, merchant_id, product_ids, status)
+            self.payments = {} if payments is None else payments
+            self.bargains = {} if bargains is None else bargains
+            self.bargain_archive = {} if bargain_archive is None else bargain_archive
+            self.reviews = reviews
+            self._reviews_by_product, self._review_stats = {}, {}
+            for rid, pid, rating in review_keys:
+                self._index_review(rid, pid, rating)
+            self.notifications = [] if notifications is None else notifications
+            self.defer_product_index(product_texts)
+            self.defer_product_ranking(product_ranks)
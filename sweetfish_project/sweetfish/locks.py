@@ -0,0 +1,46 @@
+"""Striped locks: one lock per key range instead of one lock per table."""
+
+import contextlib
+import threading
+from typing import Hashable, Iterable, Iterator, List
+
+
+class StripedLock:
+    """A fixed array of re-entrant locks; a key always maps to the same one.
+
+    Writers touching different keys usually land on different stripes and
+    proceed in parallel. Code that needs several stripes at once must go
+    through :meth:`many` (or :func:`acquire_all`), which takes them in
+    stripe order so two such callers can never deadlock.
+    """
+
+    def __init__(self, stripes: int = 64) -> None:
+        if stripes <= 0:
+            raise ValueError("stripes must be positive")
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(stripes)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def __iter__(self) -> Iterator[threading.RLock]:
+        return iter(self._locks)
+
+    def index(self, key: Hashable) -> int:
+        return hash(key) % len(self._locks)
+
+    def __call__(self, key: Hashable) -> threading.RLock:
+        return self._locks[self.index(key)]
+
+    @contextlib.contextmanager
+    def many(self, keys: Iterable[Hashable]) -> Iterator[None]:
+        """Hold the stripes of all ``keys`` (each stripe once, in order)."""
+        with acquire_all(self._locks[i] for i in sorted({self.index(k) for k in keys})):
+            yield
+
+
+@contextlib.contextmanager
+def acquire_all(locks: Iterable[threading.RLock]) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        for lock in locks:
+            stack.enter_context(lock)
+        yield
@@ -5,8 +5,9 @@ from __future__ import annotations
 import datetime
 import enum
 import uuid
+import weakref
 from dataclasses import dataclass, field
-from typing import List, Optional, Set, Tuple
+from typing import Any, List, Optional, Set, Tuple
 
 
 def gen_id(prefix: str = "") -> str:
@@ -58,6 +59,16 @@ class Admin(BaseUser):
         self.role = Role.ADMIN
 
 
+# 影响排行的商品字段；原地赋值时通知已注册的库重新排位
+RANK_FIELDS = frozenset(("views", "sold", "promotion_rank"))
+_rank_watchers: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+def watch_product_ranks(watcher: Any) -> None:
+    """Call ``watcher.rerank_product(p)`` whenever a product's rank fields are assigned."""
+    _rank_watchers.add(watcher)
+
+
 @dataclass
 class Product:
 
@@ -74,6 +85,16 @@ class Product:
     tags: Set[str] = field(default_factory=set)
     created_at: datetime.datetime = field(default_factory=datetime.datetime.utcnow)
 
+    def __post_init__(self) -> None:
+        # 构造完成后的赋值才需要通知排行榜
+        object.__setattr__(self, "_ranked", True)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if name in RANK_FIELDS and self.__dict__.get("_ranked"):
+            for watcher in list(_rank_watchers):
+                watcher.rerank_product(self)
+
     def is_available(self) -> bool:
         return self.stock > 0
 
@@ -83,6 +104,8 @@ class OrderItem:
 
     product_id: str
     quantity: int
+    # 下单时的成交单价；旧数据没有此字段时为 0
+    unit_price_cents: int = 0
 
 
 class OrderStatus(enum.Enum):
@@ -139,6 +162,8 @@ class Bargain:
     participants: Set[str] = field(default_factory=set)
     expires_at: Optional[datetime.datetime] = None
     closed: bool = False
+    # 砍价不会把价格砍到这个值以下
+    floor_price_cents: int = 0
 
 
 @dataclass
@@ -151,3 +176,33 @@ class Review:
     rating: int
     comment: str
     created_at: datetime.datetime = field(default_factory=datetime.datetime.utcnow)
+
+
+def check_rating(rating: int) -> None:
+    if not 1 <= rating <= 5:
+        raise ValueError("rating must be 1..5")
+
+
+@dataclass
+class ReviewStats:
+
+    count: int = 0
+    total: int = 0
+    # histogram[i] 为 i+1 星的评论数
+    histogram: List[int] = field(default_factory=lambda: [0] * 5)
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, rating: int) -> None:
+        check_rating(rating)
+        self.count += 1
+        self.total += rating
+        self.histogram[rating - 1] += 1
+
+    def remove(self, rating: int) -> None:
+        check_rating(rating)
+        self.count -= 1
+        self.total -= rating
+        self.histogram[rating - 1] -= 1
@@ -0,0 +1,375 @@
+"""Write-ahead log and snapshot persistence for MemoryDB."""
+
+import dataclasses
+import datetime
+import enum
+import itertools
+import json
+import os
+import threading
+import typing
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import models
+from .db import MemoryDB
+
+SNAPSHOT_FILE = "snapshot.json"
+COLUMNAR_SNAPSHOT_FILE = "snapshot.swfc"
+WAL_FILE = "wal.log"
+
+# always: 每条记录都 fsync；batch: 每次组提交 fsync；off: 只写入 OS 缓冲
+FSYNC_POLICIES = ("always", "batch", "off")
+# json: 文本快照；columnar: 可 mmap 的列式快照（见 columnar.py）
+SNAPSHOT_FORMATS = ("json", "columnar")
+
+_USER_CLASSES = {cls.__name__: cls for cls in (models.BaseUser, models.Merchant, models.Admin)}
+_TABLE_CLASSES = {
+    "product": models.Product,
+    "order": models.Order,
+    "payment": models.Payment,
+    "bargain": models.Bargain,
+    "review": models.Review,
+}
+
+
+# =============================
+#        编解码
+# =============================
+def to_jsonable(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if dataclasses.is_dataclass(value):
+        return {f.name: to_jsonable(getattr(value, f.name)) for f in dataclasses.fields(value)}
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    return value
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def converter_for(tp: Any) -> Callable[[Any], Any]:
+    """Build a JSON -> model converter for one annotated field type."""
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+    if origin is typing.Union:
+        inner = converter_for([a for a in args if a is not type(None)][0])
+        return lambda v: None if v is None else inner(v)
+    if tp is datetime.datetime:
+        return datetime.datetime.fromisoformat
+    if isinstance(tp, type) and issubclass(tp, enum.Enum):
+        return tp
+    if origin is set:
+        return set
+    if origin is list:
+        item = converter_for(args[0])
+        return lambda v: [item(x) for x in v]
+    if dataclasses.is_dataclass(tp):
+        return lambda v: decode_model(tp, v)
+    return _identity
+
+
+# 每个模型类的字段转换表只构建一次，回放时不再反复解析类型注解
+_DECODERS: Dict[type, List[Tuple[str, Callable[[Any], Any]]]] = {}
+
+
+def decode_model(cls: type, data: Dict[str, Any]) -> Any:
+    decoders = _DECODERS.get(cls)
+    if decoders is None:
+        hints = typing.get_type_hints(cls)
+        decoders = _DECODERS[cls] = [
+            (f.name, converter_for(hints[f.name])) for f in dataclasses.fields(cls)
+        ]
+    kwargs = {}
+    for name, convert in decoders:
+        if name in data:
+            kwargs[name] = convert(data[name])
+    return cls(**kwargs)
+
+
+def encode_entity(table: str, value: Any) -> Any:
+    data = to_jsonable(value)
+    if table == "user":
+        data["__cls__"] = type(value).__name__
+    return data
+
+
+def decode_entity(table: str, data: Any) -> Any:
+    if table == "user":
+        data = dict(data)
+        cls = _USER_CLASSES[data.pop("__cls__", "BaseUser")]
+        return decode_model(cls, data)
+    if table == "notification":
+        return data
+    return decode_model(_TABLE_CLASSES[table], data)
+
+
+def apply_record(db: MemoryDB, record: Dict[str, Any]) -> None:
+    table = record["t"]
+    if record["op"] == "del":
+        if table == "product":
+            db.remove_product(record["k"])
+        return
+    value = decode_entity(table, record["v"])
+    {
+        "user": db.add_user,
+        "product": db.add_product,
+        "order": db.add_order,
+        "payment": db.add_payment,
+        "bargain": db.add_bargain,
+        "review": db.add_review,
+        "notification": db.add_notification,
+    }[table](value)
+
+
+# =============================
+#        WAL
+# =============================
+class WriteAheadLog:
+    """Append-only JSON-lines log with group commit.
+
+    Records are buffered and written as one batch when ``group_size``
+    records are pending or every ``group_interval`` seconds from a
+    background flusher, whichever comes first.
+    """
+
+    def __init__(self, path: str, fsync: str = "batch", group_size: int = 64,
+                 group_interval: float = 0.05, start_lsn: int = 0) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy: {fsync}")
+        if group_size <= 0:
+            raise ValueError("group_size must be positive")
+        self.path = path
+        self.fsync = fsync
+        self.group_size = group_size
+        self.lsn = start_lsn
+        self._file = open(path, "ab")
+        self._buffer: List[bytes] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if fsync != "always" and group_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, args=(group_interval,), daemon=True
+            )
+            self._flusher.start()
+
+    def append(self, record: Dict[str, Any]) -> int:
+        with self._lock:
+            self.lsn += 1
+            record["lsn"] = self.lsn
+            line = json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+            self._buffer.append(line.encode("utf-8") + b"\n")
+            if self.fsync == "always" or len(self._buffer) >= self.group_size:
+                self._flush_locked()
+            return self.lsn
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        self._file.write(b"".join(self._buffer))
+        self._buffer.clear()
+        self._file.flush()
+        if self.fsync != "off":
+            os.fsync(self._file.fileno())
+
+    def _flush_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._flush_locked()
+
+    def truncate(self) -> None:
+        """Drop every record; only call once they are covered by a snapshot."""
+        with self._lock:
+            self._flush_locked()
+            self._file.truncate(0)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if not self._file.closed:
+                self._flush_locked()
+                self._file.close()
+
+
+def read_wal(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(end_offset, record)``; stops at the first torn/corrupt line."""
+    if not os.path.exists(path):
+        return
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield offset, record
+
+
+# =============================
+#        快照
+# =============================
+def write_snapshot(db: MemoryDB, path: str, lsn: int) -> None:
+    doc = {
+        "lsn": lsn,
+        "user": [encode_entity("user", u) for u in db.users.values()],
+        "product": [encode_entity("product", p) for p in db.products.values()],
+        "order": [encode_entity("order", o) for o in db.orders.values()],
+        "payment": [encode_entity("payment", p) for p in db.payments.values()],
+        "bargain": [encode_entity("bargain", b)
+                    for b in itertools.chain(db.bargains.values(), db.bargain_archive.values())],
+        "review": [encode_entity("review", r) for r in db.reviews.values()],
+        "notification": [to_jsonable(n) for n in db.notifications],
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, separators=(",", ":"), ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    # 原子替换，崩溃时要么是旧快照要么是新快照
+    os.replace(tmp, path)
+
+
+def load_snapshot(db: MemoryDB, path: str) -> int:
+    """Load a JSON snapshot into an empty ``db`` with one bulk load; return its LSN."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+
+    def table(name: str, key: str) -> Dict[str, Any]:
+        rows = (decode_entity(name, data) for data in doc.get(name, []))
+        return {getattr(row, key): row for row in rows}
+
+    bargains = table("bargain", "bargain_id")
+    # 不逐条走 add_*：省掉每条记录的加锁、日志与监听回调，二级索引一次建好
+    db.bulk_load(
+        users=table("user", "user_id"),
+        products=table("product", "product_id"),
+        orders=table("order", "order_id"),
+        payments=table("payment", "payment_id"),
+        bargains={bid: b for bid, b in bargains.items() if not b.closed},
+        bargain_archive={bid: b for bid, b in bargains.items() if b.closed},
+        reviews=table("review", "review_id"),
+        notifications=[decode_entity("notification", n) for n in doc.get("notification", [])],
+    )
+    return doc["lsn"]
+
+
+# =============================
+#        持久化存储
+# =============================
+class DurableStore:
+    """Journal attached to a MemoryDB; every mutation becomes a WAL record."""
+
+    def __init__(self, db: MemoryDB, data_dir: str, start_lsn: int = 0, fsync: str = "batch",
+                 group_size: int = 64, group_interval: float = 0.05,
+                 snapshot_every: int = 10000, snapshot_format: str = "json") -> None:
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"unknown snapshot format: {snapshot_format}")
+        self.db = db
+        self.snapshot_format = snapshot_format
+        self.snapshot_path = os.path.join(data_dir, _snapshot_file(snapshot_format))
+        self.snapshot_every = snapshot_every
+        self.wal = WriteAheadLog(os.path.join(data_dir, WAL_FILE), fsync=fsync,
+                                 group_size=group_size, group_interval=group_interval,
+                                 start_lsn=start_lsn)
+        self._since_snapshot = 0
+        self._count_lock = threading.Lock()
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    def record(self, op: str, table: str, value: Any) -> None:
+        if op == "del":
+            self.wal.append({"op": op, "t": table, "k": value})
+        else:
+            self.wal.append({"op": op, "t": table, "v": encode_entity(table, value)})
+        thread = None
+        with self._count_lock:
+            self._since_snapshot += 1
+            if (self.snapshot_every and self._since_snapshot >= self.snapshot_every
+                    and self._snapshot_thread is None):
+                # 调用方仍持有某个分段锁，此处再去拿全部分段可能与其他写线程成环；
+                # 交给后台线程，等当前写入释放分段后再做快照
+                thread = self._snapshot_thread = threading.Thread(
+                    target=self._auto_snapshot, daemon=True
+                )
+        if thread is not None:
+            thread.start()
+
+    def _auto_snapshot(self) -> None:
+        try:
+            self.snapshot()
+        finally:
+            with self._count_lock:
+                self._snapshot_thread = None
+
+    def snapshot(self) -> None:
+        # 持有全部分段锁，快照与 LSN 一致；之后日志里的记录都已包含在快照中
+        with self.db.exclusive():
+            self.wal.flush()
+            if self.snapshot_format == "columnar":
+                from .columnar import write_columnar_snapshot
+                write_columnar_snapshot(self.db, self.snapshot_path, self.wal.lsn)
+            else:
+                write_snapshot(self.db, self.snapshot_path, self.wal.lsn)
+            self.wal.truncate()
+            with self._count_lock:
+                self._since_snapshot = 0
+
+    def close(self) -> None:
+        with self._count_lock:
+            pending = self._snapshot_thread
+        if pending is not None:
+            pending.join()
+        self.wal.close()
+
+
+def _snapshot_file(snapshot_format: str) -> str:
+    return COLUMNAR_SNAPSHOT_FILE if snapshot_format == "columnar" else SNAPSHOT_FILE
+
+
+def open_durable_db(data_dir: str, **options: Any) -> MemoryDB:
+    """Recover a MemoryDB from ``data_dir`` and attach a WAL to it.
+
+    Startup loads the latest snapshot and replays only the log records
+    written after it; a torn record at the tail is discarded. With
+    ``snapshot_format="columnar"`` the snapshot is memory-mapped and rows
+    are hydrated on access.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    snapshot_path = os.path.join(data_dir, _snapshot_file(options.get("snapshot_format", "json")))
+    if options.get("snapshot_format") == "columnar" and os.path.exists(snapshot_path):
+        from .columnar import ColumnarSnapshot
+        snap = ColumnarSnapshot(snapshot_path)
+        db = snap.load_into(MemoryDB())
+        lsn = snap.lsn
+    else:
+        db = MemoryDB()
+        lsn = load_snapshot(db, snapshot_path)
+    wal_path = os.path.join(data_dir, WAL_FILE)
+    good_offset = 0
+    for good_offset, record in read_wal(wal_path):
+        if record["lsn"] > lsn:
+            apply_record(db, record)
+            lsn = record["lsn"]
+    if os.path.exists(wal_path) and os.path.getsize(wal_path) != good_offset:
+        with open(wal_path, "r+b") as f:
+            f.truncate(good_offset)
+    db.journal = DurableStore(db, data_dir, start_lsn=lsn, **options)
+    return db
@@ -0,0 +1,116 @@
+"""Skip-list leaderboard of members kept sorted by a rank key."""
+
+import random
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+Key = Tuple[int, ...]
+
+_MAX_LEVEL = 32
+_P = 0.25
+
+
+class _Node:
+
+    __slots__ = ("key", "member", "next")
+
+    def __init__(self, key: Optional[Key], member: Optional[Hashable], level: int) -> None:
+        self.key = key
+        self.member = member
+        self.next: List[Optional["_Node"]] = [None] * level
+
+
+class RankedSet:
+    """Members ordered by ascending key, with O(log n) updates.
+
+    Keys must be unique (break ties with e.g. an insertion sequence) and a
+    member's key is replaced wholesale by :meth:`put`, so callers pass the
+    full key whenever any ranked field changes. Reading the first ``n``
+    members, or the ``n`` members strictly after a key, costs O(log n + n)
+    instead of a sort of the whole table.
+    """
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self._head = _Node(None, None, _MAX_LEVEL)
+        self._level = 1
+        self._keys: Dict[Hashable, Key] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, member: object) -> bool:
+        return member in self._keys
+
+    def key_of(self, member: Hashable) -> Optional[Key]:
+        return self._keys.get(member)
+
+    def put(self, member: Hashable, key: Key) -> None:
+        with self._lock:
+            old = self._keys.get(member)
+            if old == key:
+                return
+            if old is not None:
+                self._unlink(old)
+            self._link(key, member)
+            self._keys[member] = key
+
+    def discard(self, member: Hashable) -> None:
+        with self._lock:
+            old = self._keys.pop(member, None)
+            if old is not None:
+                self._unlink(old)
+
+    def first(self, n: int, after: Optional[Key] = None) -> List[Hashable]:
+        """Up to ``n`` members in key order, starting after ``after`` if given."""
+        return [member for _, member in self.items(n, after)]
+
+    def items(self, n: int, after: Optional[Key] = None) -> List[Tuple[Key, Hashable]]:
+        """Like :meth:`first`, but ``(key, member)`` pairs."""
+        with self._lock:
+            x = self._head
+            if after is not None:
+                for i in reversed(range(self._level)):
+                    nxt = x.next[i]
+                    while nxt is not None and nxt.key <= after:
+                        x, nxt = nxt, nxt.next[i]
+            out: List[Tuple[Key, Hashable]] = []
+            x = x.next[0]
+            while x is not None and len(out) < n:
+                out.append((x.key, x.member))
+                x = x.next[0]
+            return out
+
+    def _path(self, key: Key) -> List[_Node]:
+        # 每一层上最后一个 key 小于目标的节点
+        update = [self._head] * _MAX_LEVEL
+        x = self._head
+        for i in reversed(range(self._level)):
+            nxt = x.next[i]
+            while nxt is not None and nxt.key < key:
+                x, nxt = nxt, nxt.next[i]
+            update[i] = x
+        return update
+
+    def _link(self, key: Key, member: Hashable) -> None:
+        update = self._path(key)
+        level = 1
+        while level < _MAX_LEVEL and self._random.random() < _P:
+            level += 1
+        if level > self._level:
+            self._level = level
+        node = _Node(key, member, level)
+        for i in range(level):
+            node.next[i] = update[i].next[i]
+            update[i].next[i] = node
+
+    def _unlink(self, key: Key) -> None:
+        update = self._path(key)
+        x = update[0].next[0]
+        if x is None or x.key != key:
+            return
+        for i in range(len(x.next)):
+            update[i].next[i] = x.next[i]
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
@@ -0,0 +1,184 @@
+"""Hierarchical timing wheel for large numbers of one-shot timers."""
+
+import math
+import threading
+import time
+import traceback
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class Timer:
+
+    __slots__ = ("expire", "fn", "args", "cancelled", "_wheel")
+
+    def __init__(self, wheel: "TimingWheel", expire: int, fn: Callable[..., Any],
+                 args: Tuple[Any, ...]) -> None:
+        # expire 为到期的 tick 序号（相对时间轮起点）
+        self.expire = expire
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+        self._wheel = wheel
+
+    def cancel(self) -> bool:
+        return self._wheel.cancel(self)
+
+
+class TimingWheel:
+    """Timers bucketed by expiry tick on a stack of wheels.
+
+    Level 0 has one slot per ``tick`` seconds; each higher level has slots
+    as wide as a full turn of the level below. A timer is appended to the
+    slot of the lowest level that can still tell its tick apart, so
+    scheduling is O(1). Each tick fires one level-0 slot, and when a lower
+    level wraps around, the next slot of the level above is moved down
+    (cascaded). Timers further out than the whole wheel wait in the top
+    level and are re-placed each time they come round.
+
+    Cancelling only flags the timer; it is dropped when its slot is
+    reached. Callbacks run on whichever thread calls :meth:`advance`,
+    normally the one started by :meth:`start`, outside the wheel's lock;
+    an exception from one is re-raised after the rest of its tick fired.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: Sequence[int] = (256, 64, 64, 64),
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        if not slots or any(n < 2 for n in slots):
+            raise ValueError("each level needs at least two slots")
+        self.tick = tick
+        self.clock = clock
+        self._sizes = list(slots)
+        # 第 L 层一个槽覆盖的 tick 数；_spans[-1] 为整个时间轮的跨度
+        self._spans = [1]
+        for n in self._sizes:
+            self._spans.append(self._spans[-1] * n)
+        self._levels: List[List[List[Timer]]] = [[[] for _ in range(n)] for n in self._sizes]
+        self._origin = clock()
+        self._current = 0
+        self._live = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def __len__(self) -> int:
+        """Number of timers still pending (cancelled ones excluded)."""
+        return self._live
+
+    @property
+    def current_tick(self) -> int:
+        return self._current
+
+    # =============================
+    # 注册与取消
+    # =============================
+    def call_later(self, delay: float, fn: Callable[..., Any], *args: Any) -> Timer:
+        """Run ``fn(*args)`` once, no earlier than ``delay`` seconds from now."""
+        return self.call_at(self.clock() + delay, fn, *args)
+
+    def call_at(self, deadline: float, fn: Callable[..., Any], *args: Any) -> Timer:
+        """Run ``fn(*args)`` once ``clock()`` has reached ``deadline``."""
+        ticks = math.ceil((deadline - self._origin) / self.tick)
+        with self._lock:
+            # 已过期的定时器放到下一个 tick，不会在注册线程里同步执行
+            timer = Timer(self, max(ticks, self._current + 1), fn, args)
+            self._place(timer)
+            self._live += 1
+        return timer
+
+    def cancel(self, timer: Timer) -> bool:
+        """Cancel a pending timer; return False if it already fired or was cancelled."""
+        with self._lock:
+            if timer.cancelled or timer.expire <= self._current:
+                return False
+            timer.cancelled = True
+            self._live -= 1
+            return True
+
+    def _place(self, timer: Timer) -> None:
+        delta = timer.expire - self._current
+        top = len(self._sizes) - 1
+        for level in range(top + 1):
+            if delta < self._spans[level + 1]:
+                span = self._spans[level]
+                self._levels[level][(timer.expire // span) % self._sizes[level]].append(timer)
+                return
+        # 超出整个时间轮的跨度：放在最高层最晚轮到的槽，轮到时重新放置
+        span = self._spans[top]
+        self._levels[top][(self._current // span - 1) % self._sizes[top]].append(timer)
+
+    # =============================
+    # 推进
+    # =============================
+    def advance(self, now: Optional[float] = None) -> int:
+        """Process every tick up to ``now`` and return how many timers fired."""
+        if now is None:
+            now = self.clock()
+        target = int((now - self._origin) // self.tick)
+        fired = 0
+        error: Optional[Exception] = None
+        while True:
+            with self._lock:
+                if self._current >= target:
+                    return fired
+                if not self._live:
+                    # 没有待触发的定时器：直接跳到目标 tick
+                    self._current = target
+                    return fired
+                due = self._step()
+            for timer in due:
+                try:
+                    timer.fn(*timer.args)
+                except Exception as e:
+                    # 一个回调出错不影响同一 tick 的其他定时器，处理完后再抛出
+                    error = error or e
+            fired += len(due)
+            if error is not None:
+                raise error
+
+    def _step(self) -> List[Timer]:
+        self._current += 1
+        now = self._current
+        # 从高层到低层依次下放，这样本 tick 上层落下来的定时器也能被下一层接着处理
+        for level in range(len(self._sizes) - 1, 0, -1):
+            span = self._spans[level]
+            if now % span:
+                continue
+            bucket = self._levels[level]
+            idx = (now // span) % self._sizes[level]
+            timers, bucket[idx] = bucket[idx], []
+            for timer in timers:
+                if not timer.cancelled:
+                    self._place(timer)
+        slots = self._levels[0]
+        idx = now % self._sizes[0]
+        timers, slots[idx] = slots[idx], []
+        due = [t for t in timers if not t.cancelled]
+        self._live -= len(due)
+        return due
+
+    # =============================
+    # 后台线程
+    # =============================
+    def start(self) -> None:
+        """Advance the wheel once per tick on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="timing-wheel", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.tick):
+            try:
+                self.advance()
+            except Exception:
+                traceback.print_exc()
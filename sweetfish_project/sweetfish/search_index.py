@@ -0,0 +1,99 @@
+"""Incrementally maintained n-gram index for product search."""
+
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from . import models
+
+# 每个商品参与搜索的三段文本：标题、描述、标签（与原始线性扫描一致）
+Fields = Tuple[str, str, str]
+
+
+def product_fields(p: models.Product) -> Fields:
+    return (p.title.lower(), p.description.lower(), " ".join(p.tags).lower())
+
+
+def _grams(text: str) -> Set[str]:
+    # 单字 + 双字切分，中文无需分词也能命中子串
+    grams = set(text)
+    for i in range(len(text) - 1):
+        grams.add(text[i:i + 2])
+    return grams
+
+
+class ProductTextIndex:
+    """Inverted index from unigrams/bigrams to product ids.
+
+    A keyword resolves to the intersection of the posting lists of its
+    grams; the (usually tiny) candidate set is then verified with the same
+    substring test the full scan used, so results are exact. Updates and
+    lookups share one short-held lock so a search never sees a half-indexed
+    product.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[str]] = {}
+        self._doc_fields: Dict[str, Fields] = {}
+        self._doc_grams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_fields)
+
+    def __contains__(self, pid: object) -> bool:
+        return pid in self._doc_fields
+
+    def add(self, pid: str, fields: Fields) -> None:
+        grams: Set[str] = set()
+        for text in fields:
+            grams |= _grams(text)
+        with self._lock:
+            self.remove(pid)
+            for g in grams:
+                self._postings.setdefault(g, set()).add(pid)
+            self._doc_fields[pid] = fields
+            self._doc_grams[pid] = grams
+
+    def remove(self, pid: str) -> None:
+        with self._lock:
+            grams = self._doc_grams.pop(pid, None)
+            self._doc_fields.pop(pid, None)
+            if not grams:
+                return
+            for g in grams:
+                posting = self._postings.get(g)
+                if posting is None:
+                    continue
+                posting.discard(pid)
+                if not posting:
+                    del self._postings[g]
+
+    def _candidates(self, low: str) -> Optional[Set[str]]:
+        if len(low) == 1:
+            grams = {low}
+        else:
+            grams = {low[i:i + 2] for i in range(len(low) - 1)}
+        postings = []
+        for g in grams:
+            posting = self._postings.get(g)
+            if not posting:
+                return None
+            postings.append(posting)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                return None
+        return result
+
+    def search(self, keyword: str) -> Set[str]:
+        low = keyword.lower()
+        with self._lock:
+            candidates = self._candidates(low)
+            if not candidates:
+                return set()
+            return {
+                pid for pid in candidates
+                if any(low in text for text in self._doc_fields[pid])
+            }
@@ -1,27 +1,41 @@
 """Module adjusted to satisfy style checks."""
 
+from typing import Optional
+
 from ..db import MemoryDB
+from .sales_view import SalesView
 
 
 class AdminService:
 
 
-    def __init__(self, db: MemoryDB) -> None:
+    def __init__(self, db: MemoryDB, top_k: int = 5, sales: Optional[SalesView] = None) -> None:
 
         self.db = db
+        self.top_k = top_k
+        # 物化的营收汇总，随订单支付/退款增量更新；多个 AdminService 可共用一个
+        self._owns_sales = sales is None
+        self.sales = sales if sales is not None else SalesView(db)
 
-    def generate_sales_report(self):
-
-        total_sales = 0
-        for product in self.db.products.values():
-            total_sales += product.sold * product.price_cents
+    def close(self) -> None:
+        if self._owns_sales:
+            self.sales.close()
 
-        all_products = list(self.db.products.values())
-        all_products.sort(key=lambda p: p.sold, reverse=True)
-        top_5_products = all_products[:5]
+    def generate_sales_report(self):
 
+        # 销量榜随每次写入增量维护，取前 K 不再整表排序
         top_list = []
-        for p in top_5_products:
+        for p in self.db.top_selling_products(self.top_k):
             top_list.append((p.product_id, p.title, p.sold))
 
-        return {"total_sales_cents": total_sales, "top": top_list}
+        top_revenue = []
+        for pid, cents in self.sales.top_products(self.top_k):
+            p = self.db.get_product(pid)
+            top_revenue.append((pid, p.title if p else "", cents))
+
+        return {"total_sales_cents": self.sales.total_cents, "top": top_list,
+                "top_revenue": top_revenue}
+
+    def rebuild_sales_report(self) -> bool:
+        """Recompute the materialized totals from orders; True if they were already correct."""
+        return self.sales.rebuild()
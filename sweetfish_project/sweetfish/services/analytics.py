@@ -0,0 +1,341 @@
+"""Optional NumPy columnar snapshot of orders, products and payments for dashboards."""
+
+import datetime
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时看板退回逐个对象统计
+    np = None
+
+from ..db import MemoryDB
+from ..models import Order, OrderStatus, Payment, Product
+from .sales_view import line_amounts
+
+HAS_NUMPY = np is not None
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_DATE = _EPOCH.date()
+_SECOND = datetime.timedelta(seconds=1)
+_STATUSES = list(OrderStatus)
+_STATUS_CODE = {s: i for i, s in enumerate(_STATUSES)}
+PAYMENT_STATUSES = ("init", "success", "failed")
+
+# 每个分组维度：所在的表和分组列
+GROUPS = {
+    "merchant": ("orders", "merchant"),
+    "day": ("orders", "day"),
+    "status": ("orders", "status"),
+    "product": ("items", "product"),
+    "payment_status": ("payments", "status"),
+}
+
+
+def _epoch(ts: datetime.datetime) -> int:
+    return (ts - _EPOCH) // _SECOND
+
+
+class _Dictionary:
+    """Dictionary encoding: each distinct value gets the next small int code."""
+
+    def __init__(self) -> None:
+        self._codes: Dict[Hashable, int] = {}
+        self.values: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: Hashable) -> int:
+        c = self._codes.get(value)
+        if c is None:
+            c = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def get(self, value: Hashable) -> int:
+        return self._codes.get(value, -1)
+
+
+class _Table:
+    """Growable parallel arrays, one per column."""
+
+    def __init__(self, dtypes: Dict[str, str], capacity: int = 1024) -> None:
+        self.n = 0
+        self._cols = {name: np.zeros(capacity, dtype=dt) for name, dt in dtypes.items()}
+
+    def __getitem__(self, name: str) -> "np.ndarray":
+        return self._cols[name][:self.n]
+
+    def extend(self, rows: Dict[str, Sequence[Any]]) -> int:
+        """Append the given column lists; return the first new row index."""
+        count = len(next(iter(rows.values())))
+        start = self.n
+        size = len(next(iter(self._cols.values())))
+        if start + count > size:
+            size = max(size * 2, start + count)
+            for name, old in self._cols.items():
+                new = np.zeros(size, dtype=old.dtype)
+                new[:start] = old[:start]
+                self._cols[name] = new
+        for name, values in rows.items():
+            self._cols[name][start:start + count] = values
+        self.n += count
+        return start
+
+    def set(self, name: str, row: int, value: Any) -> None:
+        self._cols[name][row] = value
+
+
+class OrderAnalytics:
+    """Columnar copy of ``orders``, their lines, ``products`` and ``payments``.
+
+    Ids are dictionary-encoded to int32 codes, timestamps stored as epoch
+    seconds and amounts as int64 cents, so a group-by is a handful of
+    array operations instead of a walk over dataclass objects. The first
+    build streams the tables in chunks; afterwards DB listeners only note
+    which rows changed and :meth:`refresh` re-reads those, appending new
+    rows and updating status/amount columns in place. Order lines are
+    captured when the order is first seen (orders never change items).
+    """
+
+    def __init__(self, db: MemoryDB, chunk_size: int = 10_000) -> None:
+        if np is None:
+            raise ImportError("numpy is required for OrderAnalytics")
+        self.db = db
+        self.chunk_size = chunk_size
+        self._merchant_ids = _Dictionary()
+        self._product_ids = _Dictionary()
+        self.orders = _Table({"merchant": "int32", "status": "int8", "total": "int64",
+                              "created": "int64", "day": "int32"})
+        self.items = _Table({"order": "int64", "product": "int32", "quantity": "int64",
+                             "cents": "int64"})
+        self.catalogue = _Table({"product": "int32", "merchant": "int32", "price": "int64",
+                                 "stock": "int64", "sold": "int64", "views": "int64", "alive": "bool"})
+        self.payments = _Table({"status": "int8", "amount": "int64", "created": "int64"})
+        self._order_row: Dict[str, int] = {}
+        self._product_row: Dict[str, int] = {}
+        self._payment_row: Dict[str, int] = {}
+        self._pay_status = _Dictionary()
+        for s in PAYMENT_STATUSES:
+            self._pay_status.code(s)
+        self._lock = threading.Lock()
+        # 刷新与查询串行，查询总是先吸收未应用的变更
+        self._refresh_lock = threading.RLock()
+        self._dirty_orders: Dict[str, None] = {}
+        self._dirty_products: Dict[str, None] = {}
+        self._dirty_payments: Dict[str, None] = {}
+        with db.exclusive():
+            db.subscribe_orders(self._on_order)
+            db.subscribe_products(self._on_product)
+            db.subscribe_payments(self._on_payment)
+            for chunk in db.scan_chunks("products", chunk_size):
+                self._put_products(chunk)
+            for chunk in db.scan_chunks("orders", chunk_size):
+                self._put_orders(chunk)
+            for chunk in db.scan_chunks("payments", chunk_size):
+                self._put_payments(chunk)
+
+    # =============================
+    # 增量刷新
+    # =============================
+    def _on_order(self, order: Order, old: Optional[OrderStatus]) -> None:
+        with self._lock:
+            self._dirty_orders[order.order_id] = None
+
+    def _on_product(self, op: str, p: Product) -> None:
+        with self._lock:
+            self._dirty_products[p.product_id] = None
+
+    def _on_payment(self, pay: Payment) -> None:
+        with self._lock:
+            self._dirty_payments[pay.payment_id] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty_orders) + len(self._dirty_products) + len(self._dirty_payments)
+
+    def refresh(self) -> int:
+        """Apply the rows written since the last refresh; return how many."""
+        with self._refresh_lock:
+            with self._lock:
+                orders, self._dirty_orders = self._dirty_orders, {}
+                products, self._dirty_products = self._dirty_products, {}
+                payments, self._dirty_payments = self._dirty_payments, {}
+            self._apply(orders, products, payments)
+            return len(orders) + len(products) + len(payments)
+
+    def _apply(self, orders: Iterable[str], products: Iterable[str], payments: Iterable[str]) -> None:
+        for pid in products:
+            p = self.db.get_product(pid)
+            if p is None:
+                row = self._product_row.get(pid)
+                if row is not None:
+                    self.catalogue.set("alive", row, False)
+            else:
+                self._put_products([p])
+        self._put_orders(o for o in map(self.db.get_order, orders) if o is not None)
+        self._put_payments(p for p in map(self.db.get_payment, payments) if p is not None)
+
+    def _put_products(self, products: Iterable[Product]) -> None:
+        new: Dict[str, List[Any]] = {
+            k: [] for k in ("product", "merchant", "price", "stock", "sold", "views", "alive")}
+        for p in products:
+            row = self._product_row.get(p.product_id)
+            values = (self._product_ids.code(p.product_id), self._merchant_ids.code(p.merchant_id),
+                      p.price_cents, p.stock, p.sold, p.views, True)
+            if row is None:
+                self._product_row[p.product_id] = self.catalogue.n + len(new["product"])
+                for col, v in zip(new, values):
+                    new[col].append(v)
+            else:
+                for col, v in zip(new, values):
+                    self.catalogue.set(col, row, v)
+        if new["product"]:
+            self.catalogue.extend(new)
+
+    def _put_orders(self, orders: Iterable[Order]) -> None:
+        new: Dict[str, List[Any]] = {k: [] for k in ("merchant", "status", "total", "created", "day")}
+        lines: Dict[str, List[Any]] = {k: [] for k in ("order", "product", "quantity", "cents")}
+        for o in orders:
+            row = self._order_row.get(o.order_id)
+            if row is not None:
+                self.orders.set("status", row, _STATUS_CODE[o.status])
+                self.orders.set("total", row, o.total_cents)
+                continue
+            row = self._order_row[o.order_id] = self.orders.n + len(new["merchant"])
+            created = _epoch(o.created_at)
+            new["merchant"].append(self._merchant_ids.code(o.merchant_id))
+            new["status"].append(_STATUS_CODE[o.status])
+            new["total"].append(o.total_cents)
+            new["created"].append(created)
+            new["day"].append(created // 86400)
+            for pid, qty, cents in line_amounts(o):
+                lines["order"].append(row)
+                lines["product"].append(self._product_ids.code(pid))
+                lines["quantity"].append(qty)
+                lines["cents"].append(cents)
+        if new["merchant"]:
+            self.orders.extend(new)
+        if lines["order"]:
+            self.items.extend(lines)
+
+    def _put_payments(self, payments: Iterable[Payment]) -> None:
+        new: Dict[str, List[Any]] = {k: [] for k in ("status", "amount", "created")}
+        for pay in payments:
+            row = self._payment_row.get(pay.payment_id)
+            status = self._pay_status.code(pay.status)
+            if row is not None:
+                self.payments.set("status", row, status)
+                continue
+            self._payment_row[pay.payment_id] = self.payments.n + len(new["status"])
+            new["status"].append(status)
+            new["amount"].append(pay.amount_cents)
+            new["created"].append(_epoch(pay.created_at))
+        if new["status"]:
+            self.payments.extend(new)
+
+    # =============================
+    # 向量化分组统计
+    # =============================
+    def _frame(self, by: str, statuses: Optional[Iterable[OrderStatus]],
+               merchant_id: Optional[str]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Group codes and values (cents) of the rows selected by the filters."""
+        self.refresh()
+        if by not in GROUPS:
+            raise ValueError(f"unknown group {by!r}, expected one of {sorted(GROUPS)}")
+        table, column = GROUPS[by]
+        if table == "payments":
+            return self.payments[column], self.payments["amount"]
+        orders = self.orders
+        mask = None
+        if statuses is not None:
+            mask = np.isin(orders["status"], [_STATUS_CODE[s] for s in statuses])
+        if merchant_id is not None:
+            m = orders["merchant"] == self._merchant_ids.get(merchant_id)
+            mask = m if mask is None else mask & m
+        if table == "orders":
+            codes, values = orders[column], orders["total"]
+            if mask is not None:
+                codes, values = codes[mask], values[mask]
+            return codes, values
+        items = self.items
+        codes, values = items[column], items["cents"]
+        if mask is not None:
+            keep = mask[items["order"]]
+            codes, values = codes[keep], values[keep]
+        return codes, values
+
+    def _keys(self, by: str, codes: "np.ndarray") -> List[Any]:
+        if by == "day":
+            return [_EPOCH_DATE + datetime.timedelta(days=c) for c in codes.tolist()]
+        values = {"merchant": self._merchant_ids.values, "product": self._product_ids.values,
+                  "status": _STATUSES, "payment_status": self._pay_status.values}[by]
+        return [values[c] for c in codes.tolist()]
+
+    def _reduce(self, by: str, codes: "np.ndarray", weights: Optional["np.ndarray"]) -> Dict[Any, int]:
+        if not len(codes):
+            return {}
+        base = int(codes.min())
+        counts = np.bincount(codes - base)
+        sums = counts if weights is None else np.bincount(codes - base, weights=weights)
+        present = np.flatnonzero(counts)
+        totals = np.rint(sums[present]).astype(np.int64)
+        return dict(zip(self._keys(by, present + base), totals.tolist()))
+
+    def sum_by(self, by: str, statuses: Optional[Iterable[OrderStatus]] = None,
+               merchant_id: Optional[str] = None) -> Dict[Any, int]:
+        """Total cents per group (order totals; line amounts for ``product``)."""
+        with self._refresh_lock:
+            codes, values = self._frame(by, statuses, merchant_id)
+            return self._reduce(by, codes, values)
+
+    def count_by(self, by: str, statuses: Optional[Iterable[OrderStatus]] = None,
+                 merchant_id: Optional[str] = None) -> Dict[Any, int]:
+        """Rows per group (orders; order lines for ``product``; payments)."""
+        with self._refresh_lock:
+            codes, _ = self._frame(by, statuses, merchant_id)
+            return self._reduce(by, codes, None)
+
+    def percentiles_by(self, by: str, qs: Sequence[float] = (50, 90, 99),
+                       statuses: Optional[Iterable[OrderStatus]] = None,
+                       merchant_id: Optional[str] = None) -> Dict[Any, List[float]]:
+        """Per-group percentiles of the amount, linear interpolation like ``np.percentile``."""
+        with self._refresh_lock:
+            codes, values = self._frame(by, statuses, merchant_id)
+        if not len(codes):
+            return {}
+        codes, values = self._sort_groups(codes, values)
+        values = values.astype(np.float64)
+        groups, start, counts = np.unique(codes, return_index=True, return_counts=True)
+        out = np.empty((len(groups), len(qs)))
+        for j, q in enumerate(qs):
+            # 组内第 (n-1)*q/100 个位置，在相邻两个值之间线性插值
+            pos = start + (counts - 1) * (q / 100.0)
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.minimum(lo + 1, start + counts - 1)
+            out[:, j] = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+        return dict(zip(self._keys(by, groups), out.tolist()))
+
+    @staticmethod
+    def _sort_groups(codes: "np.ndarray", values: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """Sort by (group, value); one packed int64 sort is much faster than lexsort."""
+        cbase, vbase = int(codes.min()), int(values.min())
+        span = int(values.max()) - vbase + 1
+        if (int(codes.max()) - cbase + 1) * span >= 1 << 62:
+            order = np.lexsort((values, codes))
+            return codes[order], values[order]
+        packed = (codes.astype(np.int64) - cbase) * span + (values - vbase)
+        packed.sort()
+        return packed // span + cbase, packed % span + vbase
+
+    def inventory(self, merchant_id: str) -> Dict[str, int]:
+        """Live product count, stock units and stock value (cents) of one merchant."""
+        self.refresh()
+        cat = self.catalogue
+        mask = cat["alive"] & (cat["merchant"] == self._merchant_ids.get(merchant_id))
+        return {
+            "products": int(mask.sum()),
+            "stock": int(cat["stock"][mask].sum()),
+            "stock_value_cents": int((cat["stock"][mask] * cat["price"][mask]).sum()),
+        }
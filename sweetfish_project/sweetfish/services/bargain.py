@@ -1,56 +1,257 @@
 """Module adjusted to satisfy style checks."""
 
-import random
+import threading
+from collections import deque
 from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 
 from ..db import MemoryDB
 from ..models import Bargain, gen_id
+from ..rng import RandomStream
+from ..scheduler import TimingWheel
+
+
+class _Join:
+
+    __slots__ = ("user_id", "cut", "error", "done")
+
+    def __init__(self, user_id: str) -> None:
+        self.user_id = user_id
+        self.cut = 0
+        self.error: Optional[Exception] = None
+        self.done = False
+
+
+class _JoinQueue:
+
+    __slots__ = ("lock", "pending")
+
+    def __init__(self) -> None:
+        # 持有 lock 的线程是当前的合并者，负责把 pending 里的请求一并处理
+        self.lock = threading.Lock()
+        self.pending: Deque[_Join] = deque()
 
 
 class BargainService:
+    """Bargains that close themselves when ``expires_at`` passes.
 
-    def __init__(self, db: MemoryDB, notification) -> None:
+    Expiry runs on a :class:`TimingWheel`; pass a shared one as
+    ``scheduler``, otherwise the service makes its own, starts its thread
+    on the first bargain that needs expiring and stops it in :meth:`close`. A closed bargain moves to ``db.bargain_archive`` and
+    its requester is notified of the final price. Open bargains already in
+    the db are scheduled on construction, and :meth:`join_bargain` also
+    checks the deadline itself, so a late tick never lets a join through.
+
+    Joins on one bargain are flat-combined: each caller queues its join and
+    whoever takes the bargain's lock applies every queued join in order,
+    then stores the bargain once for the whole batch. Cuts are computed
+    one by one as before, so later joiners still cut more, and the price
+    never drops below ``floor_price_cents``. A batch's notifications are
+    pushed together with ``push_many`` once the lock is released, so a
+    slow or full notification queue never stalls other joiners. When the
+    notification service has a dispatcher that is only an enqueue, and
+    :meth:`flush` waits for delivery.
+
+    Cut percentages come from ``rng`` (by default a :class:`RandomStream`
+    seeded with ``seed``), so a load test with a fixed seed replays.
+    """
+
+    def __init__(self, db: MemoryDB, notification,
+                 scheduler: Optional[TimingWheel] = None,
+                 rng: Optional[RandomStream] = None, seed: Optional[int] = None) -> None:
         self.db = db
         self.notification = notification
+        self.rng = rng or RandomStream(seed, name="bargain")
+        self._close_lock = threading.Lock()
+        self._queues: Dict[str, _JoinQueue] = {}
+        self._queues_lock = threading.Lock()
+        # 合并统计：批次数与批内处理的加入请求数
+        self.batches = 0
+        self.joins = 0
+        self._owns_scheduler = scheduler is None
+        self.scheduler = scheduler if scheduler is not None else TimingWheel(tick=1.0)
+        # 自带的时间轮按需启动；close 之后不再启动
+        self._wheel_lock = threading.Lock()
+        self._closed = False
+        for b in db.scan("bargains"):
+            self._schedule(b)
+
+    def close(self) -> None:
+        if not self._owns_scheduler:
+            return
+        with self._wheel_lock:
+            self._closed = True
+        # 在锁外 join：时间轮线程里的 _expire 可能正要重新排期
+        self.scheduler.stop()
 
     def start_bargain(
-        self, requester_id: str, product_id: str, expires_minutes: int = 60
+        self, requester_id: str, product_id: str, expires_minutes: int = 60,
+        floor_price_cents: int = 0
     ) -> Bargain:
         p = self.db.get_product(product_id)
         if not p:
             raise ValueError("product not found")
         if not p.allow_bargain:
             raise ValueError("no bargain")
+        if not 0 <= floor_price_cents <= p.price_cents:
+            raise ValueError("floor price must be between 0 and the product price")
         b = Bargain(
             bargain_id=gen_id("b_"),
             product_id=product_id,
             requester_id=requester_id,
             original_price_cents=p.price_cents,
             current_price_cents=p.price_cents,
+            floor_price_cents=floor_price_cents,
         )
         b.expires_at = datetime.utcnow() + timedelta(minutes=expires_minutes)
         self.db.add_bargain(b)
-        self.notification.push(requester_id, f"started bargain for {p.title}")
+        self._schedule(b)
+        self._notify([(requester_id, f"started bargain for {p.title}")])
         return b
 
     def join_bargain(self, bid: str, user_id: str):
         b = self.db.get_bargain(bid)
         if not b:
             raise ValueError("bargain not found")
+        if not b.closed and self._expired(b):
+            self._close(b)
         if b.closed:
             raise ValueError("closed")
-        cut = self._calculate_cut(b)
-        b.participants.add(user_id)
-        b.current_price_cents = max(0, b.current_price_cents - cut)
-        self.notification.push(user_id, f"you cut {cut} cents")
+        req = _Join(user_id)
+        q = self._queue(bid)
+        q.pending.append(req)
+        messages: List[Tuple[str, str]] = []
+        with q.lock:
+            # 拿到锁时多半已被前一个合并者处理，否则由自己处理整批
+            if not req.done:
+                messages = self._combine(b, q)
+        # 推送可能阻塞（分发队列满），放到锁外，不拖住其他加入者
+        self._notify(messages)
+        if req.error is not None:
+            raise req.error
         return b
 
-    def _calculate_cut(self, b: Bargain) -> int:
+    def join_many(self, bid: str, user_ids: List[str]) -> Bargain:
+        """Apply a whole list of joins as one batch, e.g. to simulate a viral bargain.
+
+        Same cuts as calling :meth:`join_bargain` for each user in order,
+        but the cut percentages are drawn in one block and the bargain is
+        stored once.
+        """
+        b = self.db.get_bargain(bid)
+        if not b:
+            raise ValueError("bargain not found")
+        if not b.closed and self._expired(b):
+            self._close(b)
+        if b.closed:
+            raise ValueError("closed")
+        q = self._queue(bid)
+        with q.lock:
+            pcts = self.rng.uniform_block(len(user_ids), 0.005, 0.05)
+            q.pending.extend(_Join(uid) for uid in user_ids)
+            messages = self._combine(b, q, iter(pcts))
+        self._notify(messages)
+        return b
+
+    def _combine(self, b: Bargain, q: _JoinQueue,
+                 pcts: Optional[Iterator[float]] = None) -> List[Tuple[str, str]]:
+        # 持有 q.lock 时调用；返回这批的通知，由调用方在释放锁后推送
+        batch: List[_Join] = []
+        while q.pending:
+            batch.append(q.pending.popleft())
+        messages: List[Tuple[str, str]] = []
+        for req in batch:
+            if b.closed:
+                req.error = ValueError("closed")
+            else:
+                pct = next(pcts, None) if pcts is not None else None
+                cut = min(self._calculate_cut(b, pct), b.current_price_cents - b.floor_price_cents)
+                b.participants.add(req.user_id)
+                b.current_price_cents -= cut
+                req.cut = cut
+                messages.append((req.user_id, f"you cut {cut} cents"))
+        if messages:
+            self.db.add_bargain(b)
+            self.batches += 1
+            self.joins += len(messages)
+        for req in batch:
+            req.done = True
+        return messages
+
+    def _queue(self, bid: str) -> _JoinQueue:
+        q = self._queues.get(bid)
+        if q is None:
+            with self._queues_lock:
+                q = self._queues.setdefault(bid, _JoinQueue())
+        return q
+
+    def _calculate_cut(self, b: Bargain, pct: Optional[float] = None) -> int:
         base = max(1, b.original_price_cents)
-        pct = random.uniform(0.005, 0.05)
+        if pct is None:
+            pct = self.rng.uniform(0.005, 0.05)
         part = max(0, len(b.participants))
         pct = min(0.15, pct + 0.002 * part)
         cut = int(base * pct)
         if cut <= 0:
             cut = 1
         return cut
+
+    # =============================
+    # 通知
+    # =============================
+    def _notify(self, messages: List[Tuple[str, str]]) -> None:
+        # 配置了 NotificationDispatcher 时这里只是入队，投递在其后台线程完成
+        if messages:
+            self.notification.push_many(messages)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the notifications pushed so far reached the inboxes."""
+        return self.notification.flush(timeout)
+
+    # =============================
+    # 到期关闭
+    # =============================
+    def _schedule(self, b: Bargain) -> None:
+        if b.expires_at is None or b.closed:
+            return
+        delay = (b.expires_at - datetime.utcnow()).total_seconds()
+        if self._owns_scheduler:
+            with self._wheel_lock:
+                if not self._closed:
+                    self.scheduler.start()
+        self.scheduler.call_later(delay, self._expire, b.bargain_id)
+
+    @staticmethod
+    def _expired(b: Bargain) -> bool:
+        return b.expires_at is not None and b.expires_at <= datetime.utcnow()
+
+    def _expire(self, bid: str) -> None:
+        b = self.db.get_bargain(bid)
+        if b is None or b.closed:
+            return
+        if not self._expired(b):
+            # tick 取整可能早到一点，按剩余时间重新排期
+            self._schedule(b)
+            return
+        self._close(b)
+
+    def _close(self, b: Bargain) -> None:
+        # 与合并者互斥：关闭后排队中的加入都会得到 closed
+        q = self._queue(b.bargain_id)
+        messages: List[Tuple[str, str]] = []
+        with q.lock:
+            # 时间轮线程与 join_bargain 可能同时发现到期，只关闭、通知一次
+            with self._close_lock:
+                if b.closed:
+                    return
+                b.closed = True
+            self.db.add_bargain(b)
+            if q.pending:
+                messages = self._combine(b, q)
+        with self._queues_lock:
+            self._queues.pop(b.bargain_id, None)
+        p = self.db.get_product(b.product_id)
+        title = p.title if p else b.product_id
+        messages.append((b.requester_id,
+                         f"bargain for {title} closed at {b.current_price_cents} cents"))
+        self._notify(messages)
@@ -0,0 +1,195 @@
+"""Bounded notification queue delivered in batches by a background worker."""
+
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+# (user_id, message, 推送时间)
+Note = Tuple[str, str, datetime]
+Sink = Callable[[List[Note]], None]
+
+POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+class NotificationDispatcher:
+    """Decouples producers from notification delivery.
+
+    :meth:`enqueue` only appends to a queue of at most ``capacity``
+    notifications; a worker thread takes up to ``batch_size`` at a time
+    and hands each batch to every registered sink (e.g. the in-app inboxes,
+    an SMS or push gateway). When the queue is full, ``policy`` decides:
+    ``block`` waits for room (up to ``block_timeout`` seconds, then drops),
+    ``drop_newest`` rejects the new notification and ``drop_oldest``
+    evicts the oldest queued one. A sink that raises does not stop the
+    others; the error is counted and printed.
+
+    :meth:`metrics` reports queue depth and delivery lag, the time from
+    enqueue to the end of delivery.
+    """
+
+    def __init__(self, sinks: Iterable[Sink] = (), capacity: int = 10_000,
+                 batch_size: int = 256, policy: str = "block",
+                 block_timeout: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+        if policy not in POLICIES:
+            raise ValueError(f"unknown drop policy: {policy}")
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.clock = clock
+        self._sinks: List[Sink] = list(sinks)
+        # (通知, 入队时刻)
+        self._queue: Deque[Tuple[Note, float]] = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        # worker 正在等待新通知时才需要唤醒它
+        self._idle = False
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_depth = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._thread = threading.Thread(target=self._run, name="notify-dispatch", daemon=True)
+        self._thread.start()
+
+    def add_sink(self, sink: Sink) -> None:
+        with self._cond:
+            self._sinks.append(sink)
+
+    # =============================
+    # 生产者
+    # =============================
+    def enqueue(self, user_id: str, message: str) -> bool:
+        """Queue one notification; False if the drop policy discarded it."""
+        item = ((user_id, message, datetime.utcnow()), self.clock())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("notification dispatcher is closed")
+            queue = self._queue
+            if len(queue) >= self.capacity and not self._make_room():
+                self.dropped += 1
+                return False
+            queue.append(item)
+            self.enqueued += 1
+            if len(queue) > self.max_depth:
+                self.max_depth = len(queue)
+            if self._idle:
+                self._cond.notify_all()
+        return True
+
+    def enqueue_many(self, messages: Iterable[Tuple[str, str]]) -> int:
+        """Queue several notifications under one lock; return how many were accepted."""
+        ts = datetime.utcnow()
+        now = self.clock()
+        accepted = 0
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("notification dispatcher is closed")
+            for user_id, message in messages:
+                if len(self._queue) >= self.capacity and not self._make_room():
+                    self.dropped += 1
+                    continue
+                self._queue.append(((user_id, message, ts), now))
+                accepted += 1
+            self.enqueued += accepted
+            if len(self._queue) > self.max_depth:
+                self.max_depth = len(self._queue)
+            if accepted and self._idle:
+                self._cond.notify_all()
+        return accepted
+
+    def _make_room(self) -> bool:
+        # 持有 _cond 时调用；返回 False 表示这条新通知被丢弃
+        if self.policy == "drop_newest":
+            return False
+        if self.policy == "drop_oldest":
+            self._queue.popleft()
+            self.dropped += 1
+            return True
+        return self._cond.wait_for(lambda: len(self._queue) < self.capacity or self._closed,
+                                   self.block_timeout) and not self._closed
+
+    # =============================
+    # 投递
+    # =============================
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._queue and not self._closed:
+                    self._idle = True
+                    self._cond.wait_for(lambda: self._queue or self._closed)
+                    self._idle = False
+                if not self._queue:
+                    return
+                n = min(self.batch_size, len(self._queue))
+                batch = [self._queue.popleft() for _ in range(n)]
+                self._in_flight = n
+                sinks = list(self._sinks)
+                # 腾出了位置，唤醒 block 策略下等待的生产者
+                self._cond.notify_all()
+            notes = [note for note, _ in batch]
+            errors = 0
+            for sink in sinks:
+                try:
+                    sink(notes)
+                except Exception:
+                    errors += 1
+                    traceback.print_exc()
+            done = self.clock()
+            with self._cond:
+                for _, queued_at in batch:
+                    lag = done - queued_at
+                    self._lag_total += lag
+                    if lag > self._lag_max:
+                        self._lag_max = lag
+                self.delivered += n
+                self.batches += 1
+                self.errors += errors
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far was delivered; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def close(self) -> None:
+        """Deliver what is still queued, then stop the worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    # =============================
+    # 指标
+    # =============================
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def metrics(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "depth": len(self._queue),
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "errors": self.errors,
+                "mean_batch": self.delivered / self.batches if self.batches else 0.0,
+                "lag_ms": self._lag_total * 1000 / self.delivered if self.delivered else 0.0,
+                "max_lag_ms": self._lag_max * 1000,
+            }
@@ -0,0 +1,142 @@
+"""Bounded per-user browsing history of interned product handles."""
+
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class ProductHandles:
+    """Interns product ids as small ints so histories store 4-byte handles."""
+
+    def __init__(self) -> None:
+        self._handle: Dict[str, int] = {}
+        self._pids: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pids)
+
+    def handle(self, pid: str) -> int:
+        h = self._handle.get(pid)
+        if h is None:
+            with self._lock:
+                h = self._handle.get(pid)
+                if h is None:
+                    # 先登记反查表，再发布 handle，读者拿到的 handle 一定可解析
+                    self._pids.append(pid)
+                    h = self._handle[pid] = len(self._pids) - 1
+        return h
+
+    def pid(self, handle: int) -> str:
+        return self._pids[handle]
+
+
+class _Ring:
+    """Fixed-size ring buffer of handles; the oldest entry is overwritten."""
+
+    __slots__ = ("buf", "start", "size", "seen")
+
+    def __init__(self, depth: int) -> None:
+        self.buf = array("i", bytes(4 * depth))
+        self.start = 0
+        self.size = 0
+        # 最近一次写入的时间，按空闲时长淘汰时用
+        self.seen = 0.0
+
+    def append(self, h: int) -> None:
+        depth = len(self.buf)
+        if self.size < depth:
+            self.buf[(self.start + self.size) % depth] = h
+            self.size += 1
+        else:
+            self.buf[self.start] = h
+            self.start = (self.start + 1) % depth
+
+    def items(self) -> List[int]:
+        depth = len(self.buf)
+        return [self.buf[(self.start + i) % depth] for i in range(self.size)]
+
+
+class UserHistory:
+    """Last ``depth`` products per user, for at most ``max_users`` users.
+
+    Each user costs one small ring buffer of int handles regardless of how
+    long they browse; when more than ``max_users`` users are tracked the
+    least recently active one is evicted. With ``max_idle`` set, users with
+    no activity for that many seconds are dropped as well, so a quiet
+    period shrinks the table instead of holding it at the cap. Reads
+    return product ids, oldest first, like the plain lists this replaces.
+    """
+
+    def __init__(self, depth: int = 10, max_users: int = 100_000,
+                 max_idle: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if depth <= 0 or max_users <= 0:
+            raise ValueError("depth and max_users must be positive")
+        if max_idle is not None and max_idle <= 0:
+            raise ValueError("max_idle must be positive")
+        self.depth = depth
+        self.max_users = max_users
+        self.max_idle = max_idle
+        self.clock = clock
+        self.handles = ProductHandles()
+        self._rings: "OrderedDict[str, _Ring]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._rings
+
+    def append(self, user_id: str, pid: str) -> None:
+        h = self.handles.handle(pid)
+        now = self.clock()
+        with self._lock:
+            ring = self._rings.get(user_id)
+            if ring is None:
+                ring = self._rings[user_id] = _Ring(self.depth)
+                while len(self._rings) > self.max_users:
+                    # 最久未活跃的用户先淘汰
+                    self._rings.popitem(last=False)
+            else:
+                self._rings.move_to_end(user_id)
+            ring.seen = now
+            ring.append(h)
+            self._drop_idle(now)
+
+    def expire(self) -> int:
+        """Drop users idle longer than ``max_idle``; return how many were dropped."""
+        with self._lock:
+            return self._drop_idle(self.clock())
+
+    def _drop_idle(self, now: float) -> int:
+        if self.max_idle is None:
+            return 0
+        dropped = 0
+        # 按活跃先后排列，只需从队头看起
+        while self._rings:
+            oldest = next(iter(self._rings.values()))
+            if now - oldest.seen <= self.max_idle:
+                break
+            self._rings.popitem(last=False)
+            dropped += 1
+        return dropped
+
+    def get(self, user_id: str) -> List[str]:
+        ring = self._rings.get(user_id)
+        if ring is None:
+            return []
+        pid = self.handles.pid
+        return [pid(h) for h in ring.items()]
+
+    def __getitem__(self, user_id: str) -> List[str]:
+        return self.get(user_id)
+
+    def __setitem__(self, user_id: str, pids: Iterable[str]) -> None:
+        with self._lock:
+            self._rings.pop(user_id, None)
+        for pid in pids:
+            self.append(user_id, pid)
@@ -0,0 +1,95 @@
+"""Idempotency keys: bounded TTL cache of request results."""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Tuple
+
+Entry = Tuple[float, Hashable, "Future[Any]"]
+
+
+def completed(value: Any) -> "Future[Any]":
+    fut: "Future[Any]" = Future()
+    fut.set_result(value)
+    return fut
+
+
+class IdempotencyCache:
+    """Maps an idempotency key to the (possibly still running) result.
+
+    The first request for a key starts the work; concurrent duplicates get
+    the same future and so coalesce onto the in-flight attempt, and later
+    duplicates within ``ttl`` seconds get the recorded result. Attempts
+    that raise are forgotten so the caller may retry with the same key.
+    At most ``max_entries`` keys are kept; the oldest go first.
+    """
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 10000,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        # 所有条目 TTL 相同，插入顺序即过期顺序
+        self._entries: "OrderedDict[Hashable, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def run(self, key: Hashable, scope: Hashable,
+            start: Callable[[], "Future[Any]"]) -> "Future[Any]":
+        """Return the future for ``key``, calling ``start`` only on a miss.
+
+        ``scope`` identifies what the key was issued for (e.g. the order
+        id); reusing a key for a different scope raises ``ValueError``.
+        """
+        with self._lock:
+            self._purge()
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] != scope:
+                    raise ValueError("idempotency key reused for a different request")
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            fut: "Future[Any]" = Future()
+            self._entries[key] = (self.clock() + self.ttl, scope, fut)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        try:
+            inner = start()
+        except BaseException as exc:
+            self._forget(key, fut)
+            fut.set_exception(exc)
+            raise
+        inner.add_done_callback(lambda done: self._settle(key, fut, done))
+        return fut
+
+    def _settle(self, key: Hashable, fut: "Future[Any]", done: "Future[Any]") -> None:
+        exc = done.exception()
+        if exc is not None:
+            self._forget(key, fut)
+            fut.set_exception(exc)
+        else:
+            fut.set_result(done.result())
+
+    def _forget(self, key: Hashable, fut: "Future[Any]") -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is fut:
+                del self._entries[key]
+
+    def _purge(self) -> None:
+        now = self.clock()
+        while self._entries:
+            expires_at = next(iter(self._entries.values()))[0]
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
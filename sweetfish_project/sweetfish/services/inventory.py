@@ -0,0 +1,187 @@
+"""Stock reservations: atomic per-product check-and-reserve with TTL."""
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..db import MemoryDB
+from ..models import Product
+
+
+@dataclass
+class Reservation:
+
+    order_id: str
+    items: Dict[str, int]
+    # None 表示支付进行中，不会过期
+    expires_at: Optional[float]
+
+
+class StockReservations:
+    """Holds stock for unpaid orders so concurrent checkouts cannot oversell.
+
+    A product's free stock is ``stock - reserved``. Checking and reserving
+    happen under that product's lock stripe (``db.lock_products``), so
+    buyers of different products never wait on each other. Reservations
+    expire after ``ttl`` seconds unless pinned by an in-flight payment;
+    expiry is applied lazily whenever stock is reserved or queried.
+    """
+
+    def __init__(self, db: MemoryDB, ttl: float = 900.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.db = db
+        self.ttl = ttl
+        self.clock = clock
+        self._reserved: Dict[str, int] = {}
+        self._by_order: Dict[str, Reservation] = {}
+        # (到期时间, 序号, order_id)，过期时再核对预留是否仍是同一个
+        self._expiry: List[Tuple[float, int, str]] = []
+        self._expiry_lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def reserved(self, pid: str) -> int:
+        return self._reserved.get(pid, 0)
+
+    def available(self, pid: str) -> int:
+        self.expire()
+        p = self.db.get_product(pid)
+        return 0 if p is None else p.stock - self.reserved(pid)
+
+    def get(self, order_id: str) -> Optional[Reservation]:
+        return self._by_order.get(order_id)
+
+    def reserve(self, order_id: str, items: Iterable[Tuple[str, int]],
+                pinned: bool = False) -> Reservation:
+        """Atomically reserve every item of an order, or nothing at all."""
+        return self.reserve_many({order_id: items}, pinned=pinned)[0]
+
+    def reserve_many(self, orders: Dict[str, Iterable[Tuple[str, int]]],
+                     pinned: bool = False) -> List[Reservation]:
+        """Reserve stock for several orders under one lock pass: all or none."""
+        wanted = {oid: _group(items) for oid, items in orders.items()}
+        totals: Dict[str, int] = {}
+        for items in wanted.values():
+            for pid, qty in items.items():
+                totals[pid] = totals.get(pid, 0) + qty
+        self.expire()
+        with self.db.lock_products(totals):
+            for oid in wanted:
+                if oid in self._by_order:
+                    raise ValueError("order already has a reservation")
+            for pid, qty in totals.items():
+                p = self.db.get_product(pid)
+                if not p:
+                    raise ValueError("product not found")
+                if p.stock - self.reserved(pid) < qty:
+                    raise ValueError("insufficient stock")
+            for pid, qty in totals.items():
+                self._reserved[pid] = self.reserved(pid) + qty
+            expires_at = None if pinned else self.clock() + self.ttl
+            made = [Reservation(oid, items, expires_at) for oid, items in wanted.items()]
+            for res in made:
+                self._by_order[res.order_id] = res
+        if expires_at is not None:
+            for res in made:
+                self._schedule(res)
+        return made
+
+    def pin(self, order_id: str, items: Iterable[Tuple[str, int]]) -> Reservation:
+        """Keep an order's stock held while its payment is in flight.
+
+        Re-reserves if the earlier hold was released (failed payment or
+        expiry), which may raise ``insufficient stock``.
+        """
+        res = self._by_order.get(order_id)
+        if res is not None:
+            with self.db.lock_products(res.items):
+                if self._by_order.get(order_id) is res:
+                    res.expires_at = None
+                    return res
+        return self.reserve(order_id, items, pinned=True)
+
+    def commit(self, order_id: str,
+               items: Optional[Iterable[Tuple[str, int]]] = None) -> List[Product]:
+        """Turn the held stock into a sale; returns the products touched.
+
+        With ``items``, an order whose hold is gone (expired, or lost in a
+        restart) still takes its stock; otherwise that raises.
+        """
+        res = self._by_order.get(order_id)
+        if res is None and items is None:
+            raise ValueError("no reservation for order")
+        wanted = res.items if res is not None else _group(items)
+        sold = []
+        with self.db.lock_products(wanted):
+            held = self._by_order.get(order_id)
+            if held is not None:
+                # 同一订单的预留即使被释放后重建，商品与数量也不变
+                del self._by_order[order_id]
+                wanted = held.items
+            elif items is None:
+                raise ValueError("no reservation for order")
+            for pid, qty in wanted.items():
+                if held is not None:
+                    self._unreserve(pid, qty)
+                p = self.db.get_product(pid)
+                if p:
+                    p.stock = max(0, p.stock - qty)
+                    p.sold += qty
+                    self.db.touch_product(p)
+                    sold.append(p)
+        return sold
+
+    def release(self, order_id: str) -> bool:
+        res = self._by_order.get(order_id)
+        if res is None:
+            return False
+        with self.db.lock_products(res.items):
+            if self._by_order.get(order_id) is not res:
+                return False
+            del self._by_order[order_id]
+            for pid, qty in res.items.items():
+                self._unreserve(pid, qty)
+        return True
+
+    def expire(self) -> int:
+        """Release every unpinned reservation whose TTL has passed."""
+        now = self.clock()
+        if not self._expiry or self._expiry[0][0] > now:
+            return 0
+        due = []
+        with self._expiry_lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                due.append(heapq.heappop(self._expiry))
+        released = 0
+        for expires_at, _, order_id in due:
+            res = self._by_order.get(order_id)
+            # 续期或被支付固定的预留不在这里释放
+            if res is not None and res.expires_at == expires_at:
+                with self.db.lock_products(res.items):
+                    if res.expires_at == expires_at and self.release(order_id):
+                        released += 1
+        return released
+
+    def _schedule(self, res: Reservation) -> None:
+        with self._expiry_lock:
+            heapq.heappush(self._expiry, (res.expires_at, next(self._seq), res.order_id))
+
+    def _unreserve(self, pid: str, qty: int) -> None:
+        left = self._reserved.get(pid, 0) - qty
+        if left > 0:
+            self._reserved[pid] = left
+        else:
+            self._reserved.pop(pid, None)
+
+
+def _group(items: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    wanted: Dict[str, int] = {}
+    for pid, qty in items:
+        if qty <= 0:
+            raise ValueError("quantity must be positive")
+        wanted[pid] = wanted.get(pid, 0) + qty
+    return wanted
@@ -0,0 +1,103 @@
+"""Item-to-item collaborative filtering from co-view/co-purchase events."""
+
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+VIEW_WEIGHT = 1.0
+PURCHASE_WEIGHT = 3.0
+
+
+class ItemCooccurrence:
+    """Sparse co-occurrence matrix with an incrementally kept top-N per item.
+
+    Each event links the product to the user's last ``window`` distinct
+    earlier products (the caller passes that history), adding the event
+    weight to both cells of the symmetric matrix. Scores only ever grow,
+    so a product's neighbour list stays exact by updating the entry in
+    place or letting the newcomer replace the current minimum:
+    O(window x N) per event. Serving merges the neighbour lists of the
+    recent history: O(history x N), independent of catalogue size.
+
+    A row keeps at most ``candidates`` counts. When it overflows, the
+    lowest counts outside the neighbour list are dropped down to half
+    that, so memory is bounded by catalogue size x ``candidates``; a
+    dropped pair that co-occurs again starts counting from zero.
+    """
+
+    def __init__(self, neighbours: int = 20, window: int = 10,
+                 candidates: Optional[int] = None) -> None:
+        if neighbours <= 0 or window <= 0:
+            raise ValueError("neighbours and window must be positive")
+        if candidates is None:
+            candidates = 10 * neighbours
+        if candidates < 2 * neighbours:
+            raise ValueError("candidates must be at least twice neighbours")
+        self.neighbours = neighbours
+        self.window = window
+        self.candidates = candidates
+        self._counts: Dict[str, Dict[str, float]] = {}
+        # product_id -> [(score, other_id)]，按分数降序，最多 neighbours 个
+        self._top: Dict[str, List[Tuple[float, str]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, product_id: str, recent: Sequence[str], weight: float = VIEW_WEIGHT) -> None:
+        """Link ``product_id`` to the user's ``recent`` products (oldest first)."""
+        others: List[str] = []
+        for other in reversed(recent):
+            if other != product_id and other not in others:
+                others.append(other)
+                if len(others) == self.window:
+                    break
+        with self._lock:
+            for other in others:
+                self._add(product_id, other, weight)
+                self._add(other, product_id, weight)
+
+    def _add(self, a: str, b: str, weight: float) -> None:
+        row = self._counts.setdefault(a, {})
+        score = row[b] = row.get(b, 0.0) + weight
+        top = self._top.setdefault(a, [])
+        if len(row) > self.candidates:
+            self._prune(row, top, b)
+        for i, (_, pid) in enumerate(top):
+            if pid == b:
+                top[i] = (score, b)
+                break
+        else:
+            if len(top) < self.neighbours:
+                top.append((score, b))
+            elif score > top[-1][0]:
+                top[-1] = (score, b)
+            else:
+                return
+        top.sort(key=lambda sp: -sp[0])
+
+    def _prune(self, row: Dict[str, float], top: List[Tuple[float, str]], fresh: str) -> None:
+        # 邻居表里的与刚写入的保留，其余按计数留前一半；均摊每次写入 O(log candidates)
+        keep = {pid for _, pid in top}
+        keep.add(fresh)
+        rest = [(s, pid) for pid, s in row.items() if pid not in keep]
+        room = self.candidates // 2 - len(keep)
+        keep.update(pid for _, pid in heapq.nlargest(max(room, 0), rest))
+        for pid in [pid for pid in row if pid not in keep]:
+            del row[pid]
+
+    def score(self, a: str, b: str) -> float:
+        return self._counts.get(a, {}).get(b, 0.0)
+
+    def neighbours_of(self, product_id: str) -> List[Tuple[str, float]]:
+        return [(pid, s) for s, pid in self._top.get(product_id, [])]
+
+    def recommend(self, history: Iterable[str], top_k: int) -> List[Tuple[str, float]]:
+        """Merge neighbour lists of ``history`` (most recent last)."""
+        recent = list(history)
+        seen = set(recent)
+        scores: Dict[str, float] = {}
+        for age, pid in enumerate(reversed(recent)):
+            # 越近的浏览/购买权重越高
+            decay = 1.0 / (1 + age)
+            for score, other in list(self._top.get(pid, ())):
+                if other not in seen:
+                    scores[other] = scores.get(other, 0.0) + score * decay
+        return heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
@@ -1,19 +1,83 @@
 """Module adjusted to satisfy style checks."""
 
+import threading
+from collections import deque
 from datetime import datetime
-from typing import List, Tuple
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 
 from ..db import MemoryDB
+from .dispatcher import NotificationDispatcher, Note
+
+
+class Inbox:
+    """Bounded per-user ring buffer with a read cursor."""
+
+    def __init__(self, retention: int) -> None:
+        self.items: Deque[Tuple[str, datetime]] = deque(maxlen=retention)
+        # 累计推送数与已读游标，都是单调递增的序号
+        self.pushed = 0
+        self.read_seq = 0
+
+    def append(self, message: str, ts: datetime) -> None:
+        self.items.append((message, ts))
+        self.pushed += 1
+
+    @property
+    def unread(self) -> int:
+        # 被挤出缓冲区的旧消息不再计入未读
+        oldest_kept = self.pushed - len(self.items)
+        return self.pushed - max(self.read_seq, oldest_kept)
+
+    def mark_read(self) -> None:
+        self.read_seq = self.pushed
 
 
 class NotificationService:
+    """Per-user inboxes, filled inline or through a :class:`NotificationDispatcher`.
 
-    def __init__(self, db: MemoryDB) -> None:
+    With a ``dispatcher`` the service registers its inboxes as one of the
+    dispatcher's sinks and :meth:`push` only enqueues; messages show up in
+    the inbox once the worker delivered their batch (see :meth:`flush`).
+    """
+
+    def __init__(self, db: MemoryDB, retention: int = 200,
+                 dispatcher: Optional[NotificationDispatcher] = None) -> None:
+        if retention <= 0:
+            raise ValueError("retention must be positive")
         self.db = db
-        self.messages: List[Tuple[str, str, datetime]] = []
+        self.retention = retention
+        self.inboxes: Dict[str, Inbox] = {}
+        self._lock = threading.Lock()
+        self.dispatcher = dispatcher
+        if dispatcher is not None:
+            dispatcher.add_sink(self.deliver)
 
     def push(self, user_id: str, message: str) -> None:
-        self.messages.append((user_id, message, datetime.utcnow()))
+        if self.dispatcher is not None:
+            self.dispatcher.enqueue(user_id, message)
+        else:
+            self.deliver([(user_id, message, datetime.utcnow())])
+
+    def push_many(self, messages: Iterable[Tuple[str, str]]) -> None:
+        """Push ``(user_id, message)`` pairs, enqueued under one lock when dispatched."""
+        if self.dispatcher is not None:
+            self.dispatcher.enqueue_many(messages)
+        else:
+            now = datetime.utcnow()
+            self.deliver([(user_id, message, now) for user_id, message in messages])
+
+    def deliver(self, notes: List[Note]) -> None:
+        """Inbox sink: append a batch of notifications under one lock."""
+        with self._lock:
+            for user_id, message, ts in notes:
+                inbox = self.inboxes.get(user_id)
+                if inbox is None:
+                    inbox = self.inboxes[user_id] = Inbox(self.retention)
+                inbox.append(message, ts)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for dispatched notifications to reach the inboxes; False on timeout."""
+        return self.dispatcher.flush(timeout) if self.dispatcher is not None else True
 
     def push_payment_success(self, order_id: str, payment_id: str) -> None:
         order = self.db.get_order(order_id)
@@ -25,5 +89,17 @@ class NotificationService:
         if order:
             self.push(order.buyer_id, f"支付失败: 订单 {order.order_id}，支付ID {payment_id}")
 
-    def get_notifications_for_user(self, user_id: str):
-        return [(msg, ts) for (uid, msg, ts) in self.messages if uid == user_id]
+    def get_notifications_for_user(self, user_id: str) -> List[Tuple[str, datetime]]:
+        with self._lock:
+            inbox = self.inboxes.get(user_id)
+            return list(inbox.items) if inbox else []
+
+    def unread_count(self, user_id: str) -> int:
+        inbox = self.inboxes.get(user_id)
+        return inbox.unread if inbox else 0
+
+    def mark_read(self, user_id: str) -> None:
+        with self._lock:
+            inbox = self.inboxes.get(user_id)
+            if inbox:
+                inbox.mark_read()
@@ -1,23 +1,45 @@
 """Module adjusted to satisfy style checks."""
 
-from typing import List, Tuple
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Set, Tuple
 
 from ..db import MemoryDB
-from ..models import Order, OrderItem, OrderStatus, gen_id
+from ..models import Order, OrderItem, OrderStatus, Payment, gen_id
+from ..scheduler import TimingWheel
 from ..services import credit
 from ..services.recommend import RecommendationEngine
+from .idempotency import IdempotencyCache, completed
+from .inventory import StockReservations
 from .notification import NotificationService
 from .payment import PaymentGateway
+from .payment_pipeline import AsyncPaymentPipeline
 
 
 class OrderService:
     def __init__(self, db: MemoryDB, payment_gateway: PaymentGateway, notification: NotificationService,
-            credit_system: credit.CreditSystem, rec_engine: RecommendationEngine) -> None:
+            credit_system: credit.CreditSystem, rec_engine: RecommendationEngine,
+            reservations: Optional[StockReservations] = None,
+            payment_pipeline: Optional[AsyncPaymentPipeline] = None,
+            idempotency: Optional[IdempotencyCache] = None,
+            scheduler: Optional[TimingWheel] = None,
+            payment_timeout: Optional[float] = None) -> None:
         self.db = db
         self.payment_gateway = payment_gateway
         self.notification = notification
         self.credit_system = credit_system
         self.rec_engine = rec_engine
+        self.reservations = reservations or StockReservations(db)
+        self.payment_pipeline = payment_pipeline
+        self.idempotency = idempotency or IdempotencyCache()
+        # 给了时间轮和超时秒数时，未在时限内支付的订单自动取消并释放库存
+        if payment_timeout is not None and (scheduler is None or payment_timeout <= 0):
+            raise ValueError("payment_timeout needs a scheduler and a positive value")
+        self.scheduler = scheduler
+        self.payment_timeout = payment_timeout
+        # 正在支付中的订单，防止重复点击发起两笔扣款
+        self._paying: Set[str] = set()
+        self._paying_lock = threading.Lock()
 
     def create_order(self, buyer_id: str, items: List[Tuple[str, int]]) -> Order:
         total = 0
@@ -27,38 +49,192 @@ class OrderService:
             p = self.db.get_product(pid)
             if not p:
                 raise ValueError("product not found")
-            if p.stock < qty:
-                raise ValueError("insufficient stock")
             if merchant_id is None:
                 merchant_id = p.merchant_id
             elif merchant_id != p.merchant_id:
                 raise ValueError("all items must be from same merchant in demo")
             total += p.price_cents * qty
-            parsed_items.append(OrderItem(product_id=pid, quantity=qty))
+            parsed_items.append(OrderItem(product_id=pid, quantity=qty, unit_price_cents=p.price_cents))
         order = Order(order_id=gen_id("o_"), buyer_id=buyer_id, merchant_id=merchant_id or "unknown",
                       items=parsed_items, total_cents=total)
-        self.db.add_order(order)
+        # 原子地检查并预留库存，并发下单不会超卖
+        self.reservations.reserve(order.order_id, items)
+        try:
+            self.db.add_order(order)
+        except BaseException:
+            self.reservations.release(order.order_id)
+            raise
+        self._schedule_timeout(order)
         for pid, _ in items:
             self.rec_engine.record_view(buyer_id, pid)
         return order
 
-    def pay_order(self, order_id: str, succeed_rate: float = 0.95):
+    def create_orders_bulk(self, buyer_id: str, cart: List[Tuple[str, int]]) -> List[Order]:
+        """Check out a cart that may span merchants: one order per merchant.
+
+        Items are validated in a single pass, stock for every order is
+        reserved under one lock pass and the orders are stored in one batch;
+        if anything fails no order is created and nothing stays reserved.
+        """
+        if not cart:
+            raise ValueError("cart is empty")
+        quantities: Dict[str, int] = {}
+        for pid, qty in cart:
+            if qty <= 0:
+                raise ValueError("quantity must be positive")
+            quantities[pid] = quantities.get(pid, 0) + qty
+        # merchant_id -> 该商家的订单行（保持购物车中的先后顺序）
+        by_merchant: Dict[str, List[OrderItem]] = {}
+        totals: Dict[str, int] = {}
+        for pid, qty in quantities.items():
+            p = self.db.get_product(pid)
+            if not p:
+                raise ValueError("product not found")
+            by_merchant.setdefault(p.merchant_id, []).append(
+                OrderItem(product_id=pid, quantity=qty, unit_price_cents=p.price_cents))
+            totals[p.merchant_id] = totals.get(p.merchant_id, 0) + p.price_cents * qty
+        orders = [
+            Order(order_id=gen_id("o_"), buyer_id=buyer_id, merchant_id=merchant_id,
+                  items=items, total_cents=totals[merchant_id])
+            for merchant_id, items in by_merchant.items()
+        ]
+        self.reservations.reserve_many(
+            {o.order_id: [(it.product_id, it.quantity) for it in o.items] for o in orders}
+        )
+        try:
+            self.db.add_orders(orders)
+        except BaseException:
+            for o in orders:
+                self.reservations.release(o.order_id)
+            raise
+        for o in orders:
+            self._schedule_timeout(o)
+        for pid in quantities:
+            self.rec_engine.record_view(buyer_id, pid)
+        return orders
+
+    def pay_order(self, order_id: str, succeed_rate: float = 0.95,
+                  idempotency_key: Optional[str] = None):
+        """Pay an order synchronously.
+
+        With an ``idempotency_key``, a repeated call returns the payment of
+        the first attempt instead of charging again; a concurrent repeat
+        waits for the attempt already running.
+        """
+        if idempotency_key is None:
+            return self._pay_now(order_id, succeed_rate)
+        return self.idempotency.run(
+            idempotency_key, order_id, lambda: completed(self._pay_now(order_id, succeed_rate))
+        ).result()
+
+    def _pay_now(self, order_id: str, succeed_rate: float) -> Payment:
+        order, pay = self._begin_payment(order_id)
+        try:
+            processed = self.payment_gateway.process_payment(pay, succeed_rate=succeed_rate)
+        except BaseException:
+            self._abort_payment(order)
+            raise
+        self._apply_payment_result(order, processed)
+        return processed
+
+    def pay_order_async(self, order_id: str,
+                        idempotency_key: Optional[str] = None) -> "Future[Payment]":
+        """Start paying an order without blocking the caller.
+
+        The charge runs on the payment pipeline; stock, order status,
+        purchase history and credit are updated on its worker thread. The
+        returned future resolves to the processed payment. Idempotency keys
+        behave as in :meth:`pay_order`.
+        """
+        if idempotency_key is None:
+            return self._submit_payment(order_id)
+        return self.idempotency.run(idempotency_key, order_id,
+                                    lambda: self._submit_payment(order_id))
+
+    def _submit_payment(self, order_id: str) -> "Future[Payment]":
+        if self.payment_pipeline is None:
+            raise ValueError("no payment pipeline configured")
+        order, pay = self._begin_payment(order_id)
+        try:
+            return self.payment_pipeline.submit(
+                pay, lambda processed: self._apply_payment_result(order, processed)
+            )
+        except BaseException:
+            self._abort_payment(order)
+            raise
+
+    def _begin_payment(self, order_id: str) -> Tuple[Order, Payment]:
         order = self.db.get_order(order_id)
         if not order:
             raise ValueError("order not found")
-        if order.status != OrderStatus.CREATED:
-            raise ValueError("order not payable")
-        pay = self.payment_gateway.create_payment(order)
-        processed = self.payment_gateway.process_payment(pay, succeed_rate=succeed_rate)
-        if processed.status == "success":
-            order.mark_paid(processed.payment_id)
-            for it in order.items:
-                p = self.db.get_product(it.product_id)
-                if p:
-                    p.stock = max(0, p.stock - it.quantity)
-                    p.sold += it.quantity
-                    self.rec_engine.record_purchase(order.buyer_id, it.product_id)
-            self.credit_system.adjust_for_payment(order.buyer_id, True)
-        else:
-            self.credit_system.adjust_for_payment(order.buyer_id, False)
-        return processed
+        with self._paying_lock:
+            if order.status != OrderStatus.CREATED:
+                raise ValueError("order not payable")
+            if order_id in self._paying:
+                raise ValueError("payment already in progress")
+            self._paying.add(order_id)
+        try:
+            # 支付期间预留不过期；之前已释放（失败/超时）则重新预留
+            self.reservations.pin(order.order_id, [(it.product_id, it.quantity) for it in order.items])
+            return order, self.payment_gateway.create_payment(order)
+        except BaseException:
+            # pin 成功后建单失败时，预留不能一直钉住
+            self._abort_payment(order)
+            raise
+
+    def _abort_payment(self, order: Order) -> None:
+        self.reservations.release(order.order_id)
+        with self._paying_lock:
+            self._paying.discard(order.order_id)
+
+    def _apply_payment_result(self, order: Order, processed: Payment) -> None:
+        try:
+            if processed.status == "success":
+                self.complete_payment(order, processed.payment_id)
+            else:
+                self.reservations.release(order.order_id)
+                self.credit_system.adjust_for_payment(order.buyer_id, False)
+        finally:
+            with self._paying_lock:
+                self._paying.discard(order.order_id)
+
+    def complete_payment(self, order: Order, payment_id: str) -> bool:
+        """Settle a successful charge: mark the order paid and sell its stock.
+
+        Also used by reconciliation for charges whose result never reached
+        the order; if the stock hold is gone by then (expired, or lost in a
+        restart) the stock is taken directly. Returns False, changing
+        nothing, if the order is no longer awaiting payment.
+        """
+        with self._paying_lock:
+            if order.status != OrderStatus.CREATED:
+                return False
+            self.db.mark_order_paid(order, payment_id)
+        self.reservations.commit(order.order_id, [(it.product_id, it.quantity) for it in order.items])
+        for it in order.items:
+            self.rec_engine.record_purchase(order.buyer_id, it.product_id)
+        self.credit_system.adjust_for_payment(order.buyer_id, True)
+        return True
+
+    # =============================
+    # 支付超时
+    # =============================
+    def _schedule_timeout(self, order: Order) -> None:
+        if self.payment_timeout is not None:
+            self.scheduler.call_later(self.payment_timeout, self._expire_unpaid, order.order_id)
+
+    def _expire_unpaid(self, order_id: str) -> None:
+        """Cancel an order still unpaid at its deadline and give its stock back."""
+        order = self.db.get_order(order_id)
+        if order is None:
+            return
+        with self._paying_lock:
+            if order.status != OrderStatus.CREATED:
+                return
+            if order_id in self._paying:
+                # 支付进行中：再等一个超时周期，支付失败的订单到时仍会被取消
+                self._schedule_timeout(order)
+                return
+            self.reservations.release(order_id)
+            self.db.set_order_status(order, OrderStatus.CANCELLED)
+        self.notification.push(order.buyer_id, f"订单 {order_id} 超时未支付，已自动取消")
@@ -1,17 +1,22 @@
 """Module adjusted to satisfy style checks."""
 
-import random
+import datetime
+from typing import List, Optional
 
 from ..db import MemoryDB
 from ..models import Payment
+from ..rng import RandomStream
 from ..services.notification import NotificationService
 
 
 class PaymentGateway:
 
-    def __init__(self, db: MemoryDB, notification: NotificationService) -> None:
+    def __init__(self, db: MemoryDB, notification: NotificationService,
+                 rng: Optional[RandomStream] = None, seed: Optional[int] = None) -> None:
         self.db = db
         self.notification = notification
+        # 模拟支付结果的随机源；固定 seed 时压测可重放
+        self.rng = rng or RandomStream(seed, name="payment")
 
     def create_payment(self, order) -> Payment:
         pay_id = "pay_" + __import__("uuid").uuid4().hex[:12]
@@ -20,10 +25,22 @@ class PaymentGateway:
         return pay
 
     def process_payment(self, payment: Payment, succeed_rate: float = 0.95) -> Payment:
-        if random.random() < succeed_rate:
+        return self.complete_payment(payment, self.rng.random() < succeed_rate)
+
+    def process_payments(self, payments: List[Payment], succeed_rate: float = 0.95) -> List[Payment]:
+        """Simulate a batch of payments with the outcomes drawn as one block."""
+        draws = self.rng.random_block(len(payments))
+        return [self.complete_payment(pay, x < succeed_rate) for pay, x in zip(payments, draws)]
+
+    def complete_payment(self, payment: Payment, succeeded: bool) -> Payment:
+        """Record a provider's verdict: status, buyer notification and log."""
+        payment.updated_at = datetime.datetime.utcnow()
+        if succeeded:
             payment.status = "success"
             self.notification.push_payment_success(payment.order_id, payment.payment_id)
         else:
             payment.status = "failed"
             self.notification.push_payment_failure(payment.order_id, payment.payment_id)
+        # 回写结果状态（持久化模式下记入日志）
+        self.db.add_payment(payment)
         return payment
@@ -0,0 +1,209 @@
+"""Asynchronous payment pipeline with a pluggable provider."""
+
+import asyncio
+import random
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from ..models import Payment
+from .payment import PaymentGateway
+
+
+class ProviderError(Exception):
+    """Transient provider failure; the pipeline retries it."""
+
+
+class PaymentProvider:
+    """Interface to a payment provider.
+
+    ``charge`` returns True when the payment is approved and False when it
+    is declined; transient problems raise :class:`ProviderError`.
+    ``charge_batch`` submits several payments in one round trip and returns
+    one verdict per payment; by default it just charges them one by one.
+    """
+
+    name = "provider"
+
+    async def charge(self, payment: Payment) -> bool:
+        raise NotImplementedError
+
+    async def charge_batch(self, payments: List[Payment]) -> List[bool]:
+        return list(await asyncio.gather(*(self.charge(p) for p in payments)))
+
+
+class FakePaymentProvider(PaymentProvider):
+    """Local stand-in with configurable latency, declines and outages."""
+
+    name = "BliPay"
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, decline_rate: float = 0.02,
+                 error_rate: float = 0.0, rng: Optional[random.Random] = None) -> None:
+        if latency < 0 or jitter < 0:
+            raise ValueError("latency must not be negative")
+        self.latency = latency
+        self.jitter = jitter
+        self.decline_rate = decline_rate
+        self.error_rate = error_rate
+        self.rng = rng or random.Random()
+        self.calls = 0
+
+    async def charge(self, payment: Payment) -> bool:
+        return (await self.charge_batch([payment]))[0]
+
+    async def charge_batch(self, payments: List[Payment]) -> List[bool]:
+        # 每次调用一个往返延迟，与批大小无关
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if self.rng.random() < self.error_rate:
+            raise ProviderError("provider unavailable")
+        return [self.rng.random() >= self.decline_rate for _ in payments]
+
+
+class AsyncPaymentPipeline:
+    """Runs provider calls on a private asyncio loop in a background thread.
+
+    At most ``max_concurrency`` charges are in flight. Each attempt is
+    bounded by ``timeout`` seconds; timeouts and :class:`ProviderError`
+    are retried up to ``retries`` times with exponential backoff, after
+    which the payment is recorded as failed. Completion callbacks run on
+    a worker thread, never on the caller's (e.g. the Tk event) thread.
+
+    With ``batch_size`` > 1 pending payments are accumulated and sent with
+    ``charge_batch`` once ``batch_size`` are waiting or ``batch_window``
+    seconds after the first one arrived, whichever comes first.
+
+    :meth:`close` sends whatever is still queued and waits for it; charges
+    still running after its timeout are recorded as failed and their
+    futures raise ``RuntimeError``.
+    """
+
+    def __init__(self, gateway: PaymentGateway, provider: PaymentProvider,
+                 max_concurrency: int = 8, timeout: float = 5.0, retries: int = 2,
+                 backoff: float = 0.2, backoff_max: float = 2.0,
+                 batch_size: int = 1, batch_window: float = 0.01) -> None:
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+        if timeout <= 0:
+            raise ValueError("timeout must be positive")
+        if retries < 0:
+            raise ValueError("retries must not be negative")
+        if batch_size <= 0:
+            raise ValueError("batch_size must be positive")
+        self.gateway = gateway
+        self.provider = provider
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        # 仅在事件循环线程内访问，无需加锁
+        self._pending: List[Tuple[Payment, "asyncio.Future[bool]"]] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._loop = asyncio.new_event_loop()
+        # 在事件循环线程里首次使用时创建，保证绑定到正确的 loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 关闭标志与提交互斥：close 开始收尾后不会再有新任务进入事件循环
+        self._closed = False
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(self, payment: Payment,
+               on_complete: Optional[Callable[[Payment], None]] = None) -> "Future[Payment]":
+        """Charge ``payment``; the future resolves after ``on_complete`` ran."""
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("payment pipeline is closed")
+            payment.provider = self.provider.name
+            return asyncio.run_coroutine_threadsafe(self._process(payment, on_complete), self._loop)
+
+    async def _with_retry(self, call: Callable[[], Awaitable]) -> Optional[object]:
+        """Run one provider call with timeout/retry; None once retries are spent."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(call(), self.timeout)
+            except (asyncio.TimeoutError, ProviderError):
+                if attempt == self.retries:
+                    return None
+                await asyncio.sleep(min(self.backoff * (2 ** attempt), self.backoff_max))
+        return None
+
+    async def _charge(self, payment: Payment) -> bool:
+        if self.batch_size > 1:
+            fut = asyncio.get_running_loop().create_future()
+            self._pending.append((payment, fut))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = asyncio.get_running_loop().call_later(
+                    self.batch_window, self._flush
+                )
+            return await fut
+        return bool(await self._with_retry(lambda: self.provider.charge(payment)))
+
+    def _flush(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        if self._pending:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        if batch:
+            asyncio.get_running_loop().create_task(self._charge_batch(batch))
+
+    async def _charge_batch(self, batch: List[Tuple[Payment, "asyncio.Future[bool]"]]) -> None:
+        payments = [p for p, _ in batch]
+        verdicts = await self._with_retry(lambda: self.provider.charge_batch(payments))
+        if verdicts is None or len(verdicts) != len(batch):
+            verdicts = [False] * len(batch)
+        for (_, fut), ok in zip(batch, verdicts):
+            if not fut.done():
+                fut.set_result(bool(ok))
+
+    async def _process(self, payment: Payment,
+                       on_complete: Optional[Callable[[Payment], None]]) -> Payment:
+        loop = asyncio.get_running_loop()
+        try:
+            succeeded = await self._charge(payment)
+        except asyncio.CancelledError:
+            # close() 超时取消：按失败收尾，释放预留，调用方的 future 收到异常
+            await loop.run_in_executor(None, self.gateway.complete_payment, payment, False)
+            if on_complete is not None:
+                await loop.run_in_executor(None, on_complete, payment)
+            raise RuntimeError("payment pipeline is closed") from None
+        # 回写状态、通知、积分等涉及锁和 I/O，放到线程池里，不阻塞事件循环
+        await loop.run_in_executor(None, self.gateway.complete_payment, payment, succeeded)
+        if on_complete is not None:
+            await loop.run_in_executor(None, on_complete, payment)
+        return payment
+
+    async def _drain(self, timeout: float) -> None:
+        # 攒着的批次立即发出，不再等 batch_window
+        while self._pending:
+            self._flush()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        if not tasks:
+            return
+        _, late = await asyncio.wait(tasks, timeout=timeout)
+        for task in late:
+            task.cancel()
+        if late:
+            # 等被取消的支付按失败收尾
+            await asyncio.wait(late)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Finish queued payments, cancel what is left after ``timeout`` and stop."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+        asyncio.run_coroutine_threadsafe(self._drain(timeout), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
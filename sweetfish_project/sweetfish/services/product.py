@@ -1,6 +1,6 @@
 """Module adjusted to satisfy style checks."""
 
-from typing import List, Optional, Set
+from typing import List, Optional, Set, Tuple
 
 from ..db import MemoryDB
 from ..models import Product, gen_id
@@ -52,22 +52,51 @@ class ProductService:
         return p
 
     def list_for_merchant(self, merchant_id: str) -> List[Product]:
-        return [p for p in self.db.products.values() if p.merchant_id == merchant_id]
+        return self.db.list_products_for_merchant(merchant_id)
 
     def update_stock(self, product_id: str, delta: int) -> Product:
         p = self.db.get_product(product_id)
         if not p:
             raise ValueError("product not found")
-        p.stock += delta
+        # 与库存预留（services/inventory.py）共用商品分段锁
+        with self.db.lock_products([product_id]):
+            p.stock += delta
+            self.db.touch_product(p)
+        return p
+
+    def update_product(
+            self,
+            product_id: str,
+            title: Optional[str] = None,
+            description: Optional[str] = None,
+            tags: Optional[Set[str]] = None
+    ) -> Product:
+        p = self.db.get_product(product_id)
+        if not p:
+            raise ValueError("product not found")
+        if title is not None:
+            if not title:
+                raise ValueError("product title cannot be empty")
+            p.title = title
+        if description is not None:
+            p.description = description
+        if tags is not None:
+            p.tags = set(tags)
+        self.db.reindex_product(p)
         return p
 
     def search(self, keyword: str = "") -> List[Product]:
         return self.db.search_products(keyword)
 
+    def search_page(
+            self, keyword: str = "", limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[Product], Optional[str]]:
+        return self.db.search_products_page(keyword, limit, cursor)
+
     def get_product(self, product_id):
         return self.db.products.get(product_id)
 
     def delete_product(self, product_id):
         if product_id not in self.db.products:
             raise ValueError("商品不存在")
-        del self.db.products[product_id]
\ No newline at end of file
+        self.db.remove_product(product_id)
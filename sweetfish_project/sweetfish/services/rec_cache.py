@@ -0,0 +1,208 @@
+"""Per-user recommendation cache with version stamps and background refresh."""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from ..db import MemoryDB
+from ..models import Product
+
+Stamp = Tuple[int, int]
+
+
+class _Entry:
+
+    __slots__ = ("version", "built", "top_k", "pids")
+
+    def __init__(self) -> None:
+        # 用户历史每变一次 +1；built 为计算结果对应的 (用户版本, 商品目录版本)
+        self.version = 0
+        self.built: Optional[Stamp] = None
+        self.top_k = 0
+        self.pids: Optional[List[str]] = None
+
+
+class RecommendationCache:
+    """Caches ``compute(user_id, top_k)`` per user until its inputs change.
+
+    An entry is stamped with the user's history version and the catalogue
+    version it was computed from. The user version moves on every view or
+    purchase by that user (:meth:`invalidate_user`); the catalogue version
+    moves only when a product is added or removed, its tags change, or its
+    ``promotion_rank`` drifts by at least ``promotion_threshold`` from the
+    value last accounted for. The view/sold counter updates that
+    ``touch_product`` reports on every page view do not invalidate anything.
+
+    A stale entry is still served, and one background refresh per user is
+    queued (stale-while-revalidate); only a user with no entry, or asking
+    for a different ``top_k``, waits for the computation. Products deleted
+    since the entry was built are dropped when serving.
+    """
+
+    def __init__(self, db: MemoryDB, compute: Callable[[str, int], List[Product]],
+                 max_users: int = 100_000, promotion_threshold: int = 1,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        if max_users <= 0:
+            raise ValueError("max_users must be positive")
+        if promotion_threshold <= 0:
+            raise ValueError("promotion_threshold must be positive")
+        self.db = db
+        self.compute = compute
+        self.max_users = max_users
+        self.promotion_threshold = promotion_threshold
+        self.clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._catalog_version = 0
+        # 商品 -> 最近一次计入目录版本的 (标签, 推广权重)
+        self._seen: Dict[str, Tuple[FrozenSet[str], int]] = {}
+        self._pending: Dict[str, "Future[None]"] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._latency = {"hit": 0.0, "stale": 0.0, "miss": 0.0, "refresh": 0.0}
+        db.subscribe_products(self.on_product_change)
+        for p in db.scan("products"):
+            self._seen[p.product_id] = (frozenset(p.tags), p.promotion_rank)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def catalog_version(self) -> int:
+        return self._catalog_version
+
+    # =============================
+    # 失效
+    # =============================
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry.version += 1
+
+    def on_product_change(self, op: str, p: Product) -> None:
+        with self._lock:
+            if op == "del":
+                if self._seen.pop(p.product_id, None) is not None:
+                    self._catalog_version += 1
+                return
+            tags = frozenset(p.tags)
+            old = self._seen.get(p.product_id)
+            if old is None:
+                self._seen[p.product_id] = (tags, p.promotion_rank)
+                self._catalog_version += 1
+            elif old[0] != tags or abs(p.promotion_rank - old[1]) >= self.promotion_threshold:
+                self._seen[p.product_id] = (tags, p.promotion_rank)
+                self._catalog_version += 1
+            # 浏览量/销量等计数变化不影响缓存；推广权重的小幅变化累计到阈值再失效
+
+    # =============================
+    # 读取
+    # =============================
+    def get(self, user_id: str, top_k: int) -> List[Product]:
+        start = self.clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = self._entries[user_id] = _Entry()
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(user_id)
+            stamp = (entry.version, self._catalog_version)
+            pids = entry.pids if entry.top_k == top_k else None
+            if pids is None:
+                outcome = "miss"
+                self.misses += 1
+            elif entry.built == stamp:
+                outcome = "hit"
+                self.hits += 1
+            else:
+                outcome = "stale"
+                self.stale_hits += 1
+                if user_id not in self._pending:
+                    self._pending[user_id] = self._pool().submit(self._refresh, user_id, top_k)
+        if pids is None:
+            products = self.compute(user_id, top_k)
+            self._store(entry, stamp, top_k, [p.product_id for p in products])
+        else:
+            found = (self.db.get_product(pid) for pid in pids)
+            products = [p for p in found if p is not None]
+        self._observe(outcome, self.clock() - start)
+        return products
+
+    def _store(self, entry: _Entry, stamp: Stamp, top_k: int, pids: List[str]) -> None:
+        with self._lock:
+            # 并发计算时只保留输入更新的那份结果
+            if entry.built is None or entry.top_k != top_k or stamp >= entry.built:
+                entry.built = stamp
+                entry.top_k = top_k
+                entry.pids = pids
+
+    def _refresh(self, user_id: str, top_k: int) -> None:
+        start = self.clock()
+        try:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    return
+                stamp = (entry.version, self._catalog_version)
+            products = self.compute(user_id, top_k)
+            self._store(entry, stamp, top_k, [p.product_id for p in products])
+            with self._lock:
+                self.refreshes += 1
+            self._observe("refresh", self.clock() - start)
+        finally:
+            with self._lock:
+                self._pending.pop(user_id, None)
+
+    def _observe(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            self._latency[kind] += seconds
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rec-refresh")
+        return self._executor
+
+    # =============================
+    # 统计与关闭
+    # =============================
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus mean latency in milliseconds per outcome."""
+        def mean_ms(kind: str, n: int) -> float:
+            return self._latency[kind] * 1000 / n if n else 0.0
+
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_rate": self.hit_rate,
+            "hit_ms": mean_ms("hit", self.hits),
+            "stale_ms": mean_ms("stale", self.stale_hits),
+            "miss_ms": mean_ms("miss", self.misses),
+            "refresh_ms": mean_ms("refresh", self.refreshes),
+        }
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait for the background refreshes queued so far."""
+        with self._lock:
+            pending: List["Future[None]"] = list(self._pending.values())
+        for fut in pending:
+            fut.result(timeout=timeout)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
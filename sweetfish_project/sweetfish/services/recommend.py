@@ -1,46 +1,117 @@
 """Module adjusted to satisfy style checks."""
 
-from typing import List
+import heapq
+from typing import Dict, List, Optional
 
 from ..db import MemoryDB
 from ..models import Product
+from . import vector_scoring
+from .history import UserHistory
+from .item_cf import PURCHASE_WEIGHT, VIEW_WEIGHT, ItemCooccurrence
+from .rec_cache import RecommendationCache
 
 
 class RecommendationEngine:
 
-    def __init__(self, db: MemoryDB) -> None:
+    def __init__(self, db: MemoryDB, vectorized: Optional[bool] = None,
+                 history_depth: int = 10, max_users: int = 100_000,
+                 cached: bool = True, history_idle: Optional[float] = None) -> None:
         self.db = db
-        self.user_history = {}
+        # 每个用户只保留最近 history_depth 个商品，长期不活跃的用户按 LRU 淘汰
+        self.user_history = UserHistory(depth=history_depth, max_users=max_users,
+                                        max_idle=history_idle)
+        self.item_cf = ItemCooccurrence()
+        # None：装了 numpy 就用向量化打分
+        if vectorized is None:
+            vectorized = vector_scoring.HAS_NUMPY
+        self.scorer = vector_scoring.VectorScorer(db) if vectorized else None
+        # 用户历史或商品标签/推广权重未变时直接复用上次的推荐结果
+        self.cache = (RecommendationCache(db, self._recommend_for_user, max_users=max_users)
+                      if cached else None)
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
 
     def record_view(self, user_id: str, product_id: str) -> None:
-        self.user_history.setdefault(user_id, []).append(product_id)
+        self.item_cf.record(product_id, self.user_history.get(user_id), VIEW_WEIGHT)
+        self._append_history(user_id, product_id)
         p = self.db.get_product(product_id)
         if p:
             p.views += 1
+            self.db.touch_product(p)
 
     def record_purchase(self, user_id: str, product_id: str) -> None:
-        self.user_history.setdefault(user_id, []).append(product_id)
+        self.item_cf.record(product_id, self.user_history.get(user_id), PURCHASE_WEIGHT)
+        self._append_history(user_id, product_id)
         p = self.db.get_product(product_id)
         if p:
             p.sold += 1
+            self.db.touch_product(p)
+
+    def _append_history(self, user_id: str, product_id: str) -> None:
+        self.user_history.append(user_id, product_id)
+        if self.cache is not None:
+            self.cache.invalidate_user(user_id)
 
     def recommend_for_user(self, user_id: str, top_k: int = 6) -> List[Product]:
-        history = self.user_history.get(user_id, [])
-        if not history:
-            prods = list(self.db.products.values())
-            prods.sort(key=lambda x: (-x.promotion_rank, -x.views, -x.sold))
-            return prods[:top_k]
-        tag_scores = {}
-        for pid in history[-10:]:
+        if top_k <= 0:
+            return []
+        if self.cache is not None:
+            return self.cache.get(user_id, top_k)
+        return self._recommend_for_user(user_id, top_k)
+
+    def _recommend_for_user(self, user_id: str, top_k: int) -> List[Product]:
+        history = self.user_history.get(user_id)
+        # 合并最近浏览/购买商品的相似商品列表，代价与商品总数无关
+        res = []
+        for pid, _ in self.item_cf.recommend(history[-10:], top_k):
+            p = self.db.get_product(pid)
+            if p is not None:
+                res.append(p)
+        if len(res) < top_k:
+            # 行为数据不足时补齐：有向量化打分器才按标签偏好打分，
+            # 否则取热门榜首页，避免在热路径上逐个扫描全部商品
+            taken = {p.product_id for p in res} | set(history[-10:])
+            want = top_k + len(taken)
+            if self.scorer is not None:
+                extra = self.recommend_by_tags(user_id, want)
+            else:
+                extra, _ = self.db.search_products_page("", limit=want)
+            res.extend(p for p in extra if p.product_id not in taken)
+        return res[:top_k]
+
+    def _tag_scores(self, user_id: str) -> Dict[str, float]:
+        tag_scores: Dict[str, float] = {}
+        for pid in self.user_history.get(user_id)[-10:]:
             p = self.db.get_product(pid)
             if not p:
                 continue
             for t in p.tags:
                 tag_scores[t] = tag_scores.get(t, 0) + 1
+        return tag_scores
+
+    def recommend_by_tags(self, user_id: str, top_k: int = 6) -> List[Product]:
+        """Score the whole catalogue by tag affinity and popularity."""
+        if top_k <= 0:
+            return []
+        tag_scores = self._tag_scores(user_id)
+        if not tag_scores:
+            prods, _ = self.db.search_products_page("", limit=top_k)
+            return prods
+        if self.scorer is not None:
+            found = (self.db.get_product(pid) for pid in self.scorer.top_k(tag_scores, top_k))
+            return [p for p in found if p is not None]
+        return self._score_loop(tag_scores, top_k)
+
+    def _score_loop(self, tag_scores: Dict[str, float], top_k: int) -> List[Product]:
         scored = []
-        for p in self.db.products.values():
+        for p in self.db.scan("products"):
             tag_overlap = sum(tag_scores.get(t, 0) for t in p.tags)
-            score = tag_overlap * 5 + p.promotion_rank * 2 + p.views * 0.01 + p.sold * 0.1
+            score = (tag_overlap * vector_scoring.TAG_WEIGHT
+                     + p.promotion_rank * vector_scoring.PROMOTION_WEIGHT
+                     + p.views * vector_scoring.VIEWS_WEIGHT + p.sold * vector_scoring.SOLD_WEIGHT)
             scored.append((score, p))
-        scored.sort(key=lambda z: -z[0])
-        return [p for (_, p) in scored[:top_k]]
+        # nlargest 与稳定排序一致：同分时保持商品插入顺序
+        best = heapq.nlargest(top_k, scored, key=lambda z: z[0])
+        return [p for (_, p) in best]
@@ -0,0 +1,77 @@
+"""Settlement reconciliation between payments and orders."""
+
+import datetime
+from dataclasses import dataclass, field
+from typing import List
+
+from ..db import MemoryDB
+from ..models import OrderStatus
+from .order import OrderService
+
+_UNPAID = (OrderStatus.CREATED, OrderStatus.CANCELLED)
+
+
+@dataclass
+class ReconcileReport:
+
+    scanned: int = 0
+    # 已成功扣款但订单仍未支付 -> 订单补记为已支付
+    orders_marked_paid: int = 0
+    # 订单已支付但其支付记录状态不符 -> 支付补记为成功
+    payments_marked_success: int = 0
+    # 长时间停在 init 的支付 -> 记为失败，订单可重新支付
+    payments_expired: int = 0
+    # 同一订单多笔成功扣款，需要人工退款，不自动处理
+    duplicate_charges: List[str] = field(default_factory=list)
+    # 订单已取消却扣款成功，需要退款
+    captured_on_cancelled: List[str] = field(default_factory=list)
+
+
+class PaymentReconciler:
+    """Streams ``db.payments`` in chunks and repairs status mismatches.
+
+    The payment record is the source of truth for money that moved: a
+    successful payment whose order is still unpaid completes the order
+    through :meth:`OrderService.complete_payment` (status, stock, sales,
+    history and credit), and a paid order pointing at a payment that is
+    not ``success`` gets its payment fixed. A successful payment on a
+    cancelled order is only reported, for a refund. Payments stuck in
+    ``init`` for ``stale_after`` seconds are marked failed.
+    """
+
+    def __init__(self, db: MemoryDB, orders: OrderService, chunk_size: int = 1000,
+                 stale_after: float = 600.0) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.db = db
+        self.orders = orders
+        self.chunk_size = chunk_size
+        self.stale_after = stale_after
+
+    def run(self) -> ReconcileReport:
+        report = ReconcileReport()
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.stale_after)
+        for chunk in self.db.scan_chunks("payments", self.chunk_size):
+            for pay in chunk:
+                report.scanned += 1
+                order = self.db.get_order(pay.order_id)
+                if order is None:
+                    continue
+                if pay.status == "success":
+                    # 订单已关联的支付为准；未关联时第一笔成功支付补记到订单上
+                    if (order.payment_id or pay.payment_id) != pay.payment_id:
+                        report.duplicate_charges.append(pay.payment_id)
+                    elif order.status == OrderStatus.CREATED:
+                        if self.orders.complete_payment(order, pay.payment_id):
+                            report.orders_marked_paid += 1
+                    elif order.status == OrderStatus.CANCELLED:
+                        report.captured_on_cancelled.append(pay.payment_id)
+                elif order.payment_id == pay.payment_id and order.status not in _UNPAID:
+                    pay.status = "success"
+                    self.db.add_payment(pay)
+                    report.payments_marked_success += 1
+                elif pay.status == "init" and pay.created_at < cutoff:
+                    pay.status = "failed"
+                    self.db.add_payment(pay)
+                    report.payments_expired += 1
+        return report
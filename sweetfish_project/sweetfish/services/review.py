@@ -1,7 +1,7 @@
 """Module adjusted to satisfy style checks."""
 
 from ..db import MemoryDB
-from ..models import Review, gen_id
+from ..models import Review, ReviewStats, check_rating, gen_id
 
 
 class ReviewService:
@@ -10,8 +10,7 @@ class ReviewService:
         self.db = db
 
     def add_review(self, product_id: str, user_id: str, rating: int, comment: str):
-        if rating < 1 or rating > 5:
-            raise ValueError("rating must be 1..5")
+        check_rating(rating)
         r = Review(
             review_id=gen_id("r_"),
             product_id=product_id,
@@ -21,3 +20,9 @@ class ReviewService:
         )
         self.db.add_review(r)
         return r
+
+    def list_for_product(self, product_id: str):
+        return self.db.list_reviews_for_product(product_id)
+
+    def get_stats(self, product_id: str) -> ReviewStats:
+        return self.db.get_review_stats(product_id)
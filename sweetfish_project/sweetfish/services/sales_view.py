@@ -0,0 +1,147 @@
+"""Materialized sales totals kept up to date from order status changes."""
+
+import datetime
+import itertools
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ..db import MemoryDB
+from ..models import Order, OrderStatus
+from ..ranking import RankedSet
+
+# 计入营收的订单状态：已支付及之后的正常履约状态；取消/退款不计
+COUNTED = frozenset({OrderStatus.PAID, OrderStatus.SHIPPED, OrderStatus.DELIVERED})
+
+
+def line_amounts(order: Order) -> List[Tuple[str, int, int]]:
+    """``(product_id, quantity, cents)`` per line, summing to ``total_cents``.
+
+    Lines carry the unit price paid at checkout; older orders without it
+    (or whose lines no longer add up to the total) have the order total
+    split across lines by quantity.
+    """
+    lines = [(it.product_id, it.quantity, it.unit_price_cents * it.quantity) for it in order.items]
+    if sum(cents for _, _, cents in lines) == order.total_cents:
+        return lines
+    units = sum(qty for _, qty, _ in lines)
+    out: List[Tuple[str, int, int]] = []
+    left = order.total_cents
+    for i, (pid, qty, _) in enumerate(lines):
+        cents = left if i == len(lines) - 1 else order.total_cents * qty // max(1, units)
+        left -= cents
+        out.append((pid, qty, cents))
+    return out
+
+
+class SalesView:
+    """Revenue totals per merchant, product and day, plus a top-K by revenue.
+
+    Subscribes to order status changes: an order entering a paid state
+    adds what it actually charged (``total_cents`` and the line prices),
+    leaving one (refund, cancellation) subtracts it again. The day is the
+    date of the successful payment. Reading any total is O(1) and the top
+    ``k`` products O(k); :meth:`rebuild` recomputes everything from the
+    orders table.
+    """
+
+    def __init__(self, db: MemoryDB) -> None:
+        self.db = db
+        self._lock = threading.Lock()
+        self._reset()
+        # 订阅与首次全量构建都在 exclusive 内完成，期间的支付不会漏记或重复
+        with db.exclusive():
+            db.subscribe_orders(self.on_order_change)
+            self._load()
+
+    def close(self) -> None:
+        """Stop following order changes; the totals keep their last values."""
+        self.db.unsubscribe_orders(self.on_order_change)
+
+    def _reset(self) -> None:
+        self.total_cents = 0
+        self.orders_paid = 0
+        self._by_merchant: Dict[str, int] = {}
+        self._by_product: Dict[str, int] = {}
+        self._units_by_product: Dict[str, int] = {}
+        self._by_day: Dict[datetime.date, int] = {}
+        self._top = RankedSet()
+        # 商品第一次产生营收的先后，营收相同时先卖出的排前
+        self._product_seq: Dict[str, int] = {}
+        self._seq_counter = itertools.count()
+
+    def _load(self) -> None:
+        for chunk in self.db.scan_chunks("orders"):
+            for order in chunk:
+                if order.status in COUNTED:
+                    self._apply(order, 1)
+
+    # =============================
+    # 增量更新
+    # =============================
+    def on_order_change(self, order: Order, old: Optional[OrderStatus]) -> None:
+        was, now = old in COUNTED, order.status in COUNTED
+        if was != now:
+            with self._lock:
+                self._apply(order, 1 if now else -1)
+
+    def _paid_day(self, order: Order) -> datetime.date:
+        pay = self.db.get_payment(order.payment_id) if order.payment_id else None
+        return (pay.updated_at if pay is not None else order.updated_at).date()
+
+    def _apply(self, order: Order, sign: int) -> None:
+        self.total_cents += sign * order.total_cents
+        self.orders_paid += sign
+        mid = order.merchant_id
+        self._by_merchant[mid] = self._by_merchant.get(mid, 0) + sign * order.total_cents
+        day = self._paid_day(order)
+        self._by_day[day] = self._by_day.get(day, 0) + sign * order.total_cents
+        for pid, qty, cents in line_amounts(order):
+            revenue = self._by_product[pid] = self._by_product.get(pid, 0) + sign * cents
+            units = self._units_by_product[pid] = self._units_by_product.get(pid, 0) + sign * qty
+            if not units:
+                # 全部退款的商品移出排行
+                self._top.discard(pid)
+                continue
+            seq = self._product_seq.get(pid)
+            if seq is None:
+                seq = self._product_seq[pid] = next(self._seq_counter)
+            self._top.put(pid, (-revenue, seq))
+
+    # =============================
+    # 查询
+    # =============================
+    def merchant_revenue(self, merchant_id: str) -> int:
+        return self._by_merchant.get(merchant_id, 0)
+
+    def product_revenue(self, product_id: str) -> int:
+        return self._by_product.get(product_id, 0)
+
+    def product_units(self, product_id: str) -> int:
+        return self._units_by_product.get(product_id, 0)
+
+    def daily_revenue(self, day: datetime.date) -> int:
+        return self._by_day.get(day, 0)
+
+    def top_products(self, k: int) -> List[Tuple[str, int]]:
+        """``(product_id, revenue_cents)`` of the ``k`` best-earning products."""
+        return [(pid, -key[0]) for key, pid in self._top.items(k)]
+
+    def state(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "total_cents": self.total_cents,
+                "orders_paid": self.orders_paid,
+                "by_merchant": {k: v for k, v in self._by_merchant.items() if v},
+                "by_product": {k: v for k, v in self._by_product.items() if v},
+                "units_by_product": {k: v for k, v in self._units_by_product.items() if v},
+                "by_day": {k: v for k, v in self._by_day.items() if v},
+            }
+
+    def rebuild(self) -> bool:
+        """Recompute from the orders table; return whether the totals already matched."""
+        with self.db.exclusive():
+            before = self.state()
+            with self._lock:
+                self._reset()
+                self._load()
+            return self.state() == before
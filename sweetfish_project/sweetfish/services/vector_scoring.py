@@ -0,0 +1,144 @@
+"""Optional NumPy scoring of the whole catalogue for tag-affinity recommendations."""
+
+import threading
+from typing import Dict, List, Optional, Set
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时推荐引擎退回纯 Python 循环
+    np = None
+
+from ..db import MemoryDB
+from ..models import Product
+
+HAS_NUMPY = np is not None
+
+TAG_WEIGHT = 5.0
+PROMOTION_WEIGHT = 2.0
+VIEWS_WEIGHT = 0.01
+SOLD_WEIGHT = 0.1
+
+
+class VectorScorer:
+    """Column store of every product kept in sync through product listeners.
+
+    ``promotion_rank``, ``views`` and ``sold`` live in parallel arrays
+    indexed by row; the product x tag matrix is stored sparsely by column
+    (tag -> row indices). A request turns the user's tag weights into a
+    sparse vector, so scoring is one pass over the counter arrays plus a
+    scatter-add per history tag, followed by ``argpartition`` for the top k.
+    Deleted products free their row for reuse.
+    """
+
+    def __init__(self, db: MemoryDB, capacity: int = 1024) -> None:
+        if np is None:
+            raise ImportError("numpy is required for VectorScorer")
+        self._lock = threading.Lock()
+        self._row: Dict[str, int] = {}
+        self._pids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._tags_of: Dict[str, Set[str]] = {}
+        self._tag_rows: Dict[str, Set[int]] = {}
+        # tag -> 行号数组的缓存，标签成员变化时作废
+        self._tag_cache: Dict[str, "np.ndarray"] = {}
+        self._seq_counter = 0
+        capacity = max(capacity, 16)
+        self._promo = np.zeros(capacity, dtype=np.float64)
+        self._views = np.zeros(capacity, dtype=np.float64)
+        self._sold = np.zeros(capacity, dtype=np.float64)
+        # 插入序号，同分时保持与循环实现一致的先后次序
+        self._seq = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        db.subscribe_products(self.on_product_change)
+        for p in db.scan("products"):
+            self.on_product_change("put", p)
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def on_product_change(self, op: str, p: Product) -> None:
+        with self._lock:
+            if op == "del":
+                self._remove(p.product_id)
+            else:
+                self._put(p)
+
+    def _grow(self) -> None:
+        size = len(self._alive) * 2
+        for name in ("_promo", "_views", "_sold", "_seq", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _put(self, p: Product) -> None:
+        row = self._row.get(p.product_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._pids)
+                if row >= len(self._alive):
+                    self._grow()
+                self._pids.append(None)
+            self._row[p.product_id] = row
+            self._pids[row] = p.product_id
+            self._seq[row] = self._seq_counter
+            self._seq_counter += 1
+            self._alive[row] = True
+        self._promo[row] = p.promotion_rank
+        self._views[row] = p.views
+        self._sold[row] = p.sold
+        tags = set(p.tags)
+        old_tags = self._tags_of.get(p.product_id, set())
+        if tags != old_tags:
+            for t in old_tags - tags:
+                self._tag_rows[t].discard(row)
+                self._tag_cache.pop(t, None)
+            for t in tags - old_tags:
+                self._tag_rows.setdefault(t, set()).add(row)
+                self._tag_cache.pop(t, None)
+            self._tags_of[p.product_id] = tags
+
+    def _remove(self, pid: str) -> None:
+        row = self._row.pop(pid, None)
+        if row is None:
+            return
+        for t in self._tags_of.pop(pid, set()):
+            self._tag_rows[t].discard(row)
+            self._tag_cache.pop(t, None)
+        self._alive[row] = False
+        self._pids[row] = None
+        self._free.append(row)
+
+    def _rows_with_tag(self, tag: str) -> "np.ndarray":
+        rows = self._tag_cache.get(tag)
+        if rows is None:
+            rows = self._tag_cache[tag] = np.fromiter(
+                self._tag_rows.get(tag, ()), dtype=np.int64
+            )
+        return rows
+
+    def top_k(self, tag_scores: Dict[str, float], k: int) -> List[str]:
+        """Product ids of the ``k`` best scores, best first."""
+        with self._lock:
+            n = len(self._pids)
+            if k <= 0 or not self._row:
+                return []
+            scores = (self._promo[:n] * PROMOTION_WEIGHT + self._views[:n] * VIEWS_WEIGHT
+                      + self._sold[:n] * SOLD_WEIGHT)
+            for tag, weight in tag_scores.items():
+                rows = self._rows_with_tag(tag)
+                if len(rows):
+                    scores[rows] += weight * TAG_WEIGHT
+            scores[~self._alive[:n]] = -np.inf
+            k = min(k, len(self._row))
+            if k < n:
+                cand = np.argpartition(-scores, k - 1)[:k]
+                # 第 k 名可能有并列，把同分的全部纳入再按插入序号取前 k
+                cut = scores[cand].min()
+                cand = np.flatnonzero(scores >= cut)
+            else:
+                cand = np.flatnonzero(self._alive[:n])
+            order = np.lexsort((self._seq[cand], -scores[cand]))[:k]
+            return [self._pids[r] for r in cand[order]]
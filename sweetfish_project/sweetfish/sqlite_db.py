@@ -0,0 +1,638 @@
+"""SQLite-backed storage engine with the same surface as MemoryDB."""
+
+import json
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import models
+from .db import OrderListener, decode_cursor, encode_cursor
+from .persistence import decode_entity, encode_entity, to_jsonable
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    phone TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_phone ON users(phone, user_id);
+
+CREATE TABLE IF NOT EXISTS products (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id TEXT NOT NULL UNIQUE,
+    merchant_id TEXT NOT NULL,
+    promotion_rank INTEGER NOT NULL,
+    views INTEGER NOT NULL,
+    sold INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_sold ON products(sold DESC, seq);
+CREATE INDEX IF NOT EXISTS products_merchant ON products(merchant_id, product_id);
+
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    buyer_id TEXT NOT NULL,
+    merchant_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_buyer ON orders(buyer_id, seq);
+CREATE INDEX IF NOT EXISTS orders_merchant ON orders(merchant_id, seq);
+CREATE INDEX IF NOT EXISTS orders_status ON orders(status, seq);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    product_id TEXT NOT NULL,
+    order_seq INTEGER NOT NULL,
+    PRIMARY KEY (product_id, order_seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS payments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    payment_id TEXT NOT NULL UNIQUE,
+    order_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bargains (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    bargain_id TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bargain_archive (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    bargain_id TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    review_id TEXT NOT NULL UNIQUE,
+    product_id TEXT NOT NULL,
+    rating INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_product ON reviews(product_id, rating, seq);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+"""
+
+# 三元组分词的 FTS5 支持任意子串（含中文）；不可用时退化为 LIKE 扫描
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+    USING fts5(title, description, tags, tokenize='trigram');
+"""
+_PLAIN_TEXT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products_fts (
+    rowid INTEGER PRIMARY KEY, title TEXT, description TEXT, tags TEXT
+);
+"""
+
+# 排序键与 MemoryDB._rank_key 相同：取反的热度列是虚拟生成列，索引与其同序，
+# 键集分页的行值比较 (k1, k2, k3, seq) > (?, ?, ?, ?) 可以直接在索引上定位
+_RANK_KEY_COLUMNS = (("rank_key", "-promotion_rank"), ("views_key", "-views"),
+                     ("sold_key", "-sold"))
+_RANK_KEY_INDEX = """
+DROP INDEX IF EXISTS products_rank;
+CREATE INDEX IF NOT EXISTS products_rank_key ON products(rank_key, views_key, sold_key, seq);
+"""
+_RANK_KEY = "p.rank_key, p.views_key, p.sold_key, p.seq"
+_ORDER_BY_RANK = f"ORDER BY {_RANK_KEY}"
+
+
+def _dumps(table: str, value: Any) -> str:
+    return json.dumps(encode_entity(table, value), separators=(",", ":"), ensure_ascii=False)
+
+
+def _like_pattern(low: str) -> str:
+    escaped = low.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class _HotCache:
+    """Identity map of live objects, plus a small LRU that keeps hot ones alive.
+
+    Falling out of the LRU only drops the cache's strong reference: an
+    object still held by a service or the UI stays in the weak map, so
+    later reads return that same instance instead of a diverging copy.
+    Read paths use it outside the store lock, from the UI, payment
+    pipeline and scheduler threads at once, so it has a lock of its own.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._live: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            obj = self._live.get(key)
+            if obj is not None:
+                self._keep(key, obj)
+            return obj
+
+    def put(self, key: str, obj: Any) -> None:
+        with self._lock:
+            self._live[key] = obj
+            self._keep(key, obj)
+
+    def put_if_absent(self, key: str, obj: Any) -> Any:
+        """Cache ``obj`` unless another thread already did; return the cached one."""
+        with self._lock:
+            cached = self._live.get(key)
+            if cached is not None:
+                obj = cached
+            else:
+                self._live[key] = obj
+            self._keep(key, obj)
+            return obj
+
+    def _keep(self, key: str, obj: Any) -> None:
+        self._items[key] = obj
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+            self._live.pop(key, None)
+
+
+class _TableView(MutableMapping):
+    """dict-style view over one table, for code that touches ``db.products`` etc."""
+
+    def __init__(self, db: "SQLiteDB", table: str, key: str,
+                 add: Callable[[Any], None], remove: Optional[Callable[[str], Any]] = None,
+                 source: Optional[str] = None, cache: Optional[str] = None) -> None:
+        self._db = db
+        self._table = table
+        self._key = key
+        self._add = add
+        self._remove = remove
+        # 实际的 SQL 表名，默认是实体名加 s
+        self._source = source or f"{table}s"
+        # 归档表用独立的缓存，免得活跃表读到已归档的对象
+        self._cache = cache or table
+
+    def __getitem__(self, key: str) -> Any:
+        if self._source == f"{self._table}s":
+            obj = self._db._load(self._table, self._key, key)
+        else:
+            row = self._db._query_one(
+                f"SELECT data FROM {self._source} WHERE {self._key} = ?", (key,))
+            obj = self._db._hydrate(self._table, key, row[0], self._cache) if row else None
+        if obj is None:
+            raise KeyError(key)
+        return obj
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._add(value)
+
+    def __delitem__(self, key: str) -> None:
+        if self._remove is None or self._remove(key) is None:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        row = self._db._query_one(
+            f"SELECT 1 FROM {self._source} WHERE {self._key} = ?", (key,))
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._db._query(f"SELECT {self._key} FROM {self._source} ORDER BY seq")
+        return iter([r[0] for r in rows])
+
+    def __len__(self) -> int:
+        return self._db._query_one(f"SELECT COUNT(*) FROM {self._source}")[0]
+
+    def chunks(self, size: int) -> Iterator[List[Any]]:
+        """Stream the table in insertion order, ``size`` rows per query."""
+        last = 0
+        while True:
+            rows = self._db._query(
+                f"SELECT seq, {self._key}, data FROM {self._source} WHERE seq > ? "
+                "ORDER BY seq LIMIT ?", (last, size))
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [self._db._hydrate(self._table, k, data, self._cache) for _, k, data in rows]
+
+    def values(self) -> List[Any]:  # type: ignore[override]
+        # 一条 SELECT 读出全部行，而不是逐个 key 查询
+        rows = self._db._query(f"SELECT {self._key}, data FROM {self._source} ORDER BY seq")
+        return [self._db._hydrate(self._table, k, data, self._cache) for k, data in rows]
+
+
+class SQLiteDB:
+    """Storage engine backed by ``sqlite3`` that can hold more than fits in RAM.
+
+    Mirrors the MemoryDB method surface, so services and the UI run
+    unchanged. Rows are stored as JSON plus the columns that indexes need;
+    a hot-object cache keeps recently used objects alive and identical
+    across reads. Writers go through the ``add_*``/``touch_*`` methods,
+    which write through to SQLite.
+    """
+
+    def __init__(self, path: str = ":memory:", cache_size: int = 10000) -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=256)
+        self._lock = threading.RLock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._add_rank_key_columns()
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self._conn.executescript(_PLAIN_TEXT_SCHEMA)
+            self.has_fts = False
+        self._caches: Dict[str, _HotCache] = {
+            t: _HotCache(cache_size)
+            for t in ("user", "product", "order", "payment", "bargain", "bargain_archive",
+                      "review")
+        }
+        self.journal = None
+        self._product_listeners: List[Callable[[str, models.Product], None]] = []
+        self._order_listeners: List[OrderListener] = []
+        self._payment_listeners: List[Callable[[models.Payment], None]] = []
+
+        self.users = _TableView(self, "user", "user_id", self.add_user)
+        self.products = _TableView(self, "product", "product_id", self.add_product,
+                                   self.remove_product)
+        self.orders = _TableView(self, "order", "order_id", self.add_order)
+        self.payments = _TableView(self, "payment", "payment_id", self.add_payment)
+        self.bargains = _TableView(self, "bargain", "bargain_id", self.add_bargain)
+        self.bargain_archive = _TableView(self, "bargain", "bargain_id", self.add_bargain,
+                                          source="bargain_archive", cache="bargain_archive")
+        self.reviews = _TableView(self, "review", "review_id", self.add_review)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def subscribe_products(self, listener: Callable[[str, models.Product], None]) -> None:
+        self._product_listeners.append(listener)
+
+    def _notify_product(self, op: str, p: models.Product) -> None:
+        for listener in self._product_listeners:
+            listener(op, p)
+
+    def subscribe_orders(self, listener: OrderListener) -> None:
+        self._order_listeners.append(listener)
+
+    def unsubscribe_orders(self, listener: OrderListener) -> None:
+        self._order_listeners = [f for f in self._order_listeners if f != listener]
+
+    def _notify_order(self, order: models.Order, old: Optional[str]) -> None:
+        old_status = models.OrderStatus(old) if old is not None else None
+        if old_status != order.status:
+            for listener in self._order_listeners:
+                listener(order, old_status)
+
+    def subscribe_payments(self, listener: Callable[[models.Payment], None]) -> None:
+        self._payment_listeners.append(listener)
+
+    def exclusive(self) -> ContextManager[None]:
+        """Block every writer; SQLite serialises on one connection lock anyway."""
+        return self._lock
+
+    def lock_products(self, pids: Iterable[str]) -> ContextManager[None]:
+        return self._lock
+
+    def scan(self, table: str) -> List[Any]:
+        return getattr(self, table).values()
+
+    def scan_chunks(self, table: str, size: int = 1000) -> Iterator[List[Any]]:
+        return getattr(self, table).chunks(size)
+
+    # -----------------------------
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _add_rank_key_columns(self) -> None:
+        # 排序键列统一用 ALTER 补上，新库与旧库走同一条路径；虚拟列不改写已有行
+        have = {row[1] for row in self._conn.execute("PRAGMA table_xinfo(products)")}
+        for name, expr in _RANK_KEY_COLUMNS:
+            if name not in have:
+                self._conn.execute(f"ALTER TABLE products ADD COLUMN {name} INTEGER "
+                                   f"GENERATED ALWAYS AS ({expr}) VIRTUAL")
+        self._conn.executescript(_RANK_KEY_INDEX)
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _query_one(self, sql: str, params: Tuple = ()) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _hydrate(self, table: str, key: str, data: str, cache_name: Optional[str] = None) -> Any:
+        cache = self._caches[cache_name or table]
+        obj = cache.get(key)
+        if obj is None:
+            # 两个线程同时解码同一行时，都拿到先放进缓存的那个对象
+            obj = cache.put_if_absent(key, decode_entity(table, json.loads(data)))
+        return obj
+
+    def _load(self, table: str, key_col: str, key: Optional[str]) -> Any:
+        if key is None:
+            return None
+        obj = self._caches[table].get(key)
+        if obj is not None:
+            return obj
+        row = self._query_one(f"SELECT data FROM {table}s WHERE {key_col} = ?", (key,))
+        return self._hydrate(table, key, row[0]) if row else None
+
+    def _load_many(self, table: str, sql: str, params: Tuple) -> List[Any]:
+        return [self._hydrate(table, k, data) for k, data in self._query(sql, params)]
+
+    # 用户
+    def add_user(self, user: models.BaseUser) -> None:
+        with self._tx() as c:
+            c.execute(
+                "INSERT INTO users(user_id, phone, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET phone = excluded.phone, data = excluded.data",
+                (user.user_id, user.phone, _dumps("user", user)))
+        self._caches["user"].put(user.user_id, user)
+
+    def get_user_by_id(self, user_id: str) -> Optional[models.BaseUser]:
+        return self._load("user", "user_id", user_id)
+
+    def get_user_by_phone(self, phone: str) -> Optional[models.BaseUser]:
+        row = self._query_one("SELECT user_id FROM users WHERE phone = ?", (phone,))
+        return self.get_user_by_id(row[0]) if row else None
+
+    # 商品
+    def _write_text(self, c: sqlite3.Connection, seq: int, p: models.Product) -> None:
+        c.execute("DELETE FROM products_fts WHERE rowid = ?", (seq,))
+        c.execute(
+            "INSERT INTO products_fts(rowid, title, description, tags) VALUES (?, ?, ?, ?)",
+            (seq, p.title.lower(), p.description.lower(), " ".join(p.tags).lower()))
+
+    def add_product(self, p: models.Product) -> None:
+        with self._tx() as c:
+            c.execute(
+                "INSERT INTO products(product_id, merchant_id, promotion_rank, views, sold, data) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(product_id) DO UPDATE SET "
+                "merchant_id = excluded.merchant_id, promotion_rank = excluded.promotion_rank, "
+                "views = excluded.views, sold = excluded.sold, data = excluded.data",
+                (p.product_id, p.merchant_id, p.promotion_rank, p.views, p.sold,
+                 _dumps("product", p)))
+            seq = c.execute("SELECT seq FROM products WHERE product_id = ?",
+                            (p.product_id,)).fetchone()[0]
+            self._write_text(c, seq, p)
+        self._caches["product"].put(p.product_id, p)
+        self._notify_product("put", p)
+
+    def get_product(self, pid: str) -> Optional[models.Product]:
+        return self._load("product", "product_id", pid)
+
+    def list_products_for_merchant(self, merchant_id: str) -> List[models.Product]:
+        return self._load_many(
+            "product", "SELECT product_id, data FROM products WHERE merchant_id = ? ORDER BY seq",
+            (merchant_id,))
+
+    def remove_product(self, pid: str) -> Optional[models.Product]:
+        p = self.get_product(pid)
+        if p is None:
+            return None
+        with self._tx() as c:
+            row = c.execute("SELECT seq FROM products WHERE product_id = ?", (pid,)).fetchone()
+            if row is None:
+                # 另一个线程已先删掉
+                return None
+            c.execute("DELETE FROM products_fts WHERE rowid = ?", (row[0],))
+            c.execute("DELETE FROM products WHERE seq = ?", (row[0],))
+        self._caches["product"].pop(pid)
+        self._notify_product("del", p)
+        return p
+
+    def reindex_product(self, p: models.Product) -> None:
+        with self._tx() as c:
+            row = c.execute("SELECT seq FROM products WHERE product_id = ?",
+                            (p.product_id,)).fetchone()
+            if row is None:
+                return
+            c.execute("UPDATE products SET data = ? WHERE seq = ?", (_dumps("product", p), row[0]))
+            self._write_text(c, row[0], p)
+        self._notify_product("put", p)
+
+    def touch_product(self, p: models.Product) -> None:
+        with self._tx() as c:
+            c.execute(
+                "UPDATE products SET promotion_rank = ?, views = ?, sold = ?, data = ? "
+                "WHERE product_id = ?",
+                (p.promotion_rank, p.views, p.sold, _dumps("product", p), p.product_id))
+        self._caches["product"].put(p.product_id, p)
+        self._notify_product("put", p)
+
+    def _search_where(self, keyword: str) -> Tuple[str, Tuple]:
+        low = keyword.lower()
+        if not low:
+            return "", ()
+        if self.has_fts and len(low) >= 3:
+            phrase = '"' + low.replace('"', '""') + '"'
+            return ("JOIN products_fts f ON f.rowid = p.seq WHERE products_fts MATCH ?",
+                    (phrase,))
+        pattern = _like_pattern(low)
+        return ("JOIN products_fts f ON f.rowid = p.seq WHERE (f.title LIKE ? ESCAPE '\\' "
+                "OR f.description LIKE ? ESCAPE '\\' OR f.tags LIKE ? ESCAPE '\\')",
+                (pattern, pattern, pattern))
+
+    def search_products(self, keyword: str = "") -> List[models.Product]:
+        where, params = self._search_where(keyword)
+        return self._load_many(
+            "product", f"SELECT p.product_id, p.data FROM products p {where} {_ORDER_BY_RANK}",
+            params)
+
+    def top_selling_products(self, limit: int) -> List[models.Product]:
+        return self._load_many(
+            "product", "SELECT product_id, data FROM products ORDER BY sold DESC, seq LIMIT ?", (limit,))
+
+    def search_products_page(
+        self, keyword: str = "", limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[models.Product], Optional[str]]:
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        where, params = self._search_where(keyword)
+        if cursor:
+            # 键集分页：从游标记录的排序键之后继续，无需 OFFSET
+            after = decode_cursor(cursor)
+            if len(after) != 4:
+                raise ValueError("invalid cursor")
+            where += (" AND " if where else " WHERE ") + f"({_RANK_KEY}) > (?, ?, ?, ?)"
+            params = params + tuple(after)
+        rows = self._query(
+            f"SELECT p.product_id, p.data, p.seq FROM products p {where} {_ORDER_BY_RANK} LIMIT ?",
+            params + (limit + 1,))
+        page = [self._hydrate("product", k, data) for k, data, _ in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(
+                (-last.promotion_rank, -last.views, -last.sold, rows[limit - 1][2]))
+        return page, next_cursor
+
+    # 订单交易
+    def add_order(self, order: models.Order) -> None:
+        self.add_orders([order])
+
+    def add_orders(self, orders: List[models.Order]) -> None:
+        with self._lock:
+            with self._tx() as c:
+                old = [self._write_order(c, order) for order in orders]
+            for order, old_status in zip(orders, old):
+                self._caches["order"].put(order.order_id, order)
+                self._notify_order(order, old_status)
+
+    @staticmethod
+    def _write_order(c: sqlite3.Connection, order: models.Order) -> Optional[str]:
+        """Upsert ``order`` and return its previous status value, if any."""
+        row = c.execute("SELECT status FROM orders WHERE order_id = ?", (order.order_id,)).fetchone()
+        c.execute(
+            "INSERT INTO orders(order_id, buyer_id, merchant_id, status, data) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(order_id) DO UPDATE SET "
+            "buyer_id = excluded.buyer_id, merchant_id = excluded.merchant_id, "
+            "status = excluded.status, data = excluded.data",
+            (order.order_id, order.buyer_id, order.merchant_id, order.status.value,
+             _dumps("order", order)))
+        seq = c.execute("SELECT seq FROM orders WHERE order_id = ?",
+                        (order.order_id,)).fetchone()[0]
+        c.execute("DELETE FROM order_items WHERE order_seq = ?", (seq,))
+        c.executemany(
+            "INSERT OR IGNORE INTO order_items(product_id, order_seq) VALUES (?, ?)",
+            [(it.product_id, seq) for it in order.items])
+        return row[0] if row else None
+
+    def get_order(self, oid: str) -> Optional[models.Order]:
+        return self._load("order", "order_id", oid)
+
+    def set_order_status(self, order: models.Order, status: models.OrderStatus) -> None:
+        order.status = status
+        with self._lock:
+            with self._tx() as c:
+                row = c.execute("SELECT status FROM orders WHERE order_id = ?",
+                                (order.order_id,)).fetchone()
+                c.execute("UPDATE orders SET status = ?, data = ? WHERE order_id = ?",
+                          (status.value, _dumps("order", order), order.order_id))
+            self._caches["order"].put(order.order_id, order)
+            if row is not None:
+                self._notify_order(order, row[0])
+
+    def mark_order_paid(self, order: models.Order, payment_id: str) -> None:
+        order.mark_paid(payment_id)
+        self.set_order_status(order, order.status)
+
+    def list_orders_for_buyer(self, buyer_id: str) -> List[models.Order]:
+        return self._load_many(
+            "order", "SELECT order_id, data FROM orders WHERE buyer_id = ? ORDER BY seq",
+            (buyer_id,))
+
+    def list_orders_for_merchant(self, merchant_id: str) -> List[models.Order]:
+        return self._load_many(
+            "order", "SELECT order_id, data FROM orders WHERE merchant_id = ? ORDER BY seq",
+            (merchant_id,))
+
+    def list_orders_for_product(self, product_id: str) -> List[models.Order]:
+        return self._load_many(
+            "order",
+            "SELECT o.order_id, o.data FROM order_items i JOIN orders o ON o.seq = i.order_seq "
+            "WHERE i.product_id = ? ORDER BY i.order_seq",
+            (product_id,))
+
+    def list_orders_by_status(self, status: models.OrderStatus) -> List[models.Order]:
+        return self._load_many(
+            "order", "SELECT order_id, data FROM orders WHERE status = ? ORDER BY seq",
+            (status.value,))
+
+    def add_payment(self, pay: models.Payment) -> None:
+        with self._tx() as c:
+            c.execute(
+                "INSERT INTO payments(payment_id, order_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(payment_id) DO UPDATE SET data = excluded.data",
+                (pay.payment_id, pay.order_id, _dumps("payment", pay)))
+        self._caches["payment"].put(pay.payment_id, pay)
+        for listener in self._payment_listeners:
+            listener(pay)
+
+    def get_payment(self, pid: str) -> Optional[models.Payment]:
+        return self._load("payment", "payment_id", pid)
+
+    def add_bargain(self, b: models.Bargain) -> None:
+        # 关闭的砍价搬到 bargain_archive，与 MemoryDB 一致
+        table = "bargain_archive" if b.closed else "bargains"
+        with self._tx() as c:
+            if b.closed:
+                c.execute("DELETE FROM bargains WHERE bargain_id = ?", (b.bargain_id,))
+            c.execute(
+                f"INSERT INTO {table}(bargain_id, data) VALUES (?, ?) "
+                "ON CONFLICT(bargain_id) DO UPDATE SET data = excluded.data",
+                (b.bargain_id, _dumps("bargain", b)))
+        if b.closed:
+            # 归档后只从 bargain_archive 读到它
+            self._caches["bargain"].pop(b.bargain_id)
+            self._caches["bargain_archive"].put(b.bargain_id, b)
+        else:
+            self._caches["bargain"].put(b.bargain_id, b)
+
+    def get_bargain(self, bid: str) -> Optional[models.Bargain]:
+        b = self._load("bargain", "bargain_id", bid)
+        return b if b is not None else self.bargain_archive.get(bid)
+
+    # 评论
+    def add_review(self, r: models.Review) -> None:
+        models.check_rating(r.rating)
+        with self._tx() as c:
+            c.execute(
+                "INSERT INTO reviews(review_id, product_id, rating, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(review_id) DO UPDATE SET product_id = excluded.product_id, "
+                "rating = excluded.rating, data = excluded.data",
+                (r.review_id, r.product_id, r.rating, _dumps("review", r)))
+        self._caches["review"].put(r.review_id, r)
+
+    def list_reviews_for_product(self, pid: str) -> List[models.Review]:
+        return self._load_many(
+            "review", "SELECT review_id, data FROM reviews WHERE product_id = ? ORDER BY seq",
+            (pid,))
+
+    def get_review_stats(self, pid: str) -> models.ReviewStats:
+        # reviews_product 索引覆盖 (product_id, rating)，不回表
+        stats = models.ReviewStats()
+        for rating, n in self._query(
+                "SELECT rating, COUNT(*) FROM reviews WHERE product_id = ? GROUP BY rating",
+                (pid,)):
+            stats.count += n
+            stats.total += rating * n
+            stats.histogram[rating - 1] += n
+        return stats
+
+    # 通知
+    def add_notification(self, notif: dict) -> None:
+        with self._tx() as c:
+            c.execute("INSERT INTO notifications(data) VALUES (?)",
+                      (json.dumps(to_jsonable(notif), ensure_ascii=False),))
+
+    def get_notifications(self) -> List[dict]:
+        return [json.loads(d) for (d,) in self._query("SELECT data FROM notifications ORDER BY seq")]
+
+    @property
+    def notifications(self) -> List[dict]:
+        return self.get_notifications()
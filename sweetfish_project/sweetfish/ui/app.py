@@ -6,12 +6,16 @@ from tkinter.font import Font
 from datetime import datetime
 
 from ..db import MemoryDB
+from ..scheduler import TimingWheel
+from ..services import analytics
 from ..services.auth import AuthService
 from ..services.bargain import BargainService
 from ..services.credit import CreditSystem
+from ..services.dispatcher import NotificationDispatcher
 from ..services.notification import NotificationService
 from ..services.order import OrderService
 from ..services.payment import PaymentGateway
+from ..services.payment_pipeline import AsyncPaymentPipeline, FakePaymentProvider
 from ..services.product import ProductService
 from ..services.recommend import RecommendationEngine
 
@@ -61,16 +65,29 @@ class SweetFishApp(tk.Tk):
         self.configure_styles()
 
         # 初始化服务
-        self.notification = NotificationService(db)
+        # 通知经有界队列由后台线程批量投递，界面线程只付出入队的开销
+        self.notify_dispatcher = NotificationDispatcher(policy="block", block_timeout=0.5)
+        self.notification = NotificationService(db, dispatcher=self.notify_dispatcher)
         self.payment = PaymentGateway(db, self.notification)
         self.credit = CreditSystem(db)
         self.recommend = RecommendationEngine(db)
         self.auth = AuthService(db)
         self.prodsvc = ProductService(db)
-        self.bargain = BargainService(db, self.notification)
+        # 砍价到期与订单支付超时共用一个时间轮
+        self.scheduler = TimingWheel(tick=1.0)
+        self.scheduler.start()
+        self.bargain = BargainService(db, self.notification, scheduler=self.scheduler)
+        # 支付走后台异步管道，慢速支付渠道不会卡住界面
+        self.payment_pipeline = AsyncPaymentPipeline(
+            self.payment, FakePaymentProvider(latency=0.5, jitter=0.5, decline_rate=0.02)
+        )
         self.ordersvc = OrderService(
-            db, self.payment, self.notification, self.credit, self.recommend
+            db, self.payment, self.notification, self.credit, self.recommend,
+            payment_pipeline=self.payment_pipeline,
+            scheduler=self.scheduler, payment_timeout=900.0
         )
+        # 统计看板的列式快照（需要 numpy），没有时逐个对象统计
+        self.analytics = analytics.OrderAnalytics(db) if analytics.HAS_NUMPY else None
         self.current_user = None
         self.active_frame = None
 
@@ -94,6 +111,10 @@ class SweetFishApp(tk.Tk):
     def on_closing(self):
         """窗口关闭事件处理"""
         if messagebox.askokcancel("退出", "确定要退出甜鱼商城吗？"):
+            self.payment_pipeline.close()
+            self.recommend.close()
+            self.scheduler.stop()
+            self.notify_dispatcher.close()
             self.destroy()
 
     def configure_styles(self):
@@ -515,6 +536,9 @@ class LoginFrame(ttk.Frame):
 class MainFrame(ttk.Frame):
     """主用户界面"""
 
+    # 搜索结果每页条数（一屏）
+    PAGE_SIZE = 50
+
     def __init__(self, master: SweetFishApp, user):
         super().__init__(master)
         self.master_app = master
@@ -526,6 +550,10 @@ class MainFrame(ttk.Frame):
         # 当前视图模式：'products' 或 'orders'
         self.current_view = 'products'
 
+        # 搜索分页状态
+        self.search_keyword = ""
+        self.search_cursor = None
+
         # 创建主布局
         self.setup_ui()
         self.populate_demo_data()
@@ -758,6 +786,16 @@ class MainFrame(ttk.Frame):
         )
         refresh_btn.pack(side="right")
 
+        # 加载下一页搜索结果
+        more_btn = ttk.Button(
+            self.display_header,
+            text="⬇ 更多",
+            style="Secondary.TButton",
+            command=self.load_more_products,
+            width=10
+        )
+        more_btn.pack(side="right", padx=(0, 5))
+
         # 创建滚动条
         scrollbar_y = ttk.Scrollbar(self.table_container, style="Modern.Vertical.TScrollbar")
         scrollbar_y.pack(side="right", fill="y")
@@ -864,11 +902,8 @@ class MainFrame(ttk.Frame):
         for row in self.order_tree.get_children():
             self.order_tree.delete(row)
 
-        # 获取当前用户的所有订单
-        user_orders = []
-        for order in self.master_app.db.orders.values():
-            if hasattr(order, 'buyer_id') and order.buyer_id == self.user.user_id:
-                user_orders.append(order)
+        # 获取当前用户的所有订单（走买家索引）
+        user_orders = self.master_app.db.list_orders_for_buyer(self.user.user_id)
 
         # 按创建时间倒序排序
         user_orders.sort(key=lambda x: x.created_at if hasattr(x, 'created_at') else "", reverse=True)
@@ -935,6 +970,8 @@ class MainFrame(ttk.Frame):
                 # 检查是否是Merchant类型（有shop_name属性）
                 if hasattr(merchant, 'shop_name'):
                     merchant.shop_name = "Bob's Shop"
+                # 原地修改后重新写入，否则日志里只有注册时的记录
+                self.master_app.db.add_user(merchant)
                 m = merchant
             except Exception as e:
                 # 如果注册失败，使用一个默认的商家ID
@@ -980,9 +1017,20 @@ class MainFrame(ttk.Frame):
         for row in self.product_tree.get_children():
             self.product_tree.delete(row)
 
-        products = products or list(self.master_app.db.products.values())
+        if products is None:
+            # 回到全部商品，丢弃搜索分页状态
+            self.search_keyword = ""
+            self.search_cursor = None
 
+        products = products or self.master_app.db.scan("products")
+        self.insert_product_rows(products)
+
+    def insert_product_rows(self, products):
+        """向商品表格追加行"""
         for p in products:
+            if self.product_tree.exists(p.product_id):
+                continue
+
             merchant = self.master_app.db.get_user_by_id(p.merchant_id)
             merchant_name = merchant.name if merchant else "未知商家"
 
@@ -1016,13 +1064,25 @@ class MainFrame(ttk.Frame):
         self.product_tree.tag_configure("in_stock", foreground="#28A745")  # 绿色
 
     def search_products(self):
-        """搜索商品"""
+        """搜索商品（只取第一页）"""
         keyword = self.search_entry.get().strip()
         if not keyword:
             self.refresh_products()
         else:
-            results = self.prodsvc.search(keyword)
+            results, cursor = self.prodsvc.search_page(keyword, limit=self.PAGE_SIZE)
             self.refresh_products(results)
+            self.search_keyword = keyword
+            self.search_cursor = cursor
+
+    def load_more_products(self):
+        """加载下一页搜索结果"""
+        if not hasattr(self, 'product_tree') or not self.search_cursor:
+            return
+
+        results, self.search_cursor = self.prodsvc.search_page(
+            self.search_keyword, limit=self.PAGE_SIZE, cursor=self.search_cursor
+        )
+        self.insert_product_rows(results)
 
     def create_order_from_selection(self):
         """从选择创建订单"""
@@ -1156,8 +1216,28 @@ class MainFrame(ttk.Frame):
             return
 
         try:
-            # 执行支付
-            payment_result = self.ordersvc.pay_order(order_id, succeed_rate=0.98)
+            # 异步发起支付，界面线程只负责轮询结果
+            future = self.ordersvc.pay_order_async(order_id)
+        except Exception as e:
+            messagebox.showerror(
+                "支付错误",
+                f"支付过程中出错：\n\n{str(e)}",
+                icon="error"
+            )
+            return
+        self.poll_payment(future, order)
+
+    def poll_payment(self, future, order):
+        """轮询支付结果，完成后刷新订单并提示"""
+        if not self.winfo_exists():
+            # 页面已切换（如退出登录），结果仍由后台线程落库
+            return
+        if not future.done():
+            self.after(100, lambda: self.poll_payment(future, order))
+            return
+        order_id = order.order_id
+        try:
+            payment_result = future.result()
 
             # 刷新订单列表
             self.load_user_orders()
@@ -1192,6 +1272,7 @@ class MainFrame(ttk.Frame):
     def show_notifications(self):
         """显示通知"""
         notes = self.notification.get_notifications_for_user(self.user.user_id)
+        self.notification.mark_read(self.user.user_id)
 
         # 创建通知窗口
         notif_window = tk.Toplevel(self)
@@ -1332,15 +1413,13 @@ class MainFrame(ttk.Frame):
     def show_stats(self):
         """显示用户统计"""
         # 获取统计数据 - 修复：使用buyer_id而不是user_id
-        total_orders = len([o for o in self.master_app.db.orders.values()
-                            if hasattr(o, 'buyer_id') and o.buyer_id == self.user.user_id])
+        user_orders = self.master_app.db.list_orders_for_buyer(self.user.user_id)
 
-        total_spent = sum([o.total_cents for o in self.master_app.db.orders.values()
-                           if hasattr(o, 'buyer_id') and o.buyer_id == self.user.user_id and o.status.value == "PAID"])
+        total_orders = len(user_orders)
 
-        active_orders = len([o for o in self.master_app.db.orders.values()
-                             if
-                             hasattr(o, 'buyer_id') and o.buyer_id == self.user.user_id and o.status.value != "PAID"])
+        total_spent = sum([o.total_cents for o in user_orders if o.status.value == "PAID"])
+
+        active_orders = len([o for o in user_orders if o.status.value != "PAID"])
 
         # 显示统计信息
         stats_msg = f"""
@@ -1359,7 +1438,7 @@ class MainFrame(ttk.Frame):
 
         其他信息：
         • 信用积分：{self.master_app.credit.get_score(self.user.user_id)}
-        • 未读通知：{len(self.notification.get_notifications_for_user(self.user.user_id))} 条
+        • 未读通知：{self.notification.unread_count(self.user.user_id)} 条
         """
 
         messagebox.showinfo("我的统计", stats_msg)
@@ -1367,10 +1446,7 @@ class MainFrame(ttk.Frame):
     def show_order_stats(self):
         """显示订单统计"""
         # 获取用户的所有订单
-        user_orders = []
-        for order in self.master_app.db.orders.values():
-            if hasattr(order, 'buyer_id') and order.buyer_id == self.user.user_id:
-                user_orders.append(order)
+        user_orders = self.master_app.db.list_orders_for_buyer(self.user.user_id)
 
         total_orders = len(user_orders)
         paid_orders = len([o for o in user_orders if o.status.value == "PAID"])
@@ -2042,9 +2118,9 @@ class MerchantFrame(ttk.Frame):
         ).pack(anchor="w", pady=(0, 10))
 
         # 获取商家统计数据
-        my_products = [p for p in self.master_app.db.products.values() if p.merchant_id == self.user.user_id]
-        total_sales = len([o for p in my_products for o in self.master_app.db.orders.values()
-                          if p.product_id in [item.product_id for item in o.items]])
+        # 商品与订单都走商家索引，不扫全表
+        my_products = self.master_app.prodsvc.list_for_merchant(self.user.user_id)
+        total_sales = len(self.master_app.db.list_orders_for_merchant(self.user.user_id))
 
         ttk.Label(
             info_card,
@@ -2187,8 +2263,7 @@ class MerchantFrame(ttk.Frame):
 
     def show_my_products(self):
         """显示我的商品（示例功能）"""
-        my_products = [p for p in self.master_app.db.products.values()
-                      if p.merchant_id == self.user.user_id]
+        my_products = self.master_app.prodsvc.list_for_merchant(self.user.user_id)
 
         if not my_products:
             messagebox.showinfo("我的商品", "您还没有上架任何商品")
@@ -2272,8 +2347,7 @@ class MerchantFrame(ttk.Frame):
 
     def show_stats(self):
         """显示销售统计"""
-        my_products = [p for p in self.master_app.db.products.values()
-                      if p.merchant_id == self.user.user_id]
+        my_products = self.master_app.prodsvc.list_for_merchant(self.user.user_id)
 
         if not my_products:
             messagebox.showinfo("销售统计", "您还没有上架任何商品")
@@ -2286,10 +2360,18 @@ class MerchantFrame(ttk.Frame):
 
         # 找出最畅销的商品
         product_sales = {}
-        for p in my_products:
-            sales = len([o for o in self.master_app.db.orders.values()
-                        if any(item.product_id == p.product_id for item in o.items)])
-            product_sales[p.title] = sales
+        if self.master_app.analytics is not None:
+            orders_by_product = self.master_app.analytics.count_by("product", merchant_id=self.user.user_id)
+            for p in my_products:
+                product_sales[p.title] = orders_by_product.get(p.product_id, 0)
+        else:
+            # 一次取出本店订单，按商品计数（同一订单里的商品只计一次）
+            orders_by_product = {}
+            for o in self.master_app.db.list_orders_for_merchant(self.user.user_id):
+                for pid in {it.product_id for it in o.items}:
+                    orders_by_product[pid] = orders_by_product.get(pid, 0) + 1
+            for p in my_products:
+                product_sales[p.title] = orders_by_product.get(p.product_id, 0)
 
         best_seller = max(product_sales.items(), key=lambda x: x[1], default=("无", 0))
 
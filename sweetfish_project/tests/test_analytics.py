@@ -0,0 +1,105 @@
+import datetime
+import random
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import Order, OrderItem, OrderStatus, Payment, Product
+
+np = pytest.importorskip("numpy")
+
+from sweetfish.services.analytics import OrderAnalytics  # noqa: E402
+
+DAY0 = datetime.datetime(2024, 3, 1, 12)
+
+
+def _fill(db, rng, n, start=0):
+    made = []
+    for i in range(start, start + n):
+        pid = f"p{rng.randrange(20)}"
+        if db.get_product(pid) is None:
+            db.add_product(Product(product_id=pid, merchant_id=f"m{int(pid[1:]) % 3}", title=pid,
+                                   description="", price_cents=100, stock=5))
+        qty = rng.randint(1, 3)
+        price = rng.randrange(50, 5000)
+        o = Order(order_id=f"o{i}", buyer_id="u", merchant_id=db.get_product(pid).merchant_id,
+                  items=[OrderItem(pid, qty, price)], total_cents=price * qty,
+                  status=rng.choice(list(OrderStatus)),
+                  created_at=DAY0 + datetime.timedelta(hours=rng.randrange(24 * 5)))
+        db.add_order(o)
+        db.add_payment(Payment(payment_id=f"pay{i}", order_id=o.order_id, amount_cents=o.total_cents,
+                               status=rng.choice(["init", "success", "failed"])))
+        made.append(o)
+    return made
+
+
+def _reference(orders, key, value=lambda o: o.total_cents, statuses=None):
+    out = {}
+    for o in orders:
+        if statuses is None or o.status in statuses:
+            out.setdefault(key(o), []).append(value(o))
+    return out
+
+
+def _check(analytics, db):
+    orders = db.scan("orders")
+    paid = {OrderStatus.PAID, OrderStatus.SHIPPED}
+    for by, key in (("merchant", lambda o: o.merchant_id), ("status", lambda o: o.status),
+                    ("day", lambda o: o.created_at.date()), ("product", lambda o: o.items[0].product_id)):
+        ref = _reference(orders, key, statuses=paid)
+        assert analytics.sum_by(by, statuses=paid) == {k: sum(v) for k, v in ref.items()}
+        ref = _reference(orders, key)
+        assert analytics.count_by(by) == {k: len(v) for k, v in ref.items()}
+        got = analytics.percentiles_by(by, qs=(0, 50, 90, 100))
+        for k, values in ref.items():
+            assert got[k] == pytest.approx(list(np.percentile(values, [0, 50, 90, 100])))
+    pays = _reference(db.scan("payments"), lambda p: p.status, value=lambda p: p.amount_cents)
+    assert analytics.sum_by("payment_status") == {k: sum(v) for k, v in pays.items()}
+
+
+def test_group_by_matches_python_loops():
+    db = MemoryDB()
+    rng = random.Random(4)
+    _fill(db, rng, 400)
+    _check(OrderAnalytics(db, chunk_size=64), db)
+
+
+def test_refresh_applies_only_changes():
+    db = MemoryDB()
+    rng = random.Random(9)
+    _fill(db, rng, 100)
+    analytics = OrderAnalytics(db)
+    made = _fill(db, rng, 50, start=100)
+    for o in made[:10]:
+        db.set_order_status(o, OrderStatus.REFUNDED)
+    pay = db.get_payment("pay3")
+    pay.status = "success"
+    db.add_payment(pay)
+    # 按行去重：50 个新订单（其中 10 个改过状态）+ 50 笔新支付 + 1 笔旧支付
+    assert analytics.pending == 50 + 51
+    _check(analytics, db)
+    assert analytics.pending == 0
+    assert analytics.refresh() == 0
+
+
+def test_merchant_filter_and_inventory():
+    db = MemoryDB()
+    rng = random.Random(2)
+    _fill(db, rng, 200)
+    analytics = OrderAnalytics(db)
+    mine = [o for o in db.scan("orders") if o.merchant_id == "m1"]
+    counts = analytics.count_by("product", merchant_id="m1")
+    assert sum(counts.values()) == len(mine)
+    assert analytics.sum_by("day", merchant_id="nobody") == {}
+
+    products = [p for p in db.scan("products") if p.merchant_id == "m1"]
+    db.remove_product(products[0].product_id)
+    products[1].stock = 40
+    db.touch_product(products[1])
+    live = products[1:]
+    assert analytics.inventory("m1") == {
+        "products": len(live),
+        "stock": sum(p.stock for p in live),
+        "stock_value_cents": sum(p.stock * p.price_cents for p in live),
+    }
+    with pytest.raises(ValueError):
+        analytics.sum_by("buyer")
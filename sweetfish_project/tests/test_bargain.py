@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.scheduler import TimingWheel
+from sweetfish.services.bargain import BargainService
+from sweetfish.services.dispatcher import NotificationDispatcher
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.product import ProductService
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def notification(db):
+    return NotificationService(db)
+
+
+@pytest.fixture
+def bargains(db, notification):
+    svc = BargainService(db, notification, scheduler=TimingWheel())
+    yield svc
+    svc.close()
+
+
+def _lamp(db, price=100_000):
+    return ProductService(db).create_product("m1", "lamp", "", price, stock=1)
+
+
+def test_concurrent_joins_are_not_lost(db, bargains, monkeypatch):
+    monkeypatch.setattr(bargains, "_calculate_cut", lambda b, pct=None: 1)
+    b = bargains.start_bargain("owner", _lamp(db).product_id)
+    threads, per_thread = 8, 500
+
+    def worker(t):
+        for i in range(per_thread):
+            bargains.join_bargain(b.bargain_id, f"u{t}_{i}")
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    assert len(b.participants) == threads * per_thread
+    assert b.current_price_cents == 100_000 - threads * per_thread
+    assert bargains.joins == threads * per_thread
+    assert bargains.batches <= bargains.joins
+
+
+def test_cuts_stop_at_floor_price(db, bargains):
+    b = bargains.start_bargain("owner", _lamp(db, price=1000).product_id, floor_price_cents=900)
+    for i in range(50):
+        bargains.join_bargain(b.bargain_id, f"u{i}")
+    assert b.current_price_cents == 900
+    with pytest.raises(ValueError):
+        bargains.start_bargain("owner", _lamp(db, price=1000).product_id, floor_price_cents=2000)
+
+
+def test_join_notifications_are_delivered_async(db):
+    dispatcher = NotificationDispatcher()
+    notification = NotificationService(db, dispatcher=dispatcher)
+    bargains = BargainService(db, notification, scheduler=TimingWheel())
+    b = bargains.start_bargain("owner", _lamp(db).product_id)
+    bargains.join_bargain(b.bargain_id, "u1")
+    bargains.flush()
+    [(message, _)] = notification.get_notifications_for_user("u1")
+    cut = 100_000 - b.current_price_cents
+    assert message == f"you cut {cut} cents"
+    assert dispatcher.metrics()["delivered"] == 2
+    dispatcher.close()
+
+
+def test_slow_notifications_do_not_hold_the_bargain_lock(db, notification, bargains, monkeypatch):
+    b = bargains.start_bargain("owner", _lamp(db).product_id)
+    release = threading.Event()
+    pushing = threading.Event()
+
+    def slow_push_many(messages):
+        # 模拟分发队列已满、推送阻塞
+        pushing.set()
+        release.wait(5)
+
+    monkeypatch.setattr(notification, "push_many", slow_push_many)
+    stuck = threading.Thread(target=bargains.join_bargain, args=(b.bargain_id, "u1"))
+    stuck.start()
+    assert pushing.wait(5)
+    # u1 仍卡在推送里，但加入已完成，其他人可以继续砍价
+    assert bargains._queue(b.bargain_id).lock.acquire(timeout=1)
+    bargains._queue(b.bargain_id).lock.release()
+    release.set()
+    stuck.join()
+    assert "u1" in b.participants
+
+
+def test_own_wheel_starts_on_first_bargain_and_stops_on_close(db, notification):
+    svc = BargainService(db, notification)
+    # 没有要到期的砍价时不起线程
+    assert svc.scheduler._thread is None
+    svc.start_bargain("owner", _lamp(db).product_id)
+    assert svc.scheduler._thread is not None
+    svc.close()
+    assert svc.scheduler._thread is None
+    svc.start_bargain("owner", _lamp(db).product_id)
+    assert svc.scheduler._thread is None
@@ -0,0 +1,57 @@
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import OrderStatus
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def products(db):
+    return ProductService(db)
+
+
+@pytest.fixture
+def orders(db):
+    notification = NotificationService(db)
+    return OrderService(db, PaymentGateway(db, notification), notification,
+                        CreditSystem(db), RecommendationEngine(db))
+
+
+def test_cart_split_by_merchant(products, orders, db):
+    lamp = products.create_product("m1", "lamp", "", 100, stock=5)
+    bulb = products.create_product("m1", "bulb", "", 10, stock=5)
+    book = products.create_product("m2", "book", "", 50, stock=5)
+    created = orders.create_orders_bulk(
+        "u1", [(lamp.product_id, 1), (book.product_id, 2), (bulb.product_id, 3), (lamp.product_id, 1)]
+    )
+    assert [o.merchant_id for o in created] == ["m1", "m2"]
+    m1, m2 = created
+    assert [(it.product_id, it.quantity) for it in m1.items] == [(lamp.product_id, 2), (bulb.product_id, 3)]
+    assert m1.total_cents == 230
+    assert m2.total_cents == 100
+    assert db.list_orders_for_buyer("u1") == created
+    assert orders.reservations.available(lamp.product_id) == 3
+
+    orders.pay_order(m2.order_id, succeed_rate=1.0)
+    assert db.get_order(m2.order_id).status == OrderStatus.PAID
+    assert book.stock == 3
+
+
+def test_bulk_checkout_is_all_or_nothing(products, orders, db):
+    lamp = products.create_product("m1", "lamp", "", 100, stock=5)
+    book = products.create_product("m2", "book", "", 50, stock=1)
+    with pytest.raises(ValueError, match="insufficient stock"):
+        orders.create_orders_bulk("u1", [(lamp.product_id, 1), (book.product_id, 2)])
+    with pytest.raises(ValueError, match="product not found"):
+        orders.create_orders_bulk("u1", [(lamp.product_id, 1), ("missing", 1)])
+    assert db.orders == {}
+    assert orders.reservations.available(lamp.product_id) == 5
@@ -0,0 +1,130 @@
+from sweetfish.columnar import load_columnar_snapshot, write_columnar_snapshot
+from sweetfish.db import MemoryDB
+from sweetfish.models import Bargain, Merchant, OrderStatus
+from sweetfish.persistence import open_durable_db
+from sweetfish.services.auth import AuthService
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+from sweetfish.services.review import ReviewService
+
+
+def _populate(db):
+    auth = AuthService(db)
+    merchant = auth.register("m1", "pwd", role="MERCHANT")
+    buyer = auth.register("u1", "pwd")
+    products = ProductService(db)
+    lamp = products.create_product(merchant.user_id, "复古台灯", "desk lamp", 1999, stock=3, tags={"灯", "复古"})
+    products.create_product(merchant.user_id, "book", "python", 499, stock=1)
+    notification = NotificationService(db)
+    orders = OrderService(db, PaymentGateway(db, notification), notification,
+                          CreditSystem(db), RecommendationEngine(db))
+    order = orders.create_order(buyer.user_id, [(lamp.product_id, 1)])
+    orders.pay_order(order.order_id, succeed_rate=1.0)
+    ReviewService(db).add_review(lamp.product_id, buyer.user_id, 5, "好")
+    return lamp, order
+
+
+def test_roundtrip(tmp_path):
+    db = MemoryDB()
+    lamp, order = _populate(db)
+    path = str(tmp_path / "snap.swfc")
+    write_columnar_snapshot(db, path)
+
+    db2 = load_columnar_snapshot(path)
+    p = db2.get_product(lamp.product_id)
+    assert p == lamp
+    assert db2.get_order(order.order_id) == order
+    assert isinstance(db2.get_user_by_phone("m1"), Merchant)
+    assert db2.get_payment(order.payment_id).status == "success"
+
+
+def test_rows_hydrated_lazily(tmp_path):
+    db = MemoryDB()
+    lamp, order = _populate(db)
+    path = str(tmp_path / "snap.swfc")
+    write_columnar_snapshot(db, path)
+
+    db2 = load_columnar_snapshot(path)
+    assert len(db2.products) == 2
+    assert db2.products.hydrated == 0
+    db2.get_product(lamp.product_id)
+    assert db2.products.hydrated == 1
+    # 索引由列直接构建，查询订单索引不需要先物化全部对象
+    assert [o.order_id for o in db2.list_orders_by_status(OrderStatus.PAID)] == [order.order_id]
+    assert db2.orders.hydrated == 1
+    assert db2.get_review_stats(lamp.product_id).count == 1
+
+
+def test_search_and_writes_after_load(tmp_path):
+    db = MemoryDB()
+    lamp, _ = _populate(db)
+    path = str(tmp_path / "snap.swfc")
+    write_columnar_snapshot(db, path)
+
+    db2 = load_columnar_snapshot(path)
+    products = ProductService(db2)
+    assert [p.product_id for p in products.search("台灯")] == [lamp.product_id]
+    extra = products.create_product("m", "新台灯", "", 1)
+    assert [p.product_id for p in products.search("台灯")] == [lamp.product_id, extra.product_id]
+    products.delete_product(lamp.product_id)
+    assert products.search("复古") == []
+
+
+def test_durable_db_with_columnar_snapshot(tmp_path):
+    db = open_durable_db(str(tmp_path), group_interval=0, snapshot_every=0,
+                         snapshot_format="columnar")
+    lamp, order = _populate(db)
+    db.journal.snapshot()
+    ProductService(db).update_stock(lamp.product_id, 10)
+    db.journal.close()
+
+    db2 = open_durable_db(str(tmp_path), group_interval=0, snapshot_format="columnar")
+    assert db2.get_product(lamp.product_id).stock == 12
+    assert db2.get_order(order.order_id).status == OrderStatus.PAID
+    db2.journal.close()
+
+
+def test_rankings_built_from_columns(tmp_path):
+    db = MemoryDB()
+    lamp, _ = _populate(db)
+    path = str(tmp_path / "snap.swfc")
+    write_columnar_snapshot(db, path)
+
+    db2 = load_columnar_snapshot(path)
+    assert [p.product_id for p in db2.top_selling_products(1)] == [lamp.product_id]
+    # 排行榜只读数值列，只有返回的那一行被水合
+    assert db2.products.hydrated == 1
+    assert [p.product_id for p in db2.search_products("")] == [p.product_id for p in db.search_products("")]
+
+
+def test_closed_bargains_load_into_archive(tmp_path):
+    db = MemoryDB()
+    lamp, _ = _populate(db)
+    open_b = Bargain("b1", lamp.product_id, "u1", 1999, 1999)
+    closed_b = Bargain("b2", lamp.product_id, "u1", 1999, 1500, closed=True)
+    db.add_bargain(open_b)
+    db.add_bargain(closed_b)
+    path = str(tmp_path / "snap.swfc")
+    write_columnar_snapshot(db, path)
+
+    db2 = load_columnar_snapshot(path)
+    assert list(db2.bargains) == ["b1"]
+    assert list(db2.bargain_archive) == ["b2"]
+    assert db2.get_bargain("b2") == closed_b
+
+
+def test_merchant_index_built_from_columns(tmp_path):
+    db = MemoryDB()
+    lamp, _ = _populate(db)
+    path = str(tmp_path / "snap.swfc")
+    write_columnar_snapshot(db, path)
+
+    db2 = load_columnar_snapshot(path)
+    mine = db2.list_products_for_merchant(lamp.merchant_id)
+    assert [p.product_id for p in mine] == [p.product_id for p in db.list_products_for_merchant(lamp.merchant_id)]
+    assert db2.list_products_for_merchant("nobody") == []
+
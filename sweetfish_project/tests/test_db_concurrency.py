@@ -0,0 +1,83 @@
+import threading
+
+from sweetfish.db import MemoryDB
+from sweetfish.locks import StripedLock
+from sweetfish.models import Order, OrderItem, OrderStatus, Product, gen_id
+from sweetfish.persistence import open_durable_db
+
+THREADS = 8
+PER_THREAD = 300
+
+
+def _writer(db, merchant_id):
+    for i in range(PER_THREAD):
+        p = Product(product_id=gen_id("p_"), merchant_id=merchant_id, title=f"lamp {i}",
+                    description="", price_cents=100, stock=1)
+        db.add_product(p)
+        o = Order(order_id=gen_id("o_"), buyer_id="u1", merchant_id=merchant_id,
+                  items=[OrderItem(p.product_id, 1)], total_cents=100)
+        db.add_order(o)
+        if i % 2:
+            db.set_order_status(o, OrderStatus.PAID)
+
+
+def _run(db, scanner):
+    errors = []
+    done = threading.Event()
+
+    def scan_loop():
+        try:
+            while not done.is_set():
+                scanner(db)
+        except Exception as exc:  # noqa: BLE001 - 任何异常都算失败
+            errors.append(exc)
+
+    writers = [threading.Thread(target=_writer, args=(db, f"m{i}")) for i in range(THREADS)]
+    scanners = [threading.Thread(target=scan_loop) for _ in range(2)]
+    for t in scanners + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    done.set()
+    for t in scanners:
+        t.join()
+    return errors
+
+
+def _scan(db):
+    for p in db.scan("products"):
+        assert p.product_id
+    db.search_products("lamp")
+    db.search_products_page("", limit=10)
+    db.list_orders_by_status(OrderStatus.PAID)
+    db.list_orders_for_buyer("u1")
+
+
+def test_concurrent_writers_and_scans():
+    db = MemoryDB(lock_stripes=4)
+    assert _run(db, _scan) == []
+    total = THREADS * PER_THREAD
+    assert len(db.products) == len(db.orders) == total
+    assert len(db.search_products("lamp")) == total
+    assert len(db.list_orders_for_buyer("u1")) == total
+    assert len(db.list_orders_by_status(OrderStatus.PAID)) == total // 2
+    assert len(db.list_orders_for_merchant("m3")) == PER_THREAD
+
+
+def test_snapshot_under_concurrent_writes(tmp_path):
+    db = open_durable_db(str(tmp_path), group_interval=0, fsync="off", snapshot_every=500)
+    assert _run(db, lambda d: d.journal.snapshot()) == []
+    db.journal.close()
+
+    db2 = open_durable_db(str(tmp_path), group_interval=0)
+    assert len(db2.orders) == THREADS * PER_THREAD
+    assert len(db2.list_orders_by_status(OrderStatus.PAID)) == THREADS * PER_THREAD // 2
+    db2.journal.close()
+
+
+def test_striped_lock_many_takes_each_stripe_once():
+    locks = StripedLock(2)
+    with locks.many(["a", "b", "c", "a"]):
+        # 可重入：持有期间同线程仍能再次获取
+        with locks("a"):
+            pass
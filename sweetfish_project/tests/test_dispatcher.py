@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.services.dispatcher import NotificationDispatcher
+from sweetfish.services.notification import NotificationService
+
+
+class GatedSink:
+    """Collects batches; holds the worker until ``gate`` is set."""
+
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, notes):
+        self.gate.wait()
+        self.batches.append([(u, m) for u, m, _ in notes])
+
+
+def test_batches_reach_every_sink_and_inboxes():
+    sink = GatedSink()
+    dispatcher = NotificationDispatcher([sink], batch_size=4)
+    service = NotificationService(MemoryDB(), dispatcher=dispatcher)
+    sink.gate.clear()
+    service.push("u0", "first")
+    service.push_many((f"u{i % 2}", f"m{i}") for i in range(9))
+    sink.gate.set()
+    assert service.flush(timeout=5)
+    delivered = [note for batch in sink.batches for note in batch]
+    assert delivered[0] == ("u0", "first")
+    assert [m for _, m in delivered[1:]] == [f"m{i}" for i in range(9)]
+    assert all(len(batch) <= 4 for batch in sink.batches)
+    assert [m for m, _ in service.get_notifications_for_user("u1")] == ["m1", "m3", "m5", "m7"]
+    metrics = dispatcher.metrics()
+    assert metrics["delivered"] == 10 and metrics["depth"] == 0
+    assert metrics["max_lag_ms"] >= metrics["lag_ms"] > 0
+    dispatcher.close()
+
+
+@pytest.mark.parametrize("policy, kept", [
+    ("drop_newest", ["m0", "m1", "m2"]),
+    ("drop_oldest", ["m3", "m4", "m5"]),
+])
+def test_drop_policies_when_full(policy, kept):
+    sink = GatedSink()
+    dispatcher = NotificationDispatcher([sink], capacity=3, batch_size=1, policy=policy)
+    sink.gate.clear()
+    # 第一条被 worker 取走后卡在 sink 里，队列中最多再放 3 条
+    dispatcher.enqueue("u", "first")
+    while dispatcher.depth:
+        pass
+    accepted = [dispatcher.enqueue("u", f"m{i}") for i in range(6)]
+    assert accepted.count(True) == (3 if policy == "drop_newest" else 6)
+    assert dispatcher.metrics()["dropped"] == 3
+    sink.gate.set()
+    dispatcher.flush(timeout=5)
+    assert [m for [(_, m)] in sink.batches] == ["first"] + kept
+    dispatcher.close()
+
+
+def test_block_policy_times_out_and_sink_errors_are_counted():
+    sink = GatedSink()
+
+    def broken(notes):
+        raise RuntimeError("sms gateway down")
+
+    dispatcher = NotificationDispatcher([broken, sink], capacity=1, batch_size=1,
+                                        policy="block", block_timeout=0.05)
+    sink.gate.clear()
+    dispatcher.enqueue("u", "a")
+    while dispatcher.depth:
+        pass
+    assert dispatcher.enqueue("u", "b") is True
+    assert dispatcher.enqueue("u", "c") is False
+    sink.gate.set()
+    dispatcher.close()
+    metrics = dispatcher.metrics()
+    assert metrics["delivered"] == 2 and metrics["dropped"] == 1
+    assert metrics["errors"] == 2
+    with pytest.raises(RuntimeError):
+        dispatcher.enqueue("u", "late")
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        NotificationDispatcher(policy="spill")
+    with pytest.raises(ValueError):
+        NotificationDispatcher(capacity=0)
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import OrderStatus
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.idempotency import IdempotencyCache, completed
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.payment_pipeline import AsyncPaymentPipeline, PaymentProvider
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+
+class GatedProvider(PaymentProvider):
+    """Approves once the test opens the gate."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = 0
+
+    async def charge(self, payment):
+        self.calls += 1
+        while not self.gate.is_set():
+            await asyncio.sleep(0.005)
+        return True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def provider():
+    return GatedProvider()
+
+
+@pytest.fixture
+def orders(db, provider):
+    notification = NotificationService(db)
+    gateway = PaymentGateway(db, notification)
+    pipeline = AsyncPaymentPipeline(gateway, provider)
+    svc = OrderService(db, gateway, notification, CreditSystem(db), RecommendationEngine(db),
+                       payment_pipeline=pipeline)
+    yield svc
+    pipeline.close()
+
+
+def _order(db, orders):
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=5)
+    return orders.create_order("u1", [(p.product_id, 1)])
+
+
+def test_repeated_key_returns_first_payment(db, orders):
+    o = _order(db, orders)
+    first = orders.pay_order(o.order_id, succeed_rate=0.0, idempotency_key="k1")
+    again = orders.pay_order(o.order_id, succeed_rate=1.0, idempotency_key="k1")
+    assert again is first
+    assert first.status == "failed"
+    assert len(db.payments) == 1
+    # 换一个 key 才会真正重试
+    assert orders.pay_order(o.order_id, succeed_rate=1.0, idempotency_key="k2").status == "success"
+    assert db.get_order(o.order_id).status == OrderStatus.PAID
+
+
+def test_concurrent_duplicates_coalesce(db, orders, provider):
+    o = _order(db, orders)
+    futures = [orders.pay_order_async(o.order_id, idempotency_key="k") for _ in range(5)]
+    assert len({id(f) for f in futures}) == 1
+    provider.gate.set()
+    assert futures[0].result(timeout=5).status == "success"
+    assert provider.calls == 1
+    assert len(db.payments) == 1
+    assert orders.idempotency.hits == 4
+
+
+def test_failed_attempt_is_not_cached(db, orders):
+    with pytest.raises(ValueError, match="order not found"):
+        orders.pay_order("missing", idempotency_key="k")
+    assert len(orders.idempotency) == 0
+
+
+def test_key_bound_to_order(db, orders):
+    a, b = _order(db, orders), _order(db, orders)
+    orders.pay_order(a.order_id, succeed_rate=1.0, idempotency_key="k")
+    with pytest.raises(ValueError, match="different request"):
+        orders.pay_order(b.order_id, idempotency_key="k")
+
+
+def test_cache_ttl_and_bound():
+    clock = FakeClock()
+    cache = IdempotencyCache(ttl=10, max_entries=2, clock=clock)
+    calls = []
+
+    def start(v):
+        calls.append(v)
+        return completed(v)
+
+    assert cache.run("a", 1, lambda: start(1)).result() == 1
+    assert cache.run("a", 1, lambda: start(2)).result() == 1
+    cache.run("b", 1, lambda: start(3))
+    cache.run("c", 1, lambda: start(4))
+    assert len(cache) == 2
+    assert cache.run("a", 1, lambda: start(5)).result() == 5
+    clock.now = 11
+    assert cache.run("c", 1, lambda: start(6)).result() == 6
+    assert calls == [1, 3, 4, 5, 6]
@@ -0,0 +1,137 @@
+import threading
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import OrderStatus
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.inventory import StockReservations
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def reservations(db, clock):
+    return StockReservations(db, ttl=60, clock=clock)
+
+
+@pytest.fixture
+def orders(db, reservations):
+    notification = NotificationService(db)
+    return OrderService(db, PaymentGateway(db, notification), notification,
+                        CreditSystem(db), RecommendationEngine(db), reservations)
+
+
+def test_create_order_reserves_stock(db, orders, reservations):
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=3)
+    orders.create_order("u1", [(p.product_id, 2)])
+    assert reservations.available(p.product_id) == 1
+    with pytest.raises(ValueError, match="insufficient stock"):
+        orders.create_order("u2", [(p.product_id, 2)])
+    assert p.stock == 3
+
+
+def test_failed_order_write_releases_the_reservation(db, orders, reservations, monkeypatch):
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=3)
+
+    def broken_write(order):
+        raise OSError("journal write failed")
+
+    monkeypatch.setattr(db, "add_order", broken_write)
+    with pytest.raises(OSError):
+        orders.create_order("u1", [(p.product_id, 2)])
+    assert reservations.reserved(p.product_id) == 0
+    assert reservations.available(p.product_id) == 3
+
+
+def test_pay_commits_and_failure_releases(db, orders, reservations):
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=2)
+    o = orders.create_order("u1", [(p.product_id, 2)])
+    orders.pay_order(o.order_id, succeed_rate=0.0)
+    assert reservations.available(p.product_id) == 2
+    assert db.get_order(o.order_id).status == OrderStatus.CREATED
+
+    orders.pay_order(o.order_id, succeed_rate=1.0)
+    assert db.get_order(o.order_id).status == OrderStatus.PAID
+    assert p.stock == 0
+    assert reservations.reserved(p.product_id) == 0
+
+
+def test_failed_payment_setup_releases_the_reservation(db, orders, reservations, monkeypatch):
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=2)
+    o = orders.create_order("u1", [(p.product_id, 2)])
+
+    def broken_create(order):
+        raise OSError("gateway unreachable")
+
+    monkeypatch.setattr(orders.payment_gateway, "create_payment", broken_create)
+    with pytest.raises(OSError):
+        orders.pay_order(o.order_id, succeed_rate=1.0)
+    assert reservations.reserved(p.product_id) == 0
+    monkeypatch.undo()
+    # 不再卡在“支付中”，可以重新支付
+    orders.pay_order(o.order_id, succeed_rate=1.0)
+    assert db.get_order(o.order_id).status == OrderStatus.PAID
+
+
+def test_reservation_expires(db, orders, reservations, clock):
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=1)
+    stale = orders.create_order("u1", [(p.product_id, 1)])
+    clock.now = 61
+    fresh = orders.create_order("u2", [(p.product_id, 1)])
+    orders.pay_order(fresh.order_id, succeed_rate=1.0)
+    # 过期订单再支付时需要重新预留，库存已售罄
+    with pytest.raises(ValueError, match="insufficient stock"):
+        orders.pay_order(stale.order_id, succeed_rate=1.0)
+    assert p.stock == 0
+
+
+def test_reserve_is_all_or_nothing(db, reservations):
+    products = ProductService(db)
+    a = products.create_product("m1", "a", "", 1, stock=5)
+    b = products.create_product("m1", "b", "", 1, stock=1)
+    with pytest.raises(ValueError):
+        reservations.reserve("o1", [(a.product_id, 1), (b.product_id, 2)])
+    assert reservations.reserved(a.product_id) == 0
+
+
+def test_concurrent_checkout_never_oversells(db, orders):
+    p = ProductService(db).create_product("m1", "hot", "", 100, stock=50)
+    paid = []
+
+    def buyer(i):
+        for _ in range(20):
+            try:
+                o = orders.create_order(f"u{i}", [(p.product_id, 1)])
+            except ValueError:
+                continue
+            if orders.pay_order(o.order_id, succeed_rate=0.7).status == "success":
+                paid.append(o.order_id)
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(paid) <= 50
+    assert p.stock == 50 - len(paid)
@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.services.notification import NotificationService
+
+
+@pytest.fixture
+def service():
+    return NotificationService(MemoryDB(), retention=3)
+
+
+def test_push_and_get(service):
+    service.push("u1", "hello")
+    service.push("u2", "other")
+    notes = service.get_notifications_for_user("u1")
+    assert [msg for msg, _ in notes] == ["hello"]
+
+
+def test_get_unknown_user(service):
+    assert service.get_notifications_for_user("nobody") == []
+    assert service.unread_count("nobody") == 0
+
+
+def test_inbox_is_bounded(service):
+    for i in range(10):
+        service.push("u1", f"m{i}")
+    notes = service.get_notifications_for_user("u1")
+    assert [msg for msg, _ in notes] == ["m7", "m8", "m9"]
+    assert service.unread_count("u1") == 3
+
+
+def test_mark_read(service):
+    service.push("u1", "a")
+    service.push("u1", "b")
+    assert service.unread_count("u1") == 2
+    service.mark_read("u1")
+    assert service.unread_count("u1") == 0
+    service.push("u1", "c")
+    assert service.unread_count("u1") == 1
+
+
+def test_invalid_retention():
+    with pytest.raises(ValueError):
+        NotificationService(MemoryDB(), retention=0)
+
+
+def test_default_delivers_inline_without_a_worker_thread():
+    before = threading.active_count()
+    service = NotificationService(MemoryDB())
+    service.push("u1", "hello")
+    # 未注入分发器：同步写入收件箱，不启动后台线程
+    assert service.dispatcher is None
+    assert service.unread_count("u1") == 1
+    assert threading.active_count() == before
@@ -0,0 +1,74 @@
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import OrderStatus
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def products(db):
+    return ProductService(db)
+
+
+@pytest.fixture
+def orders(db):
+    notification = NotificationService(db)
+    return OrderService(db, PaymentGateway(db, notification), notification,
+                        CreditSystem(db), RecommendationEngine(db))
+
+
+def test_orders_indexed_by_buyer_merchant_product(products, orders, db):
+    p1 = products.create_product("m1", "lamp", "lamp", 100, stock=5)
+    p2 = products.create_product("m2", "book", "book", 50, stock=5)
+    o1 = orders.create_order("u1", [(p1.product_id, 1)])
+    o2 = orders.create_order("u1", [(p2.product_id, 2)])
+    o3 = orders.create_order("u2", [(p1.product_id, 1)])
+
+    assert db.list_orders_for_buyer("u1") == [o1, o2]
+    assert db.list_orders_for_buyer("u2") == [o3]
+    assert db.list_orders_for_merchant("m1") == [o1, o3]
+    assert db.list_orders_for_product(p2.product_id) == [o2]
+    assert db.list_orders_for_buyer("nobody") == []
+
+
+def test_status_index_follows_payment(products, orders, db):
+    p = products.create_product("m1", "lamp", "lamp", 100, stock=5)
+    o = orders.create_order("u1", [(p.product_id, 1)])
+    assert db.list_orders_by_status(OrderStatus.CREATED) == [o]
+
+    orders.pay_order(o.order_id, succeed_rate=1.0)
+    assert o.status == OrderStatus.PAID
+    assert db.list_orders_by_status(OrderStatus.CREATED) == []
+    assert db.list_orders_by_status(OrderStatus.PAID) == [o]
+
+
+def test_set_order_status(products, orders, db):
+    p = products.create_product("m1", "lamp", "lamp", 100, stock=5)
+    o = orders.create_order("u1", [(p.product_id, 1)])
+    db.set_order_status(o, OrderStatus.CANCELLED)
+    assert db.list_orders_by_status(OrderStatus.CANCELLED) == [o]
+    assert db.list_orders_by_status(OrderStatus.CREATED) == []
+
+
+def test_bulk_load_rebuilds_indexes_from_entities(products, orders, db):
+    lamp = products.create_product("m1", "lamp", "desk lamp", 100, stock=5)
+    o = orders.create_order("u1", [(lamp.product_id, 1)])
+    fresh = MemoryDB()
+    fresh.bulk_load(users=dict(db.users), products=dict(db.products), orders=dict(db.orders))
+    assert fresh.list_orders_for_buyer("u1") == [o]
+    assert fresh.list_orders_by_status(OrderStatus.CREATED) == [o]
+    assert fresh.search_products("desk") == [lamp]
+    page, cursor = fresh.search_products_page("", limit=1)
+    assert page == [lamp] and cursor is None
+    # 装载不写日志，之后的新商品排在已有商品之后
+    later = ProductService(fresh).create_product("m1", "lamp 2", "", 100)
+    assert fresh.search_products("lamp") == [lamp, later]
@@ -0,0 +1,160 @@
+import asyncio
+import random
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import OrderStatus
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.payment_pipeline import (
+    AsyncPaymentPipeline,
+    FakePaymentProvider,
+    PaymentProvider,
+    ProviderError,
+)
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+
+class FlakyProvider(PaymentProvider):
+    """Fails the first ``failures`` calls, then approves."""
+
+    def __init__(self, failures, hang=False):
+        self.failures = failures
+        self.hang = hang
+        self.calls = 0
+
+    async def charge(self, payment):
+        self.calls += 1
+        if self.calls <= self.failures:
+            if self.hang:
+                await asyncio.sleep(10)
+            raise ProviderError("boom")
+        return True
+
+
+class CountingProvider(FakePaymentProvider):
+    def __init__(self):
+        super().__init__(latency=0.02, decline_rate=0.0)
+        self.active = self.peak = 0
+
+    async def charge(self, payment):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().charge(payment)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+def _setup(db, provider, **options):
+    notification = NotificationService(db)
+    gateway = PaymentGateway(db, notification)
+    pipeline = AsyncPaymentPipeline(gateway, provider, **options)
+    orders = OrderService(db, gateway, notification, CreditSystem(db), RecommendationEngine(db),
+                          payment_pipeline=pipeline)
+    return orders, notification, pipeline
+
+
+def test_async_payment_success(db):
+    orders, notification, pipeline = _setup(db, FakePaymentProvider(latency=0, decline_rate=0))
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=2)
+    o = orders.create_order("u1", [(p.product_id, 1)])
+    pay = orders.pay_order_async(o.order_id).result(timeout=5)
+    pipeline.close()
+    assert pay.status == "success"
+    assert db.get_order(o.order_id).status == OrderStatus.PAID
+    assert db.get_order(o.order_id).payment_id == pay.payment_id
+    assert p.stock == 1
+    notification.flush()
+    assert notification.unread_count("u1") == 1
+
+
+def test_async_payment_declined_releases_stock(db):
+    orders, _, pipeline = _setup(db, FakePaymentProvider(latency=0, decline_rate=1.0))
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=1)
+    o = orders.create_order("u1", [(p.product_id, 1)])
+    assert orders.pay_order_async(o.order_id).result(timeout=5).status == "failed"
+    pipeline.close()
+    assert db.get_order(o.order_id).status == OrderStatus.CREATED
+    assert orders.reservations.available(p.product_id) == 1
+
+
+def test_retry_after_errors_and_timeouts(db):
+    provider = FlakyProvider(failures=2, hang=True)
+    orders, _, pipeline = _setup(db, provider, timeout=0.05, retries=2, backoff=0.01)
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=1)
+    o = orders.create_order("u1", [(p.product_id, 1)])
+    assert orders.pay_order_async(o.order_id).result(timeout=5).status == "success"
+    assert provider.calls == 3
+
+    provider = FlakyProvider(failures=5)
+    pipeline.provider = provider
+    o2 = orders.create_order("u1", [(ProductService(db).create_product("m1", "b", "", 1, stock=1).product_id, 1)])
+    assert orders.pay_order_async(o2.order_id).result(timeout=5).status == "failed"
+    assert provider.calls == 3
+    pipeline.close()
+
+
+def test_bounded_concurrency_and_no_double_charge(db):
+    provider = CountingProvider()
+    orders, _, pipeline = _setup(db, provider, max_concurrency=3)
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=20)
+    created = [orders.create_order(f"u{i}", [(p.product_id, 1)]) for i in range(10)]
+    futures = [orders.pay_order_async(o.order_id) for o in created]
+    with pytest.raises(ValueError, match="in progress"):
+        orders.pay_order_async(created[0].order_id)
+    assert all(f.result(timeout=5).status == "success" for f in futures)
+    pipeline.close()
+    assert provider.peak == 3
+    assert p.stock == 10
+
+
+def test_fake_provider_rates_are_seedable():
+    provider = FakePaymentProvider(latency=0, decline_rate=0.5, rng=random.Random(1))
+    results = [asyncio.run(provider.charge(None)) for _ in range(200)]
+    assert 60 < results.count(True) < 140
+
+
+def test_batching_groups_payments_into_one_call(db):
+    provider = FakePaymentProvider(latency=0.01, decline_rate=0.0)
+    orders, _, pipeline = _setup(db, provider, batch_size=8, batch_window=0.05)
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=20)
+    created = [orders.create_order(f"u{i}", [(p.product_id, 1)]) for i in range(10)]
+    futures = [orders.pay_order_async(o.order_id) for o in created]
+    assert all(f.result(timeout=5).status == "success" for f in futures)
+    pipeline.close()
+    # 8 个凑满一批，剩下 2 个等窗口到期再发
+    assert provider.calls == 2
+    assert len(db.list_orders_by_status(OrderStatus.PAID)) == 10
+
+
+def test_close_flushes_queue_and_fails_leftovers(db):
+    provider = FakePaymentProvider(latency=0.01, decline_rate=0.0)
+    orders, _, pipeline = _setup(db, provider, batch_size=8, batch_window=60)
+    p = ProductService(db).create_product("m1", "lamp", "", 100, stock=20)
+    queued = [orders.pay_order_async(orders.create_order("u1", [(p.product_id, 1)]).order_id)
+              for _ in range(3)]
+    # 批次窗口很长，close 要立即发出而不是丢下它们
+    pipeline.close()
+    assert all(f.result(timeout=0).status == "success" for f in queued)
+    with pytest.raises(RuntimeError, match="closed"):
+        orders.pay_order_async(orders.create_order("u1", [(p.product_id, 1)]).order_id)
+
+    orders, _, pipeline = _setup(db, FlakyProvider(failures=1, hang=True), timeout=30)
+    o = orders.create_order("u2", [(p.product_id, 1)])
+    stuck = orders.pay_order_async(o.order_id)
+    pipeline.close(timeout=0.05)
+    with pytest.raises(RuntimeError, match="closed"):
+        stuck.result(timeout=0)
+    # 被取消的支付按失败收尾：预留释放，订单可以重新支付
+    assert db.get_order(o.order_id).status == OrderStatus.CREATED
+    assert orders.reservations.reserved(p.product_id) == 0
+    assert orders.pay_order(o.order_id, succeed_rate=1.0).status == "success"
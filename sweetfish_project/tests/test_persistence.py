@@ -0,0 +1,105 @@
+import os
+
+import pytest
+from sweetfish.models import Merchant, OrderStatus
+from sweetfish.persistence import WAL_FILE, open_durable_db
+from sweetfish.services.auth import AuthService
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+from sweetfish.services.review import ReviewService
+
+
+def _populate(db):
+    auth = AuthService(db)
+    merchant = auth.register("m1", "pwd", role="MERCHANT")
+    buyer = auth.register("u1", "pwd")
+    products = ProductService(db)
+    p = products.create_product(merchant.user_id, "lamp", "desk lamp", 1999, stock=3, tags={"灯"})
+    notification = NotificationService(db)
+    orders = OrderService(db, PaymentGateway(db, notification), notification,
+                          CreditSystem(db), RecommendationEngine(db))
+    order = orders.create_order(buyer.user_id, [(p.product_id, 1)])
+    orders.pay_order(order.order_id, succeed_rate=1.0)
+    ReviewService(db).add_review(p.product_id, buyer.user_id, 4, "nice")
+    return p, order
+
+
+def test_recover_from_wal(tmp_path):
+    db = open_durable_db(str(tmp_path), group_interval=0)
+    p, order = _populate(db)
+    db.journal.close()
+
+    db2 = open_durable_db(str(tmp_path), group_interval=0)
+    assert isinstance(db2.get_user_by_phone("m1"), Merchant)
+    p2 = db2.get_product(p.product_id)
+    assert p2.tags == {"灯"}
+    assert p2.stock == 2
+    assert db2.search_products("lamp") == [p2]
+    o2 = db2.get_order(order.order_id)
+    assert o2.status == OrderStatus.PAID
+    assert db2.list_orders_by_status(OrderStatus.PAID) == [o2]
+    assert db2.get_payment(o2.payment_id).status == "success"
+    assert db2.get_review_stats(p.product_id).count == 1
+    db2.journal.close()
+
+
+def test_snapshot_then_tail(tmp_path):
+    db = open_durable_db(str(tmp_path), group_interval=0, snapshot_every=0)
+    p, _ = _populate(db)
+    db.journal.snapshot()
+    assert os.path.getsize(tmp_path / WAL_FILE) == 0
+    ProductService(db).delete_product(p.product_id)
+    db.journal.close()
+
+    db2 = open_durable_db(str(tmp_path), group_interval=0)
+    assert db2.get_product(p.product_id) is None
+    assert db2.get_user_by_phone("u1") is not None
+    db2.journal.close()
+
+
+def test_snapshot_restores_indexes_and_re_put_edits(tmp_path):
+    db = open_durable_db(str(tmp_path), group_interval=0, snapshot_every=0)
+    p, order = _populate(db)
+    merchant = db.get_user_by_phone("m1")
+    # 与演示数据相同：注册后原地改名，需重新写入才会进日志
+    merchant.name = "Bob"
+    db.add_user(merchant)
+    db.journal.snapshot()
+    db.journal.close()
+
+    db2 = open_durable_db(str(tmp_path), group_interval=0)
+    assert db2.get_user_by_phone("m1").name == "Bob"
+    p2 = db2.get_product(p.product_id)
+    assert db2.search_products("desk") == [p2]
+    assert db2.top_selling_products(1) == [p2]
+    o2 = db2.get_order(order.order_id)
+    assert db2.list_orders_for_buyer(o2.buyer_id) == [o2]
+    assert db2.list_orders_by_status(OrderStatus.PAID) == [o2]
+    assert db2.get_review_stats(p.product_id).histogram == [0, 0, 0, 1, 0]
+    db2.journal.close()
+
+
+def test_torn_tail_is_discarded(tmp_path):
+    db = open_durable_db(str(tmp_path), group_interval=0)
+    AuthService(db).register("u1", "pwd")
+    db.journal.close()
+    with open(tmp_path / WAL_FILE, "ab") as f:
+        f.write(b'{"op":"put","t":"us')
+
+    db2 = open_durable_db(str(tmp_path), group_interval=0)
+    AuthService(db2).register("u2", "pwd")
+    db2.journal.close()
+
+    db3 = open_durable_db(str(tmp_path), group_interval=0)
+    assert db3.get_user_by_phone("u1") is not None
+    assert db3.get_user_by_phone("u2") is not None
+    db3.journal.close()
+
+
+def test_invalid_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        open_durable_db(str(tmp_path), fsync="sometimes")
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.ranking import RankedSet
+from sweetfish.services.admin import AdminService
+from sweetfish.services.product import ProductService
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+def test_ranked_set_matches_sorted_reference():
+    rng = random.Random(11)
+    ranked = RankedSet(seed=1)
+    ref = {}
+    for _ in range(3000):
+        member = rng.randrange(200)
+        if rng.random() < 0.2:
+            ranked.discard(member)
+            ref.pop(member, None)
+        else:
+            key = (rng.randrange(10), member)
+            ranked.put(member, key)
+            ref[member] = key
+    order = sorted(ref, key=ref.get)
+    assert len(ranked) == len(ref)
+    assert ranked.first(len(ref) + 5) == order
+    assert ranked.first(7) == order[:7]
+    after = ref[order[20]]
+    assert ranked.first(5, after=after) == order[21:26]
+    assert ranked.items(1) == [(ref[order[0]], order[0])]
+
+
+def _shuffle_counters(db, rng, products):
+    for p in products:
+        p.promotion_rank = rng.randint(0, 2)
+        p.views = rng.randint(0, 20)
+        p.sold = rng.randint(0, 5)
+        db.touch_product(p)
+
+
+def test_db_rankings_follow_writes(db):
+    rng = random.Random(3)
+    service = ProductService(db)
+    products = [service.create_product("m1", f"item {i}", "", 100) for i in range(60)]
+    _shuffle_counters(db, rng, products)
+    service.delete_product(products[0].product_id)
+    _shuffle_counters(db, rng, products[1:30])
+
+    alive = products[1:]
+    assert db.search_products("") == sorted(alive, key=db._rank_key)
+    assert db.top_selling_products(5) == sorted(alive, key=lambda p: p.sold, reverse=True)[:5]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = db.search_products_page("", limit=7, cursor=cursor)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == db.search_products("")
+
+
+def test_sales_report_top_5(db):
+    service = ProductService(db)
+    products = [service.create_product("m1", f"item {i}", "", 100) for i in range(8)]
+    for i, p in enumerate(products):
+        p.sold = i % 4
+        db.touch_product(p)
+    report = AdminService(db).generate_sales_report()
+    assert [pid for pid, _, _ in report["top"]] == [
+        products[3].product_id, products[7].product_id, products[2].product_id,
+        products[6].product_id, products[1].product_id]
@@ -0,0 +1,93 @@
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.services.product import ProductService
+from sweetfish.services.rec_cache import RecommendationCache
+from sweetfish.services.recommend import RecommendationEngine
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+def _catalogue(db):
+    products = ProductService(db)
+    return [products.create_product("m1", f"item {i}", "", 100, tags={f"t{i % 3}"}) for i in range(6)]
+
+
+def test_repeat_request_is_a_hit(db):
+    _catalogue(db)
+    engine = RecommendationEngine(db)
+    first = engine.recommend_for_user("u1", top_k=3)
+    assert engine.recommend_for_user("u1", top_k=3) == first
+    assert (engine.cache.hits, engine.cache.misses) == (1, 1)
+    # 浏览计数变化不会让缓存失效
+    engine.record_view("u2", first[0].product_id)
+    engine.recommend_for_user("u1", top_k=3)
+    assert engine.cache.hits == 2
+    engine.close()
+
+
+def test_own_history_serves_stale_then_refreshes(db):
+    items = _catalogue(db)
+    engine = RecommendationEngine(db, vectorized=False)
+    before = engine.recommend_for_user("u1", top_k=3)
+    engine.record_view("u1", items[5].product_id)
+    assert engine.recommend_for_user("u1", top_k=3) == before
+    assert engine.cache.stale_hits == 1
+    engine.cache.flush(timeout=5)
+    fresh = engine.recommend_for_user("u1", top_k=3)
+    assert fresh == engine._recommend_for_user("u1", 3)
+    assert items[5] not in fresh
+    assert engine.cache.hits == 1 and engine.cache.refreshes == 1
+    engine.close()
+
+
+def test_catalogue_changes_respect_threshold(db):
+    items = _catalogue(db)
+    calls = []
+
+    def compute(user_id, top_k):
+        calls.append(user_id)
+        return items[:top_k]
+
+    cache = RecommendationCache(db, compute, promotion_threshold=3)
+    cache.get("u1", 2)
+    version = cache.catalog_version
+    items[0].promotion_rank = 2
+    db.touch_product(items[0])
+    assert cache.catalog_version == version
+    # 小幅变化累计到阈值才失效
+    items[0].promotion_rank = 3
+    db.touch_product(items[0])
+    assert cache.catalog_version == version + 1
+    items[1].tags = {"new"}
+    db.reindex_product(items[1])
+    assert cache.catalog_version == version + 2
+
+    db.remove_product(items[0].product_id)
+    assert cache.get("u1", 2) == [items[1]]
+    cache.flush(timeout=5)
+    cache.close()
+    assert calls == ["u1", "u1"]
+    assert cache.hit_rate == 0.5
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_other_top_k_and_eviction_are_misses(db):
+    items = _catalogue(db)
+    cache = RecommendationCache(db, lambda user_id, top_k: items[:top_k], max_users=2)
+    assert cache.get("u1", 2) == items[:2]
+    assert cache.get("u1", 4) == items[:4]
+    cache.get("u2", 2)
+    cache.get("u3", 2)
+    assert len(cache) == 2
+    cache.get("u1", 4)
+    assert cache.misses == 5 and cache.hits == 0
+
+
+def test_uncached_engine(db):
+    _catalogue(db)
+    engine = RecommendationEngine(db, cached=False)
+    assert engine.cache is None
+    assert len(engine.recommend_for_user("u1", top_k=4)) == 4
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.services.item_cf import ItemCooccurrence
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+def test_co_purchases_become_neighbours(db):
+    products = ProductService(db)
+    lamp, bulb, shade, book = (products.create_product("m1", t, "", 1) for t in ("lamp", "bulb", "shade", "book"))
+    engine = RecommendationEngine(db)
+    for user in ("u1", "u2", "u3"):
+        engine.record_purchase(user, lamp.product_id)
+        engine.record_purchase(user, bulb.product_id)
+    engine.record_view("u4", lamp.product_id)
+    engine.record_view("u4", shade.product_id)
+
+    assert [pid for pid, _ in engine.item_cf.neighbours_of(lamp.product_id)] == [
+        bulb.product_id, shade.product_id]
+    engine.record_view("u9", lamp.product_id)
+    recs = engine.recommend_for_user("u9", top_k=3)
+    assert [p.product_id for p in recs][:2] == [bulb.product_id, shade.product_id]
+    assert lamp not in recs
+    # 协同过滤结果不足时用热门商品补齐
+    assert recs[2] is book
+
+
+def test_filler_without_numpy_does_not_scan_the_catalogue(db, monkeypatch):
+    products = ProductService(db)
+    lamp, bulb, book = (products.create_product("m1", t, "", 1, tags=["home"])
+                        for t in ("lamp", "bulb", "book"))
+    book.promotion_rank = 1
+    db.touch_product(book)
+    engine = RecommendationEngine(db, vectorized=False)
+    engine.record_purchase("u1", lamp.product_id)
+    engine.record_purchase("u1", bulb.product_id)
+    engine.record_view("u2", lamp.product_id)
+
+    def no_scan(table):
+        raise AssertionError(f"scanned {table}")
+
+    monkeypatch.setattr(db, "scan", no_scan)
+    recs = engine.recommend_for_user("u2", top_k=2)
+    assert recs == [bulb, book]
+
+
+def test_cold_start_uses_popular(db):
+    products = ProductService(db)
+    a = products.create_product("m1", "a", "", 1)
+    b = products.create_product("m1", "b", "", 1)
+    b.promotion_rank = 1
+    engine = RecommendationEngine(db)
+    assert engine.recommend_for_user("nobody", top_k=2) == [b, a]
+    assert engine.recommend_for_user("nobody", top_k=0) == []
+
+
+def test_incremental_top_n_matches_full_recount():
+    rng = random.Random(7)
+    model = ItemCooccurrence(neighbours=3, window=4)
+    for _ in range(3000):
+        recent = [f"p{rng.randrange(40)}" for _ in range(rng.randrange(8))]
+        model.record(f"p{rng.randrange(40)}", recent, rng.choice([1.0, 3.0]))
+    for i in range(40):
+        pid = f"p{i}"
+        row = model._counts.get(pid, {})
+        expected = sorted(row.values(), reverse=True)[:3]
+        assert [s for _, s in model.neighbours_of(pid)] == expected
+
+
+def test_rows_stay_bounded_and_keep_strong_neighbours():
+    model = ItemCooccurrence(neighbours=2, window=1, candidates=6)
+    for i in range(500):
+        model.record("lamp", ["bulb"], 3.0)
+        model.record("lamp", [f"once{i}"])
+    assert len(model._counts["lamp"]) <= 6
+    assert model.neighbours_of("lamp")[0] == ("bulb", 1500.0)
+    with pytest.raises(ValueError):
+        ItemCooccurrence(neighbours=4, candidates=7)
@@ -0,0 +1,130 @@
+import datetime
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import Order, OrderItem, OrderStatus, Payment
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.inventory import StockReservations
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+from sweetfish.services.reconcile import PaymentReconciler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def orders(db, clock):
+    notification = NotificationService(db)
+    return OrderService(db, PaymentGateway(db, notification), notification, CreditSystem(db),
+                        RecommendationEngine(db), reservations=StockReservations(db, ttl=60, clock=clock))
+
+
+def _order(db, oid):
+    o = Order(order_id=oid, buyer_id="u1", merchant_id="m1", items=[OrderItem("p1", 1)], total_cents=100)
+    db.add_order(o)
+    return o
+
+
+def _payment(db, pid, oid, status, age=0):
+    pay = Payment(payment_id=pid, order_id=oid, amount_cents=100, status=status,
+                  created_at=datetime.datetime.utcnow() - datetime.timedelta(seconds=age))
+    db.add_payment(pay)
+    return pay
+
+
+def test_repairs_mismatches(db, orders):
+    unpaid = _order(db, "o1")
+    _payment(db, "pay1", "o1", "success")
+
+    paid = _order(db, "o2")
+    db.mark_order_paid(paid, "pay2")
+    _payment(db, "pay2", "o2", "init")
+
+    _order(db, "o3")
+    stuck = _payment(db, "pay3", "o3", "init", age=3600)
+    fresh = _payment(db, "pay4", "o3", "init")
+
+    _payment(db, "pay5", "o1", "success")
+
+    report = PaymentReconciler(db, orders, chunk_size=2).run()
+    assert report.scanned == 5
+    assert report.orders_marked_paid == 1
+    assert unpaid.status == OrderStatus.PAID and unpaid.payment_id == "pay1"
+    assert {o.order_id for o in db.list_orders_by_status(OrderStatus.PAID)} == {"o1", "o2"}
+    assert report.payments_marked_success == 1
+    assert db.get_payment("pay2").status == "success"
+    assert report.payments_expired == 1
+    assert (stuck.status, fresh.status) == ("failed", "init")
+    assert report.duplicate_charges == ["pay5"]
+
+
+def test_clean_store_is_left_alone(db, orders):
+    o = _order(db, "o1")
+    _payment(db, "pay1", "o1", "failed")
+    db.mark_order_paid(o, "pay2")
+    _payment(db, "pay2", "o1", "success")
+    report = PaymentReconciler(db, orders).run()
+    assert (report.orders_marked_paid, report.payments_marked_success,
+            report.payments_expired, report.duplicate_charges) == (0, 0, 0, [])
+
+
+def test_repair_sells_the_reserved_stock(db, orders, clock):
+    lamp = ProductService(db).create_product("m1", "lamp", "", 100, stock=5)
+    order = orders.create_order("u1", [(lamp.product_id, 3)])
+    # 扣款成功但结果没写回订单（例如进程在回调前崩溃）
+    _payment(db, "pay1", order.order_id, "success")
+    report = PaymentReconciler(db, orders).run()
+    assert report.orders_marked_paid == 1
+    assert order.status == OrderStatus.PAID
+    assert lamp.stock == 2 and lamp.sold >= 3
+    assert orders.reservations.get(order.order_id) is None
+    clock.now += 3600
+    assert orders.reservations.available(lamp.product_id) == 2
+    assert orders.credit_system.get_score("u1") == 80.5
+    # 再跑一次不会重复扣库存
+    assert PaymentReconciler(db, orders).run().orders_marked_paid == 0
+    assert lamp.stock == 2
+
+
+def test_repair_after_restart_takes_stock_without_a_hold(db, orders):
+    lamp = ProductService(db).create_product("m1", "lamp", "", 100, stock=5)
+    order = orders.create_order("u1", [(lamp.product_id, 3)])
+    _payment(db, "pay1", order.order_id, "success")
+    # 重启后内存中的预留已丢失
+    orders.reservations.release(order.order_id)
+    PaymentReconciler(db, orders).run()
+    assert order.status == OrderStatus.PAID
+    assert lamp.stock == 2 and lamp.sold >= 3
+    assert orders.reservations.reserved(lamp.product_id) == 0
+
+
+def test_capture_on_cancelled_order_is_reported(db, orders):
+    lamp = ProductService(db).create_product("m1", "lamp", "", 100, stock=5)
+    order = orders.create_order("u1", [(lamp.product_id, 3)])
+    orders.reservations.release(order.order_id)
+    db.set_order_status(order, OrderStatus.CANCELLED)
+    _payment(db, "pay1", order.order_id, "success")
+    report = PaymentReconciler(db, orders).run()
+    assert report.captured_on_cancelled == ["pay1"]
+    assert report.orders_marked_paid == 0
+    assert order.status == OrderStatus.CANCELLED
+    assert lamp.stock == 5
@@ -0,0 +1,60 @@
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import Review, ReviewStats
+from sweetfish.services.review import ReviewService
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def service(db):
+    return ReviewService(db)
+
+
+def test_add_review(service):
+    r = service.add_review("p1", "u1", 5, "good")
+    assert service.list_for_product("p1") == [r]
+
+
+def test_add_review_invalid_rating(service):
+    with pytest.raises(ValueError):
+        service.add_review("p1", "u1", 6, "bad")
+
+
+def test_reviews_listed_per_product(service):
+    r1 = service.add_review("p1", "u1", 5, "good")
+    service.add_review("p2", "u1", 1, "bad")
+    r3 = service.add_review("p1", "u2", 3, "ok")
+    assert service.list_for_product("p1") == [r1, r3]
+    assert service.list_for_product("p3") == []
+
+
+def test_review_stats(service):
+    for rating in (5, 4, 4, 1):
+        service.add_review("p1", "u1", rating, "")
+    stats = service.get_stats("p1")
+    assert stats.count == 4
+    assert stats.total == 14
+    assert stats.histogram == [1, 0, 0, 2, 1]
+    assert stats.average == pytest.approx(3.5)
+
+
+def test_direct_db_writes_reject_out_of_range_ratings(db, service):
+    kept = service.add_review("p1", "u1", 4, "")
+    for rating in (0, 6):
+        with pytest.raises(ValueError):
+            db.add_review(Review(kept.review_id, "p1", "u1", rating, ""))
+    # 非法改写不影响已有的统计
+    assert db.get_review_stats("p1").histogram == [0, 0, 0, 1, 0]
+    assert db.reviews[kept.review_id] is kept
+    with pytest.raises(ValueError):
+        ReviewStats().add(0)
+
+
+def test_review_stats_empty(service):
+    stats = service.get_stats("none")
+    assert stats.count == 0
+    assert stats.average == 0.0
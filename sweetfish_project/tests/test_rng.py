@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.rng import RandomStream
+from sweetfish.scheduler import TimingWheel
+from sweetfish.services.bargain import BargainService
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+
+def test_same_seed_replays_and_blocks_continue_the_sequence():
+    a = RandomStream(42, block=8)
+    b = RandomStream(42, block=8)
+    first = [a.random() for _ in range(5)] + a.random_block(20) + [a.random() for _ in range(3)]
+    assert b.random_block(28) == first
+    assert all(0.0 <= x < 1.0 for x in first)
+    assert RandomStream(43, block=8).random_block(28) != first
+    with pytest.raises(ValueError):
+        RandomStream(1, block=0)
+
+
+def test_threads_get_their_own_named_streams():
+    stream = RandomStream(7, name="sim")
+
+    def draw_in(thread_name):
+        out = []
+        th = threading.Thread(target=lambda: out.extend(stream.random_block(4)), name=thread_name)
+        th.start()
+        th.join()
+        return out
+
+    w1, w2 = draw_in("w1"), draw_in("w2")
+    # 同名线程（例如重跑的压测）得到同一序列
+    assert draw_in("w1") == w1
+    assert w1 != w2
+    assert stream.random_block(4) not in (w1, w2)
+
+
+def _bargain(seed):
+    db = MemoryDB()
+    svc = BargainService(db, NotificationService(db), scheduler=TimingWheel(), seed=seed)
+    lamp = ProductService(db).create_product("m1", "lamp", "", 100_000, stock=1)
+    return svc, svc.start_bargain("owner", lamp.product_id)
+
+
+def test_join_many_matches_single_joins_for_a_seed():
+    users = [f"u{i}" for i in range(200)]
+    one, b1 = _bargain(seed=5)
+    for uid in users:
+        one.join_bargain(b1.bargain_id, uid)
+    bulk, b2 = _bargain(seed=5)
+    bulk.join_many(b2.bargain_id, users)
+    assert b2.current_price_cents == b1.current_price_cents
+    assert b2.participants == b1.participants
+    assert bulk.batches == 1
+    one.close()
+    bulk.close()
+
+
+def test_payment_outcomes_replay_with_seed():
+    def outcomes(seed):
+        db = MemoryDB()
+        notification = NotificationService(db)
+        gateway = PaymentGateway(db, notification, seed=seed)
+        orders = OrderService(db, gateway, notification, CreditSystem(db), RecommendationEngine(db))
+        lamp = ProductService(db).create_product("m1", "lamp", "", 100, stock=100)
+        pays = [gateway.create_payment(orders.create_order("u1", [(lamp.product_id, 1)]))
+                for _ in range(50)]
+        return [p.status for p in gateway.process_payments(pays, succeed_rate=0.5)]
+
+    assert outcomes(3) == outcomes(3)
+    assert set(outcomes(3)) == {"success", "failed"}
@@ -0,0 +1,104 @@
+import datetime
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import Order, OrderItem, OrderStatus
+from sweetfish.services.admin import AdminService
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+from sweetfish.services.sales_view import line_amounts
+from sweetfish.sqlite_db import SQLiteDB
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryDB()
+    else:
+        store = SQLiteDB(str(tmp_path / "store.db"), cache_size=8)
+        yield store
+        store.close()
+
+
+def _orders(db):
+    notification = NotificationService(db)
+    return OrderService(db, PaymentGateway(db, notification), notification,
+                        CreditSystem(db), RecommendationEngine(db))
+
+
+def test_paid_orders_update_totals(db):
+    products = ProductService(db)
+    lamp = products.create_product("m1", "lamp", "", 1000, stock=10)
+    book = products.create_product("m2", "book", "", 300, stock=10)
+    orders = _orders(db)
+    admin = AdminService(db, top_k=2)
+
+    paid = orders.create_orders_bulk("u1", [(lamp.product_id, 2), (book.product_id, 1)])
+    for o in paid:
+        orders.pay_order(o.order_id, succeed_rate=1.0)
+    orders.create_order("u2", [(book.product_id, 5)])  # 未支付不计
+    # 之后改价不影响已成交的营收
+    lamp.price_cents = 1
+    db.add_product(lamp)
+    orders.pay_order(orders.create_order("u2", [(lamp.product_id, 1)]).order_id, succeed_rate=1.0)
+
+    report = admin.generate_sales_report()
+    assert report["total_sales_cents"] == 2301
+    assert report["top_revenue"] == [(lamp.product_id, "lamp", 2001), (book.product_id, "book", 300)]
+    sales = admin.sales
+    assert sales.merchant_revenue("m1") == 2001
+    assert sales.product_units(lamp.product_id) == 3
+    assert sales.daily_revenue(datetime.datetime.utcnow().date()) == 2301
+    assert admin.rebuild_sales_report()
+
+
+def test_refund_subtracts_and_rebuild_repairs(db):
+    lamp = ProductService(db).create_product("m1", "lamp", "", 500, stock=10)
+    orders = _orders(db)
+    admin = AdminService(db)
+    first = orders.create_order("u1", [(lamp.product_id, 1)])
+    orders.pay_order(first.order_id, succeed_rate=1.0)
+    orders.pay_order(orders.create_order("u1", [(lamp.product_id, 2)]).order_id, succeed_rate=1.0)
+    db.set_order_status(db.get_order(first.order_id), OrderStatus.REFUNDED)
+    assert admin.sales.total_cents == 1000
+    assert admin.sales.product_units(lamp.product_id) == 2
+    assert admin.rebuild_sales_report()
+
+    admin.sales.total_cents = 7
+    assert not admin.rebuild_sales_report()
+    assert admin.sales.total_cents == 1000
+
+
+def test_view_loads_existing_paid_orders(db):
+    lamp = ProductService(db).create_product("m1", "lamp", "", 500, stock=10)
+    orders = _orders(db)
+    orders.pay_order(orders.create_order("u1", [(lamp.product_id, 1)]).order_id, succeed_rate=1.0)
+    assert AdminService(db).sales.top_products(5) == [(lamp.product_id, 500)]
+
+
+def test_admin_services_share_or_release_the_view(db):
+    lamp = ProductService(db).create_product("m1", "lamp", "", 500, stock=10)
+    orders = _orders(db)
+    owner = AdminService(db)
+    shared = AdminService(db, sales=owner.sales)
+    assert shared.sales is owner.sales
+    listeners = len(db._order_listeners)
+    shared.close()
+    assert len(db._order_listeners) == listeners
+    owner.close()
+    assert len(db._order_listeners) == listeners - 1
+    # 关闭后不再跟随订单变化
+    orders.pay_order(orders.create_order("u1", [(lamp.product_id, 1)]).order_id, succeed_rate=1.0)
+    assert owner.sales.total_cents == 0
+
+
+def test_legacy_lines_split_total():
+    order = Order(order_id="o1", buyer_id="u", merchant_id="m", total_cents=1001,
+                  items=[OrderItem("a", 1), OrderItem("b", 2)])
+    assert line_amounts(order) == [("a", 1, 333), ("b", 2, 668)]
+    order.items = [OrderItem("a", 1, 1), OrderItem("b", 2, 500)]
+    assert line_amounts(order) == [("a", 1, 1), ("b", 2, 1000)]
@@ -0,0 +1,147 @@
+import random
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import OrderStatus
+from sweetfish.scheduler import TimingWheel
+from sweetfish.services.bargain import BargainService
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+from sweetfish.sqlite_db import SQLiteDB
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def wheel(clock):
+    return TimingWheel(tick=1.0, slots=(8, 4, 4), clock=clock)
+
+
+def test_timers_fire_at_their_tick_across_levels(wheel, clock):
+    rng = random.Random(7)
+    fired = []
+    # 跨度 8*4*4=128 tick，包含超出整个时间轮的定时器
+    delays = [rng.randint(0, 400) for _ in range(500)]
+    for i, d in enumerate(delays):
+        wheel.call_later(d, lambda i=i: fired.append((clock.now, i)))
+    assert len(wheel) == 500
+    while len(wheel):
+        clock.now += 1
+        wheel.advance()
+    assert sorted(i for _, i in fired) == list(range(500))
+    for now, i in fired:
+        assert now == max(1, delays[i])
+
+
+def test_cancel_is_lazy_and_once(wheel, clock):
+    fired = []
+    keep = wheel.call_later(5, fired.append, "keep")
+    drop = wheel.call_later(5, fired.append, "drop")
+    assert drop.cancel() is True
+    assert drop.cancel() is False
+    assert len(wheel) == 1
+    clock.now = 10
+    assert wheel.advance() == 1
+    assert fired == ["keep"]
+    assert keep.cancel() is False
+
+
+def test_idle_wheel_jumps_ahead(wheel, clock):
+    clock.now = 10_000
+    assert wheel.advance() == 0
+    assert wheel.current_tick == 10_000
+    fired = []
+    wheel.call_later(3, fired.append, 1)
+    clock.now += 3
+    wheel.advance()
+    assert fired == [1]
+
+
+def test_callback_error_does_not_drop_others(wheel, clock):
+    fired = []
+
+    def boom():
+        raise RuntimeError("boom")
+
+    wheel.call_later(1, boom)
+    wheel.call_later(1, fired.append, "ok")
+    clock.now = 1
+    with pytest.raises(RuntimeError):
+        wheel.advance()
+    assert fired == ["ok"]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryDB()
+    else:
+        store = SQLiteDB(str(tmp_path / "store.db"), cache_size=8)
+        yield store
+        store.close()
+
+
+def test_bargain_closes_and_is_archived(db, wheel, clock):
+    notification = NotificationService(db)
+    p = ProductService(db).create_product("m1", "lamp", "", 1000, stock=1)
+    bargains = BargainService(db, notification, scheduler=wheel)
+    b = bargains.start_bargain("u1", p.product_id, expires_minutes=0)
+    assert len(wheel) == 1
+
+    clock.now = 1
+    wheel.advance()
+    assert b.bargain_id not in db.bargains
+    assert db.bargain_archive[b.bargain_id].closed
+    assert db.get_bargain(b.bargain_id).closed
+    bargains.flush()
+    assert "closed at 1000 cents" in notification.get_notifications_for_user("u1")[-1][0]
+    with pytest.raises(ValueError):
+        bargains.join_bargain(b.bargain_id, "u2")
+
+
+def test_join_checks_deadline_before_the_tick(db, wheel):
+    notification = NotificationService(db)
+    p = ProductService(db).create_product("m1", "lamp", "", 1000, stock=1)
+    bargains = BargainService(db, notification, scheduler=wheel)
+    b = bargains.start_bargain("u1", p.product_id, expires_minutes=0)
+    with pytest.raises(ValueError):
+        bargains.join_bargain(b.bargain_id, "u2")
+    assert db.get_bargain(b.bargain_id).closed
+    # 时间轮之后再触发也不会重复关闭或通知
+    wheel.advance(5)
+    bargains.flush()
+    assert len(notification.get_notifications_for_user("u1")) == 2
+
+
+def test_unpaid_order_is_cancelled_after_timeout(wheel, clock):
+    db = MemoryDB()
+    notification = NotificationService(db)
+    p = ProductService(db).create_product("m1", "lamp", "", 1000, stock=2)
+    orders = OrderService(db, PaymentGateway(db, notification), notification,
+                          CreditSystem(db), RecommendationEngine(db),
+                          scheduler=wheel, payment_timeout=30)
+    unpaid = orders.create_order("u1", [(p.product_id, 1)])
+    paid = orders.create_order("u2", [(p.product_id, 1)])
+    orders.pay_order(paid.order_id, succeed_rate=1.0)
+    assert orders.reservations.available(p.product_id) == 0
+
+    clock.now = 30
+    wheel.advance()
+    assert unpaid.status == OrderStatus.CANCELLED
+    assert paid.status == OrderStatus.PAID
+    assert orders.reservations.available(p.product_id) == 1
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.services.product import ProductService
+
+MERCHANT_ID = "m_test"
+
+
+@pytest.fixture
+def db():
+    return MemoryDB()
+
+
+@pytest.fixture
+def service(db):
+    return ProductService(db)
+
+
+def _scan(db, keyword):
+    # 旧实现：全量扫描，作为对照
+    low = keyword.lower()
+    res = [
+        p for p in db.products.values()
+        if not keyword
+        or low in p.title.lower()
+        or low in p.description.lower()
+        or low in " ".join(p.tags).lower()
+    ]
+    res.sort(key=lambda q: (-q.promotion_rank, -q.views, -q.sold))
+    return res
+
+
+def test_search_substring(service):
+    p = service.create_product(MERCHANT_ID, "MacBook Air", "轻薄本", 100)
+    service.create_product(MERCHANT_ID, "台灯", "复古", 10)
+    assert service.search("book") == [p]
+    assert service.search("BOOK") == [p]
+    assert service.search("k") == [p]
+
+
+def test_search_cjk(service):
+    p = service.create_product(MERCHANT_ID, "二手iPhone 12", "九成新，功能完好", 100, tags={"数码", "苹果"})
+    assert service.search("成新") == [p]
+    assert service.search("苹果") == [p]
+    assert service.search("新手") == []
+
+
+def test_search_after_update_and_delete(service):
+    p = service.create_product(MERCHANT_ID, "apple", "fruit", 5)
+    service.update_product(p.product_id, title="banana", tags={"yellow"})
+    assert service.search("apple") == []
+    assert service.search("yell") == [p]
+    service.delete_product(p.product_id)
+    assert service.search("banana") == []
+
+
+def test_search_matches_full_scan(db, service):
+    rng = random.Random(7)
+    words = ["lamp", "书架", "phone", "耳机", "red", "复古", "air"]
+    for i in range(200):
+        p = service.create_product(
+            MERCHANT_ID,
+            " ".join(rng.sample(words, 2)),
+            rng.choice(words),
+            i,
+            tags=set(rng.sample(words, 2)),
+        )
+        p.promotion_rank = rng.randint(0, 2)
+        p.views = rng.randint(0, 3)
+    for kw in ["", "a", "amp", "p", "书", "古 ", "ph", "air lamp", "zzz", "耳机"]:
+        assert db.search_products(kw) == _scan(db, kw)
+
+
+def test_search_page_walks_all_results(db, service):
+    for i in range(23):
+        p = service.create_product(MERCHANT_ID, f"lamp {i}", "desk", i)
+        p.views = i % 4
+    seen = []
+    page, cursor = service.search_page("lamp", limit=5)
+    seen.extend(page)
+    while cursor:
+        page, cursor = service.search_page("lamp", limit=5, cursor=cursor)
+        assert len(page) <= 5
+        seen.extend(page)
+    assert seen == db.search_products("lamp")
+
+
+def test_search_page_last_page_has_no_cursor(service):
+    service.create_product(MERCHANT_ID, "a", "a", 1)
+    page, cursor = service.search_page("", limit=5)
+    assert len(page) == 1
+    assert cursor is None
+
+
+def test_search_page_invalid_cursor(service):
+    with pytest.raises(ValueError):
+        service.search_page("a", limit=5, cursor="not-a-cursor")
+
+
+def test_in_place_rank_edits_reorder_boards(db, service):
+    a = service.create_product(MERCHANT_ID, "a", "", 1)
+    b = service.create_product(MERCHANT_ID, "b", "", 1)
+    assert db.search_products("") == [a, b]
+    b.views = 5
+    assert db.search_products("") == [b, a]
+    assert db.search_products_page("", limit=1)[0] == [b]
+    a.sold = 3
+    assert db.top_selling_products(1) == [a]
+    # 不在库中的副本不影响排行
+    other = MemoryDB()
+    assert other.search_products("") == []
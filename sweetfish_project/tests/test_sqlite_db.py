@@ -0,0 +1,233 @@
+import dataclasses
+import random
+import sqlite3
+import threading
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.models import Bargain, OrderStatus
+from sweetfish.services.auth import AuthService
+from sweetfish.services.credit import CreditSystem
+from sweetfish.services.notification import NotificationService
+from sweetfish.services.order import OrderService
+from sweetfish.services.payment import PaymentGateway
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+from sweetfish.services.review import ReviewService
+from sweetfish.sqlite_db import _ORDER_BY_RANK, _RANK_KEY, SQLiteDB
+
+MERCHANT_ID = "m_test"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryDB()
+    else:
+        store = SQLiteDB(str(tmp_path / "store.db"), cache_size=8)
+        yield store
+        store.close()
+
+
+def _order_service(db):
+    notification = NotificationService(db)
+    return OrderService(db, PaymentGateway(db, notification), notification,
+                        CreditSystem(db), RecommendationEngine(db))
+
+
+def test_auth_and_products(db):
+    auth = AuthService(db)
+    user = auth.register("123", "pwd")
+    assert auth.authenticate("123", "pwd") is user
+    products = ProductService(db)
+    p = products.create_product(MERCHANT_ID, "apple", "apple", 5)
+    assert products.get_product(p.product_id) is p
+    assert len(db.products) == 1
+    products.delete_product(p.product_id)
+    assert products.get_product(p.product_id) is None
+    with pytest.raises(ValueError):
+        products.delete_product(p.product_id)
+
+
+def test_products_listed_per_merchant(db):
+    products = ProductService(db)
+    a = products.create_product("m1", "a", "", 1)
+    b = products.create_product("m2", "b", "", 1)
+    c = products.create_product("m1", "c", "", 1)
+    assert products.list_for_merchant("m1") == [a, c]
+    # 转给别的商家、删除后索引跟着变
+    moved = dataclasses.replace(a, merchant_id="m2")
+    db.add_product(moved)
+    products.delete_product(c.product_id)
+    assert products.list_for_merchant("m1") == []
+    assert products.list_for_merchant("m2") == [moved, b]
+
+
+def test_order_flow(db):
+    products = ProductService(db)
+    orders = _order_service(db)
+    p = products.create_product(MERCHANT_ID, "lamp", "desk", 100, stock=2)
+    o = orders.create_order("u1", [(p.product_id, 1)])
+    orders.pay_order(o.order_id, succeed_rate=1.0)
+    assert db.get_order(o.order_id).status == OrderStatus.PAID
+    assert [x.order_id for x in db.list_orders_for_buyer("u1")] == [o.order_id]
+    assert [x.order_id for x in db.list_orders_for_product(p.product_id)] == [o.order_id]
+    assert [x.order_id for x in db.list_orders_by_status(OrderStatus.PAID)] == [o.order_id]
+    assert db.get_product(p.product_id).stock == 1
+
+
+def test_bulk_checkout(db):
+    products = ProductService(db)
+    orders = _order_service(db)
+    lamp = products.create_product("m1", "lamp", "desk", 100, stock=2)
+    book = products.create_product("m2", "book", "", 50, stock=2)
+    created = orders.create_orders_bulk("u1", [(lamp.product_id, 1), (book.product_id, 1)])
+    assert [o.order_id for o in db.list_orders_for_buyer("u1")] == [o.order_id for o in created]
+    assert [o.merchant_id for o in created] == ["m1", "m2"]
+
+
+def test_review_stats(db):
+    reviews = ReviewService(db)
+    for rating in (5, 3, 3):
+        reviews.add_review("p1", "u1", rating, "")
+    stats = db.get_review_stats("p1")
+    assert (stats.count, stats.total, stats.histogram) == (3, 11, [0, 0, 2, 0, 1])
+    assert len(db.list_reviews_for_product("p1")) == 3
+
+
+def test_search_matches_memory_backend(tmp_path):
+    memory = MemoryDB()
+    sqlite = SQLiteDB(str(tmp_path / "s.db"), cache_size=16)
+    rng = random.Random(3)
+    words = ["lamp", "书架", "phone", "耳机", "red", "复古台灯", "air"]
+    for i in range(120):
+        title = " ".join(rng.sample(words, 2))
+        desc = rng.choice(words)
+        tags = set(rng.sample(words, 2))
+        ps = [ProductService(d).create_product(MERCHANT_ID, title, desc, i, tags=tags)
+              for d in (memory, sqlite)]
+        sqlite_p = sqlite.get_product(ps[1].product_id)
+        rank, views = rng.randint(0, 2), rng.randint(0, 3)
+        ps[0].promotion_rank = sqlite_p.promotion_rank = rank
+        ps[0].views = sqlite_p.views = views
+        memory.touch_product(ps[0])
+        sqlite.touch_product(sqlite_p)
+    for kw in ["", "a", "amp", "书", "台灯", "lamp air", "zzz", "AIR", "100%"]:
+        got = [p.title for p in sqlite.search_products(kw)]
+        want = [p.title for p in memory.search_products(kw)]
+        assert got == want, kw
+    seen, cursor = [], None
+    while True:
+        page, cursor = sqlite.search_products_page("a", limit=7, cursor=cursor)
+        seen.extend(p.title for p in page)
+        if cursor is None:
+            break
+    assert seen == [p.title for p in memory.search_products("a")]
+    for kw in ("", "a"):
+        seen, cursor = [], None
+        while True:
+            page, cursor = sqlite.search_products_page(kw, limit=9, cursor=cursor)
+            seen.extend(p.product_id for p in page)
+            if cursor is None:
+                break
+        assert seen == [p.product_id for p in sqlite.search_products(kw)], kw
+    assert [p.title for p in sqlite.top_selling_products(5)] == [p.title for p in memory.top_selling_products(5)]
+    sqlite.close()
+
+
+def test_data_survives_reopen(tmp_path):
+    path = str(tmp_path / "store.db")
+    db = SQLiteDB(path)
+    p = ProductService(db).create_product(MERCHANT_ID, "lamp", "desk", 100, tags={"灯"})
+    db.close()
+
+    db2 = SQLiteDB(path)
+    again = db2.get_product(p.product_id)
+    assert again == p
+    assert db2.search_products("灯") == [again]
+    db2.close()
+
+
+def test_keyset_page_seeks_the_rank_index(tmp_path):
+    path = str(tmp_path / "store.db")
+    # 没有排序键列的旧库，打开时补列并换索引
+    old = sqlite3.connect(path)
+    old.executescript("""
+        CREATE TABLE products (seq INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT NOT NULL UNIQUE,
+            merchant_id TEXT NOT NULL, promotion_rank INTEGER NOT NULL, views INTEGER NOT NULL,
+            sold INTEGER NOT NULL, data TEXT NOT NULL);
+        CREATE INDEX products_rank ON products(promotion_rank DESC, views DESC, sold DESC, seq);
+    """)
+    old.close()
+    store = SQLiteDB(path)
+    for i in range(5):
+        ProductService(store).create_product(MERCHANT_ID, f"p{i}", "", 100)
+    page, cursor = store.search_products_page("", limit=2)
+    assert len(page) == 2 and cursor is not None
+    plan = store._query(f"EXPLAIN QUERY PLAN SELECT p.seq FROM products p "
+                        f"WHERE ({_RANK_KEY}) > (?, ?, ?, ?) {_ORDER_BY_RANK} LIMIT 3", (0, 0, 0, 0))
+    detail = " ".join(row[-1] for row in plan)
+    assert "SEARCH p USING INDEX products_rank_key" in detail and "TEMP B-TREE" not in detail
+    store.close()
+
+
+def test_hot_cache_under_concurrent_reads(tmp_path):
+    store = SQLiteDB(str(tmp_path / "store.db"), cache_size=2)
+    products = ProductService(store)
+    pids = [products.create_product(MERCHANT_ID, f"p{i}", "", 100).product_id for i in range(6)]
+    errors = []
+
+    def reader(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(2000):
+                pid = rng.choice(pids)
+                assert store.get_product(pid).product_id == pid
+        except Exception as e:  # noqa: BLE001 - 汇总到主线程断言
+            errors.append(e)
+
+    pool = [threading.Thread(target=reader, args=(t,)) for t in range(4)]
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    assert errors == []
+    # 缓存命中时同一商品始终是同一个对象
+    assert store.get_product(pids[0]) is store.get_product(pids[0])
+    store.close()
+
+
+def test_hot_cache_keeps_live_objects_identical(tmp_path):
+    store = SQLiteDB(str(tmp_path / "store.db"), cache_size=2)
+    products = ProductService(store)
+    first = products.create_product(MERCHANT_ID, "first", "", 100)
+    for i in range(5):
+        products.create_product(MERCHANT_ID, f"p{i}", "", 100)
+    # 已被挤出 LRU，但调用方仍持有它，读到的必须是同一个对象
+    assert store.get_product(first.product_id) is first
+    first.stock = 7
+    assert store.get_product(first.product_id).stock == 7
+    store.close()
+
+
+def test_remove_product_missing_row(tmp_path):
+    store = SQLiteDB(str(tmp_path / "store.db"))
+    p = ProductService(store).create_product(MERCHANT_ID, "gone", "", 100)
+    # 模拟另一个连接已删掉这一行，而对象还在缓存里
+    store._conn.execute("DELETE FROM products WHERE product_id = ?", (p.product_id,))
+    assert store.remove_product(p.product_id) is None
+    store.close()
+
+
+def test_archived_bargain_leaves_active_view(tmp_path):
+    store = SQLiteDB(str(tmp_path / "store.db"))
+    b = Bargain("b1", "p1", "u1", 1999, 1999)
+    store.add_bargain(b)
+    assert store.bargains["b1"] is b
+    b.closed = True
+    store.add_bargain(b)
+    assert "b1" not in store.bargains
+    assert store.bargains.get("b1") is None
+    assert store.bargain_archive["b1"] is b
+    assert store.get_bargain("b1") is b
+    store.close()
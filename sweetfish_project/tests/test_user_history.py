@@ -0,0 +1,66 @@
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.services.history import UserHistory
+from sweetfish.services.recommend import RecommendationEngine
+
+
+def test_ring_keeps_last_depth_items():
+    history = UserHistory(depth=3)
+    for pid in ["a", "b", "c", "d", "b"]:
+        history.append("u1", pid)
+    assert history.get("u1") == ["c", "d", "b"]
+    assert history.get("nobody") == []
+    # 同一商品只占一个 handle
+    assert len(history.handles) == 4
+
+
+def test_inactive_users_evicted_lru():
+    history = UserHistory(depth=2, max_users=2)
+    history.append("u1", "a")
+    history.append("u2", "a")
+    history.append("u1", "b")
+    history.append("u3", "c")
+    assert "u2" not in history
+    assert history.get("u1") == ["a", "b"]
+    assert len(history) == 2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_idle_users_expire():
+    clock = FakeClock()
+    history = UserHistory(depth=2, max_idle=60, clock=clock)
+    history.append("u1", "a")
+    clock.now = 30
+    history.append("u2", "a")
+    clock.now = 70
+    history.append("u2", "b")
+    # u1 空闲超过 60 秒，下一次写入时被清掉
+    assert "u1" not in history and "u2" in history
+    clock.now = 200
+    assert history.expire() == 1
+    assert len(history) == 0
+
+
+def test_engine_history_is_bounded():
+    engine = RecommendationEngine(MemoryDB(), vectorized=False, history_depth=4, max_users=10)
+    for i in range(100):
+        engine.record_view(f"u{i % 5}", f"p{i}")
+    assert engine.user_history.get("u4") == ["p84", "p89", "p94", "p99"]
+    for i in range(20):
+        engine.record_view(f"new{i}", "p0")
+    assert len(engine.user_history) == 10
+    assert "u4" not in engine.user_history
+
+
+def test_rejects_bad_sizes():
+    with pytest.raises(ValueError):
+        UserHistory(depth=0)
+    with pytest.raises(ValueError):
+        UserHistory(max_idle=0)
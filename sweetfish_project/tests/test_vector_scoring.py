@@ -0,0 +1,67 @@
+import random
+
+import pytest
+from sweetfish.db import MemoryDB
+from sweetfish.services.product import ProductService
+from sweetfish.services.recommend import RecommendationEngine
+
+TAGS = ["灯", "书", "phone", "red", "复古", "air"]
+
+
+def _catalogue(db, n=300, seed=5):
+    rng = random.Random(seed)
+    products = ProductService(db)
+    made = []
+    for i in range(n):
+        p = products.create_product("m1", f"item {i}", "", 100, tags=set(rng.sample(TAGS, rng.randint(0, 3))))
+        p.promotion_rank = rng.randint(0, 2)
+        p.views = rng.randint(0, 500)
+        p.sold = rng.randint(0, 50)
+        db.touch_product(p)
+        made.append(p)
+    return made, rng
+
+
+def _score(engine, user_id, p):
+    tag_scores = engine._tag_scores(user_id)
+    return round(sum(tag_scores.get(t, 0) for t in p.tags) * 5 + p.promotion_rank * 2
+                 + p.views * 0.01 + p.sold * 0.1, 6)
+
+
+def test_loop_path_without_numpy():
+    db = MemoryDB()
+    made, _ = _catalogue(db, n=50)
+    engine = RecommendationEngine(db, vectorized=False)
+    engine.record_view("u1", made[0].product_id)
+    recs = engine.recommend_by_tags("u1", top_k=5)
+    scores = [_score(engine, "u1", p) for p in recs]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[-1] >= max(_score(engine, "u1", p) for p in made if p not in recs)
+
+
+def test_vectorized_matches_loop_as_products_change():
+    pytest.importorskip("numpy")
+    db = MemoryDB()
+    made, rng = _catalogue(db)
+    fast = RecommendationEngine(db, vectorized=True)
+    slow = RecommendationEngine(db, vectorized=False)
+    products = ProductService(db)
+    for step in range(60):
+        p = rng.choice([q for q in made if db.get_product(q.product_id)])
+        action = step % 4
+        if action == 0:
+            p.views += rng.randint(1, 100)
+            db.touch_product(p)
+        elif action == 1:
+            products.update_product(p.product_id, tags=set(rng.sample(TAGS, 2)))
+        elif action == 2:
+            products.delete_product(p.product_id)
+        else:
+            made.append(products.create_product("m2", "new", "", 1, tags={rng.choice(TAGS)}))
+        alive = [q for q in made if db.get_product(q.product_id)]
+        history = [q.product_id for q in rng.sample(alive, 3)]
+        for engine in (fast, slow):
+            engine.user_history["u1"] = list(history)
+        got = [_score(fast, "u1", q) for q in fast.recommend_by_tags("u1", top_k=8)]
+        want = [_score(slow, "u1", q) for q in slow.recommend_by_tags("u1", top_k=8)]
+        assert got == want